@@ -1,12 +1,15 @@
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from doerapp.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DoerHub.settings')
+django_asgi_app = get_asgi_application()
+
+# imported after Django is set up: these pull in models
+from doerapp.middleware import TokenAuthMiddlewareStack
+from doerapp.routing import websocket_urlpatterns
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+    "http": django_asgi_app,
+    "websocket": TokenAuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
 })
@@ -153,6 +153,9 @@ CORS_ALLOWED_ORIGINS = [
 # Optional: allow credentials (needed for session auth)
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+# keyset cursors of list endpoints that must keep returning plain arrays,
+# and ETags of cached listings
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "ETag"]
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -163,7 +166,7 @@ SECRET_KEY='VFKvFdUklt7J2r8JEqWXvDTLGXqCBy-QqLOeyuuoERnpccWsxLTa_pmsBQ54RiurMWhI
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'doerapp.auth_cache.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -210,3 +213,225 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
+
+# Queues, declared in one place. Tasks not listed run on "default".
+# Start one worker per queue with `manage.py celery_worker <queue>`, which
+# applies concurrency / prefetch_multiplier; rate_limit applies to each
+# task of the queue (per worker). latency_slo (seconds) is the queue wait
+# above which doerapp.task_metrics logs a warning.
+CELERY_QUEUE_CONFIG = {
+    "critical": {
+        "tasks": [
+            "doerapp.tasks.dispatch_critical_email",
+            "doerapp.tasks.send_otp_email_task",
+        ],
+        "concurrency": 4,
+        "prefetch_multiplier": 1,
+        "latency_slo": 2,
+    },
+    "transactional": {
+        "tasks": [
+            "doerapp.tasks.dispatch_transactional_email",
+            "doerapp.tasks.send_provider_approval_email",
+            "doerapp.tasks.send_provider_rejection_email",
+        ],
+        "concurrency": 2,
+        "prefetch_multiplier": 1,
+        "latency_slo": 30,
+    },
+    "bulk": {
+        "tasks": [
+            "doerapp.tasks.dispatch_bulk_email",
+            "doerapp.tasks.send_webinar_links_task",
+            "doerapp.tasks.send_bulk_email_chunk",
+            "doerapp.tasks.send_contact_email",
+        ],
+        "concurrency": 2,
+        "prefetch_multiplier": 1,
+        "rate_limit": "30/m",
+        "latency_slo": 600,
+    },
+    "default": {
+        "tasks": [],
+        "concurrency": 4,
+        "prefetch_multiplier": 4,
+        "latency_slo": 10,
+    },
+}
+
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_ROUTES = {
+    task: {"queue": queue}
+    for queue, config in CELERY_QUEUE_CONFIG.items()
+    for task in config["tasks"]
+}
+CELERY_TASK_ANNOTATIONS = {
+    task: {"rate_limit": config["rate_limit"]}
+    for config in CELERY_QUEUE_CONFIG.values() if "rate_limit" in config
+    for task in config["tasks"]
+}
+# Per-queue wait / email delivery latency samples (see task_metrics)
+TASK_METRICS_REDIS_URL = "redis://127.0.0.1:6379/4"
+
+# Matching / geo index
+
+MATCH_RADIUS_KM = 10
+GEO_CELL_SIZE_DEG = 0.1  # run `manage.py rebuild_geo_cells` after changing
+
+# "orm" (haversine SQL annotation) or "snapshot" (in-memory NumPy engine,
+# for high-traffic cities).
+MATCHING_ENGINE = "orm"
+SNAPSHOT_REFRESH_SECONDS = 300
+SNAPSHOT_DISTANCE_TOLERANCE_KM = 0.001
+
+# Live provider locations (GPS pings). Use
+# "doerapp.location_store.InMemoryLocationStore" for tests / single node.
+LIVE_LOCATION_STORE = {
+    "BACKEND": "doerapp.location_store.RedisLocationStore",
+    "OPTIONS": {"url": "redis://127.0.0.1:6379/1"},
+}
+LIVE_LOCATION_FLUSH_INTERVAL = 15  # seconds
+
+# Wave dispatch: nearest `max_providers` within `radius_km` first, then
+# widen after `timeout` seconds with no accept. max_providers=None offers
+# to everyone in range.
+DISPATCH_WAVES = [
+    {"radius_km": 3, "max_providers": 5, "timeout": 20},
+    {"radius_km": 6, "max_providers": 10, "timeout": 30},
+    {"radius_km": MATCH_RADIUS_KM, "max_providers": None, "timeout": 0},
+]
+
+# Provider presence: per-connection heartbeat keys with a TTL. Sockets
+# heartbeat every PRESENCE_HEARTBEAT_SECONDS; location pings (at least
+# every 30 s from the provider dashboard) keep a "tracking" connection
+# alive for PRESENCE_TRACKING_TTL. is_online is synced from it every
+# PRESENCE_SYNC_INTERVAL seconds.
+PRESENCE_BACKEND = {
+    "BACKEND": "doerapp.presence.RedisPresence",
+    "OPTIONS": {"url": "redis://127.0.0.1:6379/1"},
+}
+PRESENCE_TTL = 60
+PRESENCE_HEARTBEAT_SECONDS = 20
+PRESENCE_TRACKING_TTL = 120
+PRESENCE_SYNC_INTERVAL = 10
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-provider-locations": {
+        "task": "doerapp.tasks.flush_provider_locations",
+        "schedule": LIVE_LOCATION_FLUSH_INTERVAL,
+    },
+    "sync-provider-presence": {
+        "task": "doerapp.tasks.sync_provider_presence",
+        "schedule": PRESENCE_SYNC_INTERVAL,
+    },
+    "reconcile-unread-counts": {
+        "task": "doerapp.tasks.reconcile_unread_counts",
+        "schedule": 600,
+    },
+    # maintenance (chunked, time-bounded; see doerapp.maintenance)
+    "expire-stale-requests": {
+        "task": "doerapp.tasks.expire_stale_requests",
+        "schedule": 300,
+    },
+    "purge-expired-otps": {
+        "task": "doerapp.tasks.purge_expired_otps",
+        "schedule": 3600,
+    },
+    "prune-notifications": {
+        "task": "doerapp.tasks.prune_notifications",
+        "schedule": 6 * 3600,
+    },
+    "purge-email-outbox": {
+        "task": "doerapp.tasks.purge_email_outbox",
+        "schedule": 6 * 3600,
+    },
+    "prune-dispatch-offers": {
+        "task": "doerapp.tasks.prune_dispatch_offers",
+        "schedule": 3600,
+    },
+    # outbox lanes: retries and lost kicks; new rows kick their lane directly
+    "dispatch-critical-email": {
+        "task": "doerapp.tasks.dispatch_critical_email",
+        "schedule": 15,
+    },
+    "dispatch-transactional-email": {
+        "task": "doerapp.tasks.dispatch_transactional_email",
+        "schedule": 15,
+    },
+    "dispatch-bulk-email": {
+        "task": "doerapp.tasks.dispatch_bulk_email",
+        "schedule": 15,
+    },
+}
+
+# Chat write-behind: broadcast first, bulk-insert messages every
+# BATCH_SIZE messages or FLUSH_INTERVAL_MS milliseconds.
+CHAT_WRITE_BEHIND = {
+    "ENABLED": False,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL_MS": 50,
+    "MAX_ATTEMPTS": 5,  # then the batch is written row by row, bad rows dropped
+}
+
+# Recent-message ring buffer per chat room (history on connect). Use
+# "doerapp.chat_cache.LocalRecentMessages" for a per-process LRU.
+CHAT_RECENT_CACHE = {
+    "BACKEND": "doerapp.chat_cache.RedisRecentMessages",
+    "OPTIONS": {"url": "redis://127.0.0.1:6379/2", "size": 50, "idle_ttl": 3600},
+}
+
+# Shared cache (JWT user cache, counters). AUTH_USER_CACHE_TTL bounds how
+# long a resolved token user is reused; tokens' own expiry bounds it too.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/3",
+    }
+}
+AUTH_USER_CACHE_TTL = 300
+
+# Unread notification counters live in the default cache and are recounted
+# from the DB at least every UNREAD_COUNT_TTL seconds.
+UNREAD_COUNT_TTL = 3600
+
+# Bulk email (webinar links): registrations per Celery chunk task; each
+# chunk is written to the email outbox in one INSERT.
+BULK_EMAIL_CHUNK_SIZE = 100
+
+# Email outbox: rows are sent EMAIL_OUTBOX_BATCH_SIZE at a time over one
+# SMTP connection; failures back off (EMAIL_OUTBOX_BACKOFF seconds,
+# doubled per attempt) and are dead-lettered after EMAIL_OUTBOX_MAX_ATTEMPTS.
+# EMAIL_OUTBOX_BACKEND overrides EMAIL_BACKEND for the dispatcher, e.g.
+# "django.core.mail.backends.filebased.EmailBackend" (with EMAIL_FILE_PATH)
+# or "django.core.mail.backends.console.EmailBackend" for tests / local runs.
+EMAIL_OUTBOX_BACKEND = None
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF = 30
+
+# Email OTPs live in the default cache (see doerapp.otp). Limits are
+# (requests, window seconds) per sliding window; EmailOTP rows are only
+# an audit trail when OTP_AUDIT_TRAIL is on.
+OTP_TTL = 600
+OTP_MAX_ATTEMPTS = 5
+OTP_RESEND_COOLDOWN = 60
+OTP_VERIFIED_TTL = 1800
+OTP_RATE_LIMITS = {
+    "email": (5, 3600),
+    "ip": (20, 3600),
+    "verify_ip": (30, 600),
+}
+OTP_AUDIT_TRAIL = True
+
+# Maintenance jobs: rows per chunk (one short transaction each) and
+# seconds per run; unfinished work continues on the next beat.
+MAINTENANCE_CHUNK_SIZE = 500
+MAINTENANCE_TIME_BUDGET = 20
+SERVICE_REQUEST_PENDING_TTL = 3600  # pending this long with no accept -> expired
+NOTIFICATION_RETENTION_DAYS = 90    # read notifications and broadcasts
+EMAIL_OUTBOX_RETENTION_DAYS = 30    # sent and dead outbox emails
+
+# Public webinar listing: pages cached per listing version (bumped on any
+# WebinarPoster save / delete) for at most WEBINAR_LIST_CACHE_TTL seconds.
+WEBINAR_LIST_CACHE_TTL = 600
+WEBINAR_PAGE_SIZE = 50
@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib import messages
-from doerapp.models import EmailOTP, Message, Profile, Provider, Review, ServiceCategory, ServiceRequest,ChatRoom, WebinarPoster, WebinarRegistration
-from doerapp.tasks import send_provider_approval_email, send_provider_rejection_email
+from doerapp.models import BulkEmailJob, EmailOTP, EmailOutbox, Message, Profile, Provider, Review, ServiceCategory, ServiceRequest,ChatRoom, WebinarPoster, WebinarRegistration
+from django.db import transaction
+from doerapp import email_outbox
 
 
 admin.site.register(Profile)
@@ -14,6 +15,7 @@ admin.site.register(EmailOTP)
 admin.site.register(WebinarPoster)
 admin.site.register(WebinarRegistration)
 admin.site.register(Review)
+admin.site.register(BulkEmailJob)
 
 
 # Register Provider model
@@ -63,15 +65,16 @@ class ProviderAdmin(admin.ModelAdmin):
                 )
                 continue
 
-            provider.verified = True
-            provider.rejection_reason = None
-            provider.save()
+            with transaction.atomic():
+                provider.verified = True
+                provider.rejection_reason = None
+                provider.save()
 
-            # Send approval email via Celery
-            send_provider_approval_email.delay(
-                provider.username,
-                provider.email
-            )
+                # Sent by the outbox dispatcher once this commits
+                email_outbox.provider_approval_email(
+                    provider.username,
+                    provider.email
+                )
 
             updated += 1
 
@@ -93,16 +96,17 @@ class ProviderAdmin(admin.ModelAdmin):
         )
 
         for provider in queryset:
-            provider.verified = False
-            provider.rejection_reason = default_reason
-            provider.save()
-
-            # Send rejection email via Celery
-            send_provider_rejection_email.delay(
-                provider.username,
-                provider.email,
-                provider.rejection_reason
-            )
+            with transaction.atomic():
+                provider.verified = False
+                provider.rejection_reason = default_reason
+                provider.save()
+
+                # Sent by the outbox dispatcher once this commits
+                email_outbox.provider_rejection_email(
+                    provider.username,
+                    provider.email,
+                    provider.rejection_reason
+                )
 
             updated += 1
 
@@ -144,3 +148,19 @@ class ProviderAdmin(admin.ModelAdmin):
         """Show all providers (approved + pending)."""
         qs = super().get_queryset(request)
         return qs.order_by('verified')  # optional: pending first
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'status', 'priority', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'priority')
+    search_fields = ('to_email', 'subject', 'idempotency_key')
+    readonly_fields = ('idempotency_key', 'bulk_job', 'created_at', 'sent_at')
+    actions = ['requeue_emails']
+
+    def requeue_emails(self, request, queryset):
+        """Retry dead-lettered (or pending) emails now."""
+        updated = email_outbox.requeue(queryset)
+        self.message_user(request, f"{updated} email(s) requeued.", messages.SUCCESS)
+
+    requeue_emails.short_description = "Requeue selected emails"
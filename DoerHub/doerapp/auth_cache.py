@@ -0,0 +1,85 @@
+"""
+Cached JWT -> User resolution shared by REST and WebSocket authentication.
+
+A SimpleJWT access token is self-contained: once its signature and expiry
+check out, the only DB work left is loading the User. That User is cached
+by id, so a hot token costs a signature check and one cache read.
+
+The entry is keyed by user id rather than by token jti. The user_id claim
+is signed already, so a per-token entry would only duplicate it, and one
+key per user means a single delete invalidates all of that user's tokens.
+Each entry lives no longer than AUTH_USER_CACHE_TTL seconds or the
+remaining lifetime of the token that loaded it, whichever is shorter.
+Saving or deleting a User drops the entry (see models.py), so deactivation
+takes effect on the next request.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_ALIAS = getattr(settings, "AUTH_CACHE_ALIAS", "default")
+AUTH_USER_CACHE_TTL = getattr(settings, "AUTH_USER_CACHE_TTL", 300)
+
+
+def _user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_user(user_id):
+    try:
+        caches[AUTH_CACHE_ALIAS].delete(_user_key(user_id))
+    except Exception:
+        logger.exception("Could not drop cached auth user %s", user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication whose get_user() is served from the cache when possible."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        cache = caches[AUTH_CACHE_ALIAS]
+        key = _user_key(user_id)
+        try:
+            user = cache.get(key)
+        except Exception:
+            logger.exception("Auth cache read failed; falling back to the database")
+            return super().get_user(validated_token)
+        if user is not None:
+            return user
+
+        # DB lookup plus SimpleJWT's own checks (missing / inactive user)
+        user = super().get_user(validated_token)
+        ttl = min(AUTH_USER_CACHE_TTL, int(validated_token.get("exp", 0) - time.time()))
+        if ttl > 0:
+            try:
+                cache.set(key, user, ttl)
+            except Exception:
+                logger.exception("Auth cache write failed")
+        return user
+
+
+def authenticate_token(raw_token):
+    """Validate a raw (optionally "Bearer "-prefixed) access token; return the User or None."""
+    if not raw_token:
+        return None
+    raw_token = raw_token.strip()
+    if raw_token.lower().startswith("bearer "):
+        raw_token = raw_token.split(" ", 1)[1].strip()
+
+    auth = CachedJWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, Exception) as exc:
+        print("JWT validation failed:", exc)
+        return None
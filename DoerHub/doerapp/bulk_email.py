@@ -0,0 +1,113 @@
+"""
+Bulk email delivery (webinar join links).
+
+A BulkEmailJob is planned into chunks of BULK_EMAIL_CHUNK_SIZE
+registrations, and each chunk is a Celery task that writes its messages
+to the email outbox in one INSERT. The outbox dispatcher sends them in
+batches over pooled SMTP connections, retrying and dead-lettering per
+recipient, and reports back through record_delivery(). Progress is kept
+on the job row with F() counters so chunks and dispatchers can run in
+parallel.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .email_outbox import PRIORITY_BULK, enqueue_many
+from .models import BulkEmailJob, EmailOutbox, WebinarRegistration
+
+BULK_EMAIL_CHUNK_SIZE = getattr(settings, "BULK_EMAIL_CHUNK_SIZE", 100)
+
+
+def create_webinar_link_job(webinar, meeting_url, user):
+    """Create the job for sending `meeting_url` to every registrant of `webinar`."""
+    host = webinar.provider.get_full_name() or webinar.provider.username
+    return BulkEmailJob.objects.create(
+        created_by=user,
+        webinar=webinar,
+        subject=f"Your link for “{webinar.title}”",
+        body_template=(
+            f"Hi {{{{name}}}},\n\n"
+            f"You're registered for the webinar **{webinar.title}**.\n"
+            f"Join using the link below:\n\n"
+            f"{meeting_url}\n\n"
+            f"See you there!\n"
+            f"{host}"
+        ),
+        total=WebinarRegistration.objects.filter(webinar=webinar).count(),
+    )
+
+
+def plan_chunks(job):
+    """Registration id chunks of `job`; marks it running."""
+    ids = list(
+        WebinarRegistration.objects.filter(webinar_id=job.webinar_id)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    BulkEmailJob.objects.filter(pk=job.pk).update(status="running", total=len(ids))
+    if not ids:
+        _finish_if_complete(job.pk)
+    return [ids[i:i + BULK_EMAIL_CHUNK_SIZE] for i in range(0, len(ids), BULK_EMAIL_CHUNK_SIZE)]
+
+
+def enqueue_chunk(job, registration_ids):
+    """
+    Write the job's message for the given registrations to the outbox.
+    Keys are per (job, registration), so a re-run chunk adds nothing.
+    Returns the number of messages queued.
+    """
+    regs = list(WebinarRegistration.objects.filter(id__in=registration_ids).select_related("user"))
+    rows = [
+        EmailOutbox(
+            idempotency_key=f"bulk:{job.id}:{reg.id}",
+            to_email=reg.user.email,
+            subject=job.subject,
+            body=job.body_template.replace("{{name}}", reg.user.get_full_name() or reg.user.username),
+            priority=PRIORITY_BULK,
+            bulk_job=job,
+        )
+        for reg in regs
+    ]
+    with transaction.atomic():
+        enqueue_many(rows)
+        removed = len(set(registration_ids)) - len(regs)
+        if removed:  # unregistered since planning: nothing to send
+            BulkEmailJob.objects.filter(pk=job.pk).update(total=F("total") - removed)
+            _finish_if_complete(job.pk)
+    return len(rows)
+
+
+def record_delivery(job_id, sent=0, failed=0, error=None):
+    """
+    Count outbox results for a job (failed < 0 when dead rows are requeued);
+    `error` is the latest send error of one of its rows.
+    """
+    changes = {"sent": F("sent") + sent, "failed": F("failed") + failed}
+    if error:
+        changes["last_error"] = error
+    BulkEmailJob.objects.filter(pk=job_id).update(**changes)
+    if failed < 0:
+        BulkEmailJob.objects.filter(pk=job_id, status="done").update(status="running", finished_at=None)
+    _finish_if_complete(job_id)
+
+
+def _finish_if_complete(job_id):
+    BulkEmailJob.objects.filter(
+        pk=job_id, status="running", total__lte=F("sent") + F("failed")
+    ).update(status="done", finished_at=timezone.now())
+
+
+def job_status(job):
+    return {
+        "job_id": job.id,
+        "webinar": job.webinar_id,
+        "status": job.status,
+        "total": job.total,
+        "sent": job.sent,
+        "failed": job.failed,
+        "last_error": job.last_error or None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
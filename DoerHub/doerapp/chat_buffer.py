@@ -0,0 +1,156 @@
+"""
+Write-behind persistence for chat messages.
+
+With CHAT_WRITE_BEHIND["ENABLED"], ChatConsumer builds each Message (uuid
+and timestamp assigned up front), broadcasts it immediately and hands it
+to this per-process buffer. The buffer writes with bulk_create every
+BATCH_SIZE messages or FLUSH_INTERVAL_MS milliseconds, whichever comes
+first, so a chat burst costs one INSERT per batch instead of one
+thread-pool round trip per message.
+
+Batches are written one at a time in arrival order, so messages of a chat
+room are persisted in the order they were sent. A batch that fails is
+retried with later messages; after MAX_ATTEMPTS failures it is written row
+by row and rows that still fail (e.g. for a room deleted meanwhile) are
+logged and dropped, so one bad row cannot hold up the rest. Whatever is
+still buffered is written when the process exits.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import Message
+from .notification_store import save_chat_notifications
+
+logger = logging.getLogger(__name__)
+
+CHAT_WRITE_BEHIND = {
+    "ENABLED": False,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL_MS": 50,
+    "MAX_ATTEMPTS": 5,
+    **getattr(settings, "CHAT_WRITE_BEHIND", {}),
+}
+
+
+def _write_batch(messages, notifications):
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        if notifications:
+            # one row (or one UPDATE) per recipient and room, not per message
+            save_chat_notifications(notifications)
+
+
+def _write_rows(messages, notifications):
+    """Write a batch row by row; rows that still fail are logged and dropped."""
+    for message in messages:
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create([message])
+        except Exception:
+            logger.exception("Dropping chat message %s (room %s)", message.uuid, message.chatroom_id)
+    for notification in notifications:
+        try:
+            with transaction.atomic():
+                save_chat_notifications([notification])
+        except Exception:
+            logger.exception(
+                "Dropping chat notification for user %s (room %s)",
+                notification.recipient_id, notification.chatroom_id,
+            )
+
+
+class MessageWriteBuffer:
+    def __init__(self, batch_size, flush_interval_ms, max_attempts=5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_attempts = max_attempts
+        self._failures = 0  # consecutive failed flushes of the head of the buffer
+        self._messages = []
+        self._notifications = []
+        self._timer = None
+        self._flush_lock = None
+        # guards the lists against the atexit flush, which runs off-loop
+        self._mutex = threading.Lock()
+
+    async def add(self, message, notification=None):
+        with self._mutex:
+            self._messages.append(message)
+            if notification is not None:
+                self._notifications.append(notification)
+            pending = len(self._messages)
+
+        if pending >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.flush_interval, lambda: loop.create_task(self.flush()))
+
+    def _take(self):
+        with self._mutex:
+            messages, self._messages = self._messages, []
+            notifications, self._notifications = self._notifications, []
+        return messages, notifications
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        # one batch in flight at a time keeps per-room ordering
+        async with self._flush_lock:
+            messages, notifications = self._take()
+            if not messages and not notifications:
+                return
+            try:
+                await database_sync_to_async(_write_batch)(messages, notifications)
+                self._failures = 0
+            except Exception:
+                self._failures += 1
+                if self._failures >= self.max_attempts:
+                    logger.exception(
+                        "Chat write-behind flush failed %d times; writing %d message(s) one by one",
+                        self._failures, len(messages),
+                    )
+                    self._failures = 0
+                    await database_sync_to_async(_write_rows)(messages, notifications)
+                    return
+                logger.exception("Chat write-behind flush failed; requeueing %d message(s)", len(messages))
+                with self._mutex:
+                    self._messages[:0] = messages
+                    self._notifications[:0] = notifications
+                if self._timer is None:
+                    loop = asyncio.get_running_loop()
+                    self._timer = loop.call_later(self.flush_interval, lambda: loop.create_task(self.flush()))
+
+    def flush_sync(self):
+        """Write anything still buffered; used at process shutdown."""
+        messages, notifications = self._take()
+        if messages or notifications:
+            try:
+                _write_batch(messages, notifications)
+            except Exception:
+                logger.exception("Chat write-behind flush at exit failed; writing row by row")
+                _write_rows(messages, notifications)
+
+
+_buffer = None
+
+
+def get_message_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = MessageWriteBuffer(
+            CHAT_WRITE_BEHIND["BATCH_SIZE"],
+            CHAT_WRITE_BEHIND["FLUSH_INTERVAL_MS"],
+            CHAT_WRITE_BEHIND["MAX_ATTEMPTS"],
+        )
+        atexit.register(_buffer.flush_sync)
+    return _buffer
@@ -0,0 +1,168 @@
+"""
+Bounded cache of the most recent messages per ChatRoom.
+
+Serves chat history on (re)connect and ChatRoomDetailAPI without touching
+the DB. A room is either cold (get() returns None, caller loads from the
+DB and warm()s it) or warm (holds up to `size` latest messages and is
+appended to on every save). Appends to a cold room are still kept, just
+not served: warm() merges them with the DB snapshot (deduplicated on
+uuid, ordered by timestamp), so a message saved or buffered while the
+room was being loaded is never lost. Rooms idle for `idle_ttl` seconds
+are evicted.
+
+    CHAT_RECENT_CACHE = {
+        "BACKEND": "doerapp.chat_cache.RedisRecentMessages",
+        "OPTIONS": {"url": "redis://127.0.0.1:6379/2", "size": 50, "idle_ttl": 3600},
+    }
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from django.conf import settings
+
+from .utils import get_redis_connection, load_backend
+
+
+def merge_items(snapshot, present, size):
+    """
+    Latest `size` of `snapshot` (from the DB) and `present` (appended while
+    the room was cold), one per uuid, oldest first. The DB copy wins since
+    a buffered message has no id yet.
+    """
+    by_uuid = {item["uuid"]: item for item in present}
+    by_uuid.update((item["uuid"], item) for item in snapshot)
+    items = sorted(by_uuid.values(), key=lambda item: (datetime.fromisoformat(item["timestamp"]), item["uuid"]))
+    return items[-size:]
+
+
+class LocalRecentMessages:
+    """Per-process LRU of rooms, each a ring buffer of `size` messages."""
+
+    def __init__(self, size=50, idle_ttl=3600, max_rooms=10000):
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()  # chatroom_id -> (deque, last_access, warm)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._rooms:
+            room_id, (_, last_access, _) = next(iter(self._rooms.items()))
+            if len(self._rooms) <= self.max_rooms and now - last_access < self.idle_ttl:
+                break
+            del self._rooms[room_id]
+
+    def get(self, chatroom_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._rooms.get(chatroom_id)
+            if entry is None or not entry[2]:
+                return None
+            self._rooms[chatroom_id] = (entry[0], now, True)
+            self._rooms.move_to_end(chatroom_id)
+            return list(entry[0])
+
+    def warm(self, chatroom_id, items):
+        """Mark the room warm with `items` plus any cold appends; returns what it now holds."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rooms.get(chatroom_id)
+            present = list(entry[0]) if entry is not None else []
+            merged = merge_items(items, present, self.size)
+            self._rooms[chatroom_id] = (deque(merged, maxlen=self.size), now, True)
+            self._rooms.move_to_end(chatroom_id)
+            self._evict(now)
+        return merged
+
+    def append(self, chatroom_id, item):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rooms.get(chatroom_id)
+            if entry is None:
+                # cold: kept for warm() to merge, not served before that
+                entry = (deque(maxlen=self.size), now, False)
+            entry[0].append(item)
+            self._rooms[chatroom_id] = (entry[0], now, entry[2])
+            self._rooms.move_to_end(chatroom_id)
+            self._evict(now)
+
+
+class RedisRecentMessages:
+    """
+    One Redis list per room, trimmed to `size` and expiring after
+    `idle_ttl`, plus a marker key that is set once the room is warm.
+    """
+
+    def __init__(self, url="redis://127.0.0.1:6379/2", size=50, idle_ttl=3600, prefix="doerhub:chat"):
+        self.redis = get_redis_connection(url)
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+
+    def _key(self, chatroom_id):
+        return f"{self.prefix}:{chatroom_id}:recent"
+
+    def _warm_key(self, chatroom_id):
+        return f"{self.prefix}:{chatroom_id}:warm"
+
+    def get(self, chatroom_id):
+        key, warm_key = self._key(chatroom_id), self._warm_key(chatroom_id)
+        pipe = self.redis.pipeline()
+        pipe.exists(warm_key)
+        pipe.lrange(key, 0, -1)
+        pipe.expire(key, self.idle_ttl)
+        pipe.expire(warm_key, self.idle_ttl)
+        warm, raw = pipe.execute()[:2]
+        if not warm:
+            return None
+        return [json.loads(item) for item in raw]
+
+    def warm(self, chatroom_id, items):
+        from redis.exceptions import WatchError
+
+        key, warm_key = self._key(chatroom_id), self._warm_key(chatroom_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    # merge with appends that landed while we read the DB;
+                    # retried if another one lands before we write
+                    pipe.watch(key)
+                    present = [json.loads(item) for item in pipe.lrange(key, 0, -1)]
+                    merged = merge_items(items, present, self.size)
+                    pipe.multi()
+                    pipe.delete(key)
+                    if merged:
+                        pipe.rpush(key, *[json.dumps(item) for item in merged])
+                        pipe.expire(key, self.idle_ttl)
+                    pipe.set(warm_key, 1, ex=self.idle_ttl)
+                    pipe.execute()
+                    return merged
+                except WatchError:
+                    continue
+
+    def append(self, chatroom_id, item):
+        key = self._key(chatroom_id)
+        pipe = self.redis.pipeline()
+        # appended cold or warm; a cold list is merged by warm(), not served
+        pipe.rpush(key, json.dumps(item))
+        pipe.ltrim(key, -self.size, -1)
+        pipe.expire(key, self.idle_ttl)
+        pipe.expire(self._warm_key(chatroom_id), self.idle_ttl)
+        pipe.execute()
+
+
+_cache = None
+
+
+def get_recent_messages():
+    global _cache
+    if _cache is None:
+        _cache = load_backend(
+            getattr(settings, "CHAT_RECENT_CACHE", None),
+            "doerapp.chat_cache.LocalRecentMessages",
+        )
+    return _cache
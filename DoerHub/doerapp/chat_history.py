@@ -0,0 +1,133 @@
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+from .chat_cache import get_recent_messages
+from .models import Message
+
+CHAT_HISTORY_PAGE_SIZE = getattr(settings, "CHAT_HISTORY_PAGE_SIZE", 50)
+CHAT_HISTORY_MAX_PAGE_SIZE = getattr(settings, "CHAT_HISTORY_MAX_PAGE_SIZE", 200)
+
+
+def clamp_limit(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return CHAT_HISTORY_PAGE_SIZE
+    return max(1, min(limit, CHAT_HISTORY_MAX_PAGE_SIZE))
+
+
+def parse_before(value):
+    """
+    A history cursor from a client: a message id (int) or, for messages
+    still in the write-behind buffer that have no id yet, a message uuid.
+    Returns None when missing; raises ValueError when malformed.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    return uuid.UUID(str(value))
+
+
+def _cursor_position(chatroom_id, before):
+    """(timestamp, uuid) of the cursor message, or None if it is unknown."""
+    lookup = {"uuid": before} if isinstance(before, uuid.UUID) else {"pk": before}
+    position = (
+        Message.objects.filter(chatroom_id=chatroom_id, **lookup)
+        .values_list("timestamp", "uuid")
+        .first()
+    )
+    if position is None and isinstance(before, uuid.UUID):
+        # not flushed yet: buffered messages are in the recent cache
+        for item in get_recent_messages().get(chatroom_id) or []:
+            if item["uuid"] == str(before):
+                return datetime.fromisoformat(item["timestamp"]), before
+    return position
+
+
+def messages_before(chatroom_id, before=None, limit=CHAT_HISTORY_PAGE_SIZE):
+    """
+    Keyset page of a room's messages: the `limit` messages sent just before
+    message `before` (an id or uuid, see parse_before; the latest ones when
+    None), oldest first, plus whether older messages exist.
+
+    Walks the (chatroom, timestamp, uuid) index from the cursor, so the cost
+    does not depend on how long the chat is. Pages are keyed on (timestamp,
+    uuid) rather than id because both are set before a message is saved, so
+    buffered messages work as cursors too.
+    """
+    qs = (
+        Message.objects.filter(chatroom_id=chatroom_id)
+        .select_related("sender")
+        .only("id", "uuid", "content", "timestamp", "chatroom_id", "sender__id", "sender__username")
+    )
+    if before is not None:
+        position = _cursor_position(chatroom_id, before)
+        if position is None:
+            return [], False
+        timestamp, cursor_uuid = position
+        qs = qs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, uuid__lt=cursor_uuid))
+
+    page = list(qs.order_by("-timestamp", "-uuid")[: limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+    return page, has_more
+
+
+def history_item(msg):
+    """
+    Cached / WebSocket representation of a message (sender is the username).
+    `msg.id` is None for messages still waiting in the write-behind buffer;
+    their uuid is the history cursor.
+    """
+    return {
+        "id": msg.id,
+        "uuid": str(msg.uuid),
+        "sender_id": msg.sender_id,
+        "sender": msg.sender.username,
+        "content": msg.content,
+        "timestamp": msg.timestamp.isoformat(),
+    }
+
+
+def rest_item(item):
+    """Convert a history_item() dict to the MessageSerializer shape."""
+    return {
+        "id": item["id"],
+        "uuid": item["uuid"],
+        "sender": item["sender_id"],
+        "sender_name": item["sender"],
+        "content": item["content"],
+        "timestamp": item["timestamp"],
+    }
+
+
+def recent_history(chatroom_id, limit=CHAT_HISTORY_PAGE_SIZE):
+    """
+    Latest `limit` messages as history_item() dicts, oldest first, plus
+    whether older messages exist. Served from the recent-message cache;
+    on a miss the room is loaded from the DB and the cache warmed.
+    """
+    cache = get_recent_messages()
+    if limit > cache.size:
+        page, has_more = messages_before(chatroom_id, limit=limit)
+        return [history_item(msg) for msg in page], has_more
+
+    items = cache.get(chatroom_id)
+    if items is not None:
+        # a full buffer may have older messages behind it
+        return items[-limit:], len(items) > limit or len(items) >= cache.size
+
+    page, has_more = messages_before(chatroom_id, limit=cache.size)
+    # messages saved while we read the DB are merged in by warm()
+    items = cache.warm(chatroom_id, [history_item(msg) for msg in page])
+    return items[-limit:], has_more or len(items) > limit
+
+
+def remember_message(msg):
+    """Append a just-saved (or just-buffered) message to its room's cache."""
+    get_recent_messages().append(msg.chatroom_id, history_item(msg))
@@ -1,17 +1,24 @@
-import json
+import asyncio
 from urllib.parse import parse_qs
 
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AnonymousUser
-
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-
-from .models import Provider, ChatRoom, Message, Notification
+from django.db.models import Q
+
+from .auth_cache import authenticate_token
+from .geo import cell_group_name, geo_cell, haversine_km
+from .chat_buffer import CHAT_WRITE_BEHIND, get_message_buffer
+from .chat_history import (
+    CHAT_HISTORY_PAGE_SIZE, clamp_limit, history_item, messages_before, parse_before, recent_history,
+    remember_message,
+)
+from .location_store import get_location_store
+from .presence import PRESENCE_HEARTBEAT_SECONDS, get_presence
+from .models import Provider, ChatRoom, Message, ServiceRequest
+from .notification_store import chat_notification, replay_since, save_chat_notifications, user_group
 
 User = get_user_model()
 
@@ -21,54 +28,133 @@ User = get_user_model()
 
 @database_sync_to_async
 def _validate_jwt_and_get_user(token: str):
-    """Validate SimpleJWT token and return user instance."""
-    try:
-        if not token:
-            return None
-        token = token.strip()
-        if token.lower().startswith("bearer "):
-            token = token.split(" ", 1)[1].strip()
+    """Validate SimpleJWT token and return user instance (cached, see auth_cache)."""
+    return authenticate_token(token)
+
 
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        user = jwt_auth.get_user(validated_token)
+async def _get_connection_user(scope):
+    """
+    The user TokenAuthMiddlewareStack resolved for this connection, falling
+    back to validating ?token= when the consumer is mounted without it.
+    """
+    user = scope.get("user")
+    if user is not None and user.is_authenticated:
         return user
-    except (InvalidToken, TokenError, Exception) as exc:
-        print("JWT validation failed:", exc)
-        return None
+    params = parse_qs(scope.get("query_string", b"").decode())
+    return await _validate_jwt_and_get_user(params.get("token", [None])[0])
 
 
 @database_sync_to_async
-def _provider_exists_for_user(user, provider_id):
+def _get_owned_provider(user, provider_id=None):
+    """
+    Return a plain dict describing provider_id (or the user's own provider
+    when None) if it belongs to user, else None.
+    """
+    filters = {"user": user}
+    if provider_id is not None:
+        filters["id"] = provider_id
     try:
-        return Provider.objects.filter(user=user, id=provider_id).exists()
-    except Exception:
-        return False
+        provider = Provider.objects.get(**filters)
+    except (Provider.DoesNotExist, ValueError):
+        return None
+    return {
+        "id": provider.id,
+        "category_id": provider.service_category_id,
+        "verified": provider.verified,
+        "location": (
+            (provider.location_lat, provider.location_lon)
+            if provider.location_lat is not None and provider.location_lon is not None
+            else None
+        ),
+    }
 
 
 @database_sync_to_async
-def _set_provider_online(provider_id, is_online: bool):
-    try:
-        p = Provider.objects.get(id=provider_id)
-        p.is_online = is_online
-        p.save(update_fields=["is_online"])
-    except Provider.DoesNotExist:
-        pass
+def _get_live_location(provider_id):
+    return get_location_store().get(provider_id)
 
 
 @database_sync_to_async
-def _get_chatroom(chatroom_id):
-    try:
-        return ChatRoom.objects.get(pk=chatroom_id)
-    except ChatRoom.DoesNotExist:
+def _presence_connect(provider_id, connection_id):
+    """Register a provider socket (matching reads presence directly)."""
+    presence = get_presence()
+    presence.connect(provider_id, connection_id)
+    presence.maybe_sync()
+
+
+@database_sync_to_async
+def _presence_heartbeat(provider_id, connection_id):
+    presence = get_presence()
+    alive = presence.heartbeat(provider_id, connection_id)
+    presence.maybe_sync()
+    return alive
+
+
+@database_sync_to_async
+def _presence_disconnect(provider_id, connection_id):
+    presence = get_presence()
+    presence.disconnect(provider_id, connection_id)
+    presence.maybe_sync()
+
+
+async def _keep_present(provider_id, connection_id):
+    """Heartbeat a socket's presence until cancelled or the connection is cleared."""
+    while await _presence_heartbeat(provider_id, connection_id):
+        await asyncio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+
+
+@database_sync_to_async
+def _load_chat_context(user_id, chatroom_id):
+    """
+    Resolve everything a chat socket needs in one query: whether user_id may
+    join, the other participant's user id and the Provider id behind
+    chat.provider (for provider_notify_<id>). Returns None if not allowed.
+    """
+    row = (
+        ChatRoom.objects.filter(pk=chatroom_id)
+        .values("id", "user_id", "provider_id", "provider__provider__id")
+        .first()
+    )
+    if row is None:
         return None
 
+    user_id = int(user_id)
+    if user_id == row["user_id"]:
+        recipient_id = row["provider_id"]
+    elif user_id == row["provider_id"]:
+        recipient_id = row["user_id"]
+    else:
+        return None
+
+    return {
+        "chatroom_id": row["id"],
+        "group_name": f"chat_{row['id']}",
+        "recipient_id": recipient_id,
+        "provider_id": row["provider__provider__id"],
+    }
+
 
 @database_sync_to_async
-def _save_chat_message(chatroom_id, user, content):
-    chatroom = ChatRoom.objects.get(pk=chatroom_id)
-    msg = Message.objects.create(chatroom=chatroom, sender=user, content=content)
+def _can_watch_request(user_id, request_id):
+    """Only the requester and the assigned provider may follow a request's status."""
+    return ServiceRequest.objects.filter(
+        Q(user_id=user_id) | Q(provider__user_id=user_id), pk=request_id
+    ).exists()
+
+
+def _build_chat_rows(chat, user, content):
+    """Unsaved Message (uuid + timestamp already set) and recipient Notification."""
+    msg = Message(chatroom_id=chat["chatroom_id"], sender=user, content=content)
+    notif = None
+    if chat["recipient_id"] and chat["recipient_id"] != user.id:
+        notif = chat_notification(chat["recipient_id"], chat["chatroom_id"], user.username, content)
+    return msg, notif
+
+
+def _chat_payload(msg, user):
     return {
+        "id": msg.id,
+        "uuid": str(msg.uuid),
         "content": msg.content,
         "sender_name": user.username,
         "timestamp": msg.timestamp.isoformat(),
@@ -76,33 +162,23 @@ def _save_chat_message(chatroom_id, user, content):
 
 
 @database_sync_to_async
-def _create_notification(sender, recipient, message, extra_data=None, notif_type="chat"):
-    Notification.objects.create(
-        type=notif_type,
-        message=message[:100],
-        recipient=recipient,
-        extra_data=(extra_data or {}),
-        is_read=False,
-    )
+def _save_chat_message(chat, user, content):
+    """Insert the message and coalesce it into the recipient's chat notification."""
+    msg, notif = _build_chat_rows(chat, user, content)
+    msg.save()
+    if notif is not None:
+        save_chat_notifications([notif])
+    remember_message(msg)
+    return _chat_payload(msg, user)
 
 
 @database_sync_to_async
-def _get_chat_history(chatroom_id, limit=50):
-    """Fetch last <limit> messages from DB."""
-    try:
-        chat = ChatRoom.objects.get(pk=chatroom_id)
-        messages = Message.objects.filter(chatroom=chat).order_by("-timestamp")[:limit]
-        # Reverse order (oldest first)
-        return [
-            {
-                "sender": msg.sender.username,
-                "content": msg.content,
-                "timestamp": msg.timestamp.isoformat(),
-            }
-            for msg in reversed(messages)
-        ]
-    except ChatRoom.DoesNotExist:
-        return []
+def _get_chat_history(chatroom_id, before=None, limit=CHAT_HISTORY_PAGE_SIZE):
+    """Fetch a keyset page of messages (oldest first) and whether older ones exist."""
+    if before is None:
+        return recent_history(chatroom_id, limit)
+    page, has_more = messages_before(chatroom_id, before=before, limit=limit)
+    return [history_item(msg) for msg in page], has_more
 
 
 # ============================================================================
@@ -119,23 +195,16 @@ class ProviderRequestConsumer(AsyncJsonWebsocketConsumer):
             await self.close(code=4003)
             return
 
-        params = parse_qs(self.scope.get("query_string", b"").decode())
-        token = params.get("token", [None])[0]
-        if not token:
-            print("❌ No token in query")
-            await self.close(code=4003)
-            return
-
-        # validate JWT
-        user = await _validate_jwt_and_get_user(token)
+        # resolved once per connection by TokenAuthMiddlewareStack
+        user = await _get_connection_user(self.scope)
         if not user:
             print(f"❌ Invalid token for provider {self.provider_id}")
             await self.close(code=4003)
             return
 
         # check ownership
-        owns = await _provider_exists_for_user(user, self.provider_id)
-        if not owns:
+        self.provider = await _get_owned_provider(user, self.provider_id)
+        if not self.provider:
             print(f"❌ User {user.id} not owner of provider {self.provider_id}")
             await self.close(code=4003)
             return
@@ -143,11 +212,19 @@ class ProviderRequestConsumer(AsyncJsonWebsocketConsumer):
         # join groups
         self.group_request = f"provider_{self.provider_id}"
         self.group_notify = f"provider_notify_{self.provider_id}"
+        self.group_cell = None
         await self.channel_layer.group_add(self.group_request, self.channel_name)
         await self.channel_layer.group_add(self.group_notify, self.channel_name)
 
+        # join the (category, geo cell) group new requests are published to
+        location = await _get_live_location(self.provider_id) or self.provider["location"]
+        if location:
+            await self._join_cell(geo_cell(*location))
+
         await self.accept()
-        await _set_provider_online(self.provider_id, True)
+        # one presence connection per socket: other tabs keep the provider online
+        await _presence_connect(self.provider_id, self.channel_name)
+        self.presence_task = asyncio.create_task(_keep_present(self.provider_id, self.channel_name))
 
         print(f"✅ Provider {self.provider_id} connected (user {user.id})")
 
@@ -159,14 +236,46 @@ class ProviderRequestConsumer(AsyncJsonWebsocketConsumer):
     async def disconnect(self, close_code):
         print(f"⚠️ Provider {self.provider_id} disconnected, code={close_code}")
         try:
-            await _set_provider_online(self.provider_id, False)
+            self.presence_task.cancel()
+            await _presence_disconnect(self.provider_id, self.channel_name)
             await self.channel_layer.group_discard(self.group_request, self.channel_name)
             await self.channel_layer.group_discard(self.group_notify, self.channel_name)
+            await self._join_cell(None)
         except Exception:
             pass
 
+    async def _join_cell(self, cell):
+        """Move this socket to the request group of `cell` (None leaves it)."""
+        group = None
+        if cell and self.provider["verified"] and self.provider["category_id"]:
+            group = cell_group_name(self.provider["category_id"], cell)
+        if group == self.group_cell:
+            return
+        if self.group_cell:
+            await self.channel_layer.group_discard(self.group_cell, self.channel_name)
+        if group:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.group_cell = group
+
+    async def provider_cell(self, event):
+        """Sent by ProviderLocationUpdateAPI when the provider crosses into a new cell."""
+        await self._join_cell(event.get("cell"))
+
     async def new_request(self, event):
         """Broadcast new service requests to provider."""
+        # Cell broadcasts reach every provider in the covering cells; only
+        # forward requests that are really within range of this provider
+        # and weren't already offered to it by an earlier wave.
+        if int(self.provider_id) in event.get("exclude", ()):
+            return
+        if event.get("radius_km") is not None:
+            location = await _get_live_location(self.provider_id) or self.provider["location"]
+            if not location:
+                return
+            distance = haversine_km(location[0], location[1], event["lat"], event["lon"])
+            if distance > event["radius_km"]:
+                return
+
         await self.send_json({
             "type": "new_request",
             "request_id": event.get("request_id"),
@@ -183,6 +292,13 @@ class ProviderRequestConsumer(AsyncJsonWebsocketConsumer):
             "sender": event.get("sender"),
         })
 
+    async def unread_count(self, event):
+        """Unread notification count changed (see notification_counters)."""
+        await self.send_json({
+            "type": "unread_count",
+            "count": event.get("count"),
+        })
+
 
 # ============================================================================
 # 💬 ChatConsumer
@@ -196,30 +312,28 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             await self.close()
             return
 
-        params = parse_qs(self.scope.get("query_string", b"").decode())
-        token = params.get("token", [None])[0]
-        self.user = await _validate_jwt_and_get_user(token)
+        self.user = await _get_connection_user(self.scope)
 
         if not self.user:
             print("❌ Chat connect rejected: invalid/missing token")
             await self.close()
             return
 
-        # async-safe check (no direct ORM access here)
-        allowed = await self._user_allowed_in_chat(self.user.id, self.chatroom_id)
-        if not allowed:
+        # Resolve membership, recipient and provider once per connection
+        self.chat = await _load_chat_context(self.user.id, self.chatroom_id)
+        if not self.chat:
             print(f"❌ User {self.user.id} not allowed in chat {self.chatroom_id}")
             await self.close()
             return
 
-        self.group_name = f"chat_{self.chatroom_id}"
+        self.group_name = self.chat["group_name"]
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
         print(f"✅ Chat connected: user {self.user.id} in room {self.chatroom_id}")
 
         # Send chat history (uses async-safe helper)
-        history = await _get_chat_history(self.chatroom_id)
-        await self.send_json({"type": "chat_history", "messages": history})
+        history, has_more = await _get_chat_history(self.chatroom_id)
+        await self.send_json({"type": "chat_history", "messages": history, "has_more": has_more})
 
         # Connection confirmation
         await self.send_json({
@@ -227,70 +341,70 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             "message": f"Connected to chat {self.chatroom_id}"
         })
 
-    @database_sync_to_async
-    def _user_allowed_in_chat(self, user_id, chatroom_id):
-        """
-        Return True if user_id is either chat.user or chat.provider.
-        Use select_related to avoid extra queries.
-        """
-        try:
-            chatroom = ChatRoom.objects.select_related("user", "provider").get(pk=chatroom_id)
-            # compare by id to avoid lazy FK evaluation in async context
-            user_is_user = getattr(chatroom.user, "id", None) == int(user_id)
-            provider_obj = getattr(chatroom, "provider", None)
-            # provider could be a User or Provider instance depending on your model
-            provider_id = None
-            if provider_obj is not None:
-                provider_id = getattr(provider_obj, "id", None)
-            user_is_provider = provider_id == int(user_id)
-            return user_is_user or user_is_provider
-        except ChatRoom.DoesNotExist:
-            return False
-
     async def disconnect(self, close_code):
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
         print(f"⚠️ Chat disconnected (room {self.chatroom_id})")
 
     async def receive_json(self, content):
+        if content.get("action") == "load_history":
+            await self._send_history_page(self.chat, content)
+            return
+
         message_text = (content.get("message") or "").strip()
         if not message_text:
             return
+        await self._handle_chat_message(self.chat, message_text)
+
+    async def _send_history_page(self, chat, content):
+        """{"action": "load_history", "before": <message id or uuid>, "limit": n} -> older page."""
+        try:
+            before = parse_before(content.get("before"))
+        except (TypeError, ValueError):
+            before = None
+        history, has_more = await _get_chat_history(
+            chat["chatroom_id"], before=before, limit=clamp_limit(content.get("limit"))
+        )
+        await self.send_json({
+            "type": "chat_history_page",
+            "chatroom_id": chat["chatroom_id"],
+            "before": before,
+            "messages": history,
+            "has_more": has_more,
+        })
 
-        # 1️⃣ Save message (this is async-safe; _save_chat_message is a db helper)
-        saved = await _save_chat_message(self.chatroom_id, self.user, message_text)
+    async def _handle_chat_message(self, chat, message_text):
+        # 1️⃣ Save message + recipient notification (participants cached at connect).
+        # In write-behind mode the rows are buffered and bulk-inserted later.
+        if CHAT_WRITE_BEHIND["ENABLED"]:
+            msg, notif = _build_chat_rows(chat, self.user, message_text)
+            await get_message_buffer().add(msg, notif)
+            await sync_to_async(remember_message, thread_sensitive=False)(msg)
+            saved = _chat_payload(msg, self.user)
+        else:
+            saved = await _save_chat_message(chat, self.user, message_text)
 
         # 2️⃣ Broadcast to chat group (async)
         await self.channel_layer.group_send(
-            self.group_name,
+            chat["group_name"],
             {
                 "type": "chat_message",
+                "chatroom_id": chat["chatroom_id"],
+                "id": saved["id"],
+                "uuid": saved["uuid"],
                 "message": saved["content"],
                 "sender": saved["sender_name"],
                 "timestamp": saved["timestamp"],
             },
         )
 
-        # 3️⃣ Notify recipient (async-safe helper returns recipient user id)
-        recipient_user_id = await self._get_recipient_user_id(self.user.id, self.chatroom_id)
-        if recipient_user_id and recipient_user_id != self.user.id:
-            # create notification via async-safe DB helper (works with ids)
-            await self._create_notification_by_ids(
-                sender_id=self.user.id,
-                recipient_id=recipient_user_id,
-                message=message_text,
-                extra_data={"sender": self.user.username, "chatroom_id": self.chatroom_id},
-                notif_type="chat",
-            )
-
-        # 4️⃣ Notify provider dashboard if applicable (async-safe)
-        provider_id = await self._get_provider_id_for_chat(self.chatroom_id)
-        if provider_id:
+        # 3️⃣ Notify provider dashboard if applicable
+        if chat["provider_id"]:
             await self.channel_layer.group_send(
-                f"provider_notify_{provider_id}",
+                f"provider_notify_{chat['provider_id']}",
                 {
                     "type": "new_chat_notification",
-                    "chatroom_id": self.chatroom_id,
+                    "chatroom_id": chat["chatroom_id"],
                     "message": saved["content"],
                     "sender": saved["sender_name"],
                 },
@@ -299,95 +413,13 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
     async def chat_message(self, event):
         await self.send_json({
             "type": "chat_message",
+            "id": event.get("id"),
+            "uuid": event.get("uuid"),
             "message": event["message"],
             "sender": event["sender"],
             "timestamp": event["timestamp"],
         })
 
-    # ----------------- Async-safe DB helpers used by this consumer -----------------
-
-    @database_sync_to_async
-    def _get_recipient_user_id(self, sender_id, chatroom_id):
-        """
-        Return the user id of the recipient (the OTHER participant).
-        This returns a plain integer (or None), so no ORM access happens on the async side.
-        """
-        try:
-            chat = ChatRoom.objects.select_related("user", "provider").get(pk=chatroom_id)
-            user_obj = getattr(chat, "user", None)
-            provider_obj = getattr(chat, "provider", None)
-
-            # Compare by id (be defensive if provider_obj is a Provider model or User)
-            if user_obj and getattr(user_obj, "id", None) == int(sender_id):
-                # sender is chat.user -> recipient is provider
-                # provider_obj might be Provider or User. If Provider, return its user id if linked,
-                # otherwise return provider_obj.id (if it's a User).
-                # Try common patterns:
-                if provider_obj is None:
-                    return None
-                # If provider_obj is a Provider model that links to user via provider_obj.user:
-                if hasattr(provider_obj, "user"):
-                    return getattr(provider_obj.user, "id", None)
-                return getattr(provider_obj, "id", None)
-
-            elif provider_obj and getattr(provider_obj, "id", None) == int(sender_id):
-                # sender is provider (provider_obj is probably a Provider instance)
-                # recipient is chat.user
-                return getattr(user_obj, "id", None)
-
-            # fallback: check if chat.provider is a User instance (not Provider)
-            if provider_obj and getattr(provider_obj, "id", None) == int(sender_id):
-                return getattr(user_obj, "id", None)
-
-            return None
-        except ChatRoom.DoesNotExist:
-            return None
-
-    @database_sync_to_async
-    def _create_notification_by_ids(self, sender_id, recipient_id, message, extra_data=None, notif_type="chat"):
-        """
-        Create a Notification given sender and recipient user IDs.
-        We fetch User objects inside this sync function and create the Notification record.
-        """
-        try:
-            sender_user = User.objects.get(id=sender_id)
-            recipient_user = User.objects.get(id=recipient_id)
-            Notification.objects.create(
-                type=notif_type,
-                message=message[:100],
-                recipient=recipient_user,
-                extra_data=(extra_data or {}),
-                is_read=False,
-            )
-        except Exception as exc:
-            # swallow to avoid crashing the consumer; log if needed
-            print("⚠️ _create_notification_by_ids error:", exc)
-
-    @database_sync_to_async
-    def _get_provider_id_for_chat(self, chatroom_id):
-        """
-        Return provider.id (the Provider model id) for this chatroom, if any.
-        Tries to handle cases where chat.provider might be a User or Provider.
-        """
-        try:
-            chat = ChatRoom.objects.select_related("provider").get(pk=chatroom_id)
-            provider_obj = getattr(chat, "provider", None)
-            if provider_obj is None:
-                return None
-
-            # If provider_obj is a Provider model instance with an 'id' attribute:
-            if provider_obj.__class__.__name__.lower() == "provider":
-                return getattr(provider_obj, "id", None)
-
-            # If provider_obj is a User instance, try to find Provider model linked to it.
-            try:
-                prov = Provider.objects.filter(user=provider_obj).first()
-                return getattr(prov, "id", None) if prov else None
-            except Exception:
-                return None
-        except ChatRoom.DoesNotExist:
-            return None
-
 # ============================================================================
 # 👤 UserRequestConsumer (unchanged)
 # ============================================================================
@@ -425,12 +457,269 @@ class ServiceRequestConsumer(AsyncJsonWebsocketConsumer):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def request_accepted(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_json({
             "type": "request.accepted",
             "chatroom_id": event["chatroom_id"]
-        }))
+        })
 
     async def request_rejected(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_json({
             "type": "request.rejected"
-        }))
+        })
+
+    async def request_expired(self, event):
+        await self.send_json({
+            "type": "request.expired",
+            "request_id": event["request_id"],
+        })
+
+
+# ============================================================================
+# 🔔 NotificationConsumer
+# ============================================================================
+
+@database_sync_to_async
+def _replay_notifications(user, since_id):
+    return replay_since(user, since_id)
+
+
+def _parse_since(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live notification feed: ws/notifications/?token=<jwt>&since=<notification_id>
+
+    With `since`, everything missed after that notification is replayed
+    first ({"type": "replay", "notifications": [...], "truncated": bool}),
+    then new and coalesced notifications arrive as
+    {"type": "notification", "notification": {...}}. Every notification
+    carries its real id, so clients deduplicate replayed vs live ones and
+    reconnect with the last id they saw.
+    """
+
+    async def connect(self):
+        self.user = await _get_connection_user(self.scope)
+        if not self.user:
+            print("❌ Notification connect rejected: invalid/missing token")
+            await self.close(code=4003)
+            return
+
+        self.groups = [user_group(self.user.id), "notifications"]
+        for group in self.groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+        print(f"✅ Notifications connected: user {self.user.id}")
+
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        since = _parse_since(params.get("since", [None])[0])
+        if since is not None:
+            notifications, truncated = await _replay_notifications(self.user, since)
+            await self.send_json({"type": "replay", "notifications": notifications, "truncated": truncated})
+        await self.send_json({"type": "connected", "user_id": self.user.id})
+
+    async def disconnect(self, close_code):
+        for group in getattr(self, "groups", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def notification_message(self, event):
+        await self.send_json({"type": "notification", "notification": event["notification"]})
+
+
+# ============================================================================
+# 🔀 MultiplexConsumer
+# ============================================================================
+
+class MultiplexConsumer(AsyncJsonWebsocketConsumer):
+    """
+    One authenticated socket per client carrying several logical streams:
+
+        "requests"            provider feed (new requests, chat notifications)
+        "chat:<id>"           a chat room (history, messages, sending)
+        "notifications"       user_<id> updates and the live notification feed
+        "request_status:<id>" accept / reject / expiry of a service request
+
+    Client -> server:
+        {"action": "subscribe", "stream": "chat:12"}
+        {"action": "subscribe", "stream": "notifications", "since": 981}
+        {"action": "unsubscribe", "stream": "chat:12"}
+        {"stream": "chat:12", "message": "hi"}
+        {"stream": "chat:12", "action": "load_history", "before": 345}
+
+    Server -> client: {"stream": "<stream>", "payload": {...}} where payload
+    is exactly what the single-purpose consumer would have sent.
+    """
+
+    # Handlers are shared with the single-purpose consumers; only the
+    # envelope (see send_json) differs.
+    _join_cell = ProviderRequestConsumer._join_cell
+    provider_cell = ProviderRequestConsumer.provider_cell
+    new_request = ProviderRequestConsumer.new_request
+    new_chat_notification = ProviderRequestConsumer.new_chat_notification
+    unread_count = ProviderRequestConsumer.unread_count
+    chat_message = ChatConsumer.chat_message
+    _send_history_page = ChatConsumer._send_history_page
+    _handle_chat_message = ChatConsumer._handle_chat_message
+    send_update = UserRequestConsumer.send_update
+    request_accepted = ServiceRequestConsumer.request_accepted
+    request_rejected = ServiceRequestConsumer.request_rejected
+    request_expired = ServiceRequestConsumer.request_expired
+    notification_message = NotificationConsumer.notification_message
+
+    # channel-layer event type -> stream it belongs to
+    EVENT_STREAMS = {
+        "provider_cell": lambda event: "requests",
+        "new_request": lambda event: "requests",
+        "new_chat_notification": lambda event: "requests",
+        "unread_count": lambda event: "notifications",
+        "chat_message": lambda event: f"chat:{event.get('chatroom_id')}",
+        "send_update": lambda event: "notifications",
+        "notification_message": lambda event: "notifications",
+        "request_accepted": lambda event: f"request_status:{event.get('request_id')}",
+        "request_rejected": lambda event: f"request_status:{event.get('request_id')}",
+        "request_expired": lambda event: f"request_status:{event.get('request_id')}",
+    }
+
+    async def connect(self):
+        self.user = await _get_connection_user(self.scope)
+        if not self.user:
+            print("❌ Multiplex connect rejected: invalid/missing token")
+            await self.close(code=4003)
+            return
+
+        self.stream = None
+        self.groups_by_stream = {}   # stream -> [group, ...]
+        self.chats = {}              # chatroom_id -> chat context
+        self.provider = None
+        self.provider_id = None
+        self.group_cell = None
+
+        await self.accept()
+        print(f"✅ Multiplex connected: user {self.user.id}")
+        await self.send_json({"type": "connected", "user_id": self.user.id})
+
+    async def disconnect(self, close_code):
+        print(f"⚠️ Multiplex disconnected (user {getattr(self.user, 'id', None)}), code={close_code}")
+        for stream in list(getattr(self, "groups_by_stream", {})):
+            try:
+                await self._unsubscribe(stream)
+            except Exception:
+                pass
+
+    async def dispatch(self, message):
+        # Messages are handled one at a time, so the stream of the event
+        # being handled can live on the instance for send_json to pick up.
+        handler = message["type"].replace(".", "_")
+        stream_for = self.EVENT_STREAMS.get(handler)
+        self.stream = stream_for(message) if stream_for else None
+        try:
+            await super().dispatch(message)
+        finally:
+            self.stream = None
+
+    async def send_json(self, content, close=False):
+        if self.stream is not None:
+            content = {"stream": self.stream, "payload": content}
+        await super().send_json(content, close=close)
+
+    async def _reply(self, stream, payload):
+        self.stream = stream
+        await self.send_json(payload)
+
+    # ----------------- Client messages -----------------
+
+    async def receive_json(self, content):
+        stream = content.get("stream")
+        action = content.get("action")
+        if not isinstance(stream, str):
+            await self._reply(None, {"type": "error", "message": "stream required"})
+            return
+
+        if action == "subscribe":
+            await self._subscribe(stream, since=_parse_since(content.get("since")))
+        elif action == "unsubscribe":
+            await self._unsubscribe(stream)
+            await self._reply(stream, {"type": "unsubscribed"})
+        elif stream not in self.groups_by_stream:
+            await self._reply(stream, {"type": "error", "message": "not subscribed"})
+        elif stream.startswith("chat:"):
+            self.stream = stream
+            chat = self.chats[int(stream.split(":", 1)[1])]
+            if action == "load_history":
+                await self._send_history_page(chat, content)
+                return
+            message_text = (content.get("message") or "").strip()
+            if message_text:
+                await self._handle_chat_message(chat, message_text)
+
+    async def _subscribe(self, stream, since=None):
+        if stream in self.groups_by_stream:
+            await self._reply(stream, {"type": "subscribed"})
+            return
+
+        name, _, arg = stream.partition(":")
+        if name == "requests":
+            groups = await self._subscribe_requests()
+        elif name == "chat" and arg.isdigit():
+            groups = await self._subscribe_chat(int(arg))
+        elif name == "notifications":
+            groups = [f"user_{self.user.id}", user_group(self.user.id), "notifications"]
+        elif name == "request_status" and arg.isdigit():
+            groups = [f"request_{arg}"] if await _can_watch_request(self.user.id, int(arg)) else None
+        else:
+            await self._reply(stream, {"type": "error", "message": "unknown stream"})
+            return
+
+        if groups is None:
+            print(f"❌ User {self.user.id} not allowed on stream {stream}")
+            await self._reply(stream, {"type": "error", "message": "not allowed"})
+            return
+
+        for group in groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups_by_stream[stream] = groups
+        await self._reply(stream, {"type": "subscribed"})
+
+        if name == "chat":
+            history, has_more = await _get_chat_history(int(arg))
+            await self._reply(stream, {"type": "chat_history", "messages": history, "has_more": has_more})
+        elif name == "notifications" and since is not None:
+            notifications, truncated = await _replay_notifications(self.user, since)
+            await self._reply(stream, {"type": "replay", "notifications": notifications, "truncated": truncated})
+
+    async def _subscribe_requests(self):
+        self.provider = await _get_owned_provider(self.user)
+        if not self.provider:
+            return None
+        self.provider_id = self.provider["id"]
+
+        location = await _get_live_location(self.provider_id) or self.provider["location"]
+        if location:
+            await self._join_cell(geo_cell(*location))
+
+        await _presence_connect(self.provider_id, self.channel_name)
+        self.presence_task = asyncio.create_task(_keep_present(self.provider_id, self.channel_name))
+        return [f"provider_{self.provider_id}", f"provider_notify_{self.provider_id}"]
+
+    async def _subscribe_chat(self, chatroom_id):
+        chat = await _load_chat_context(self.user.id, chatroom_id)
+        if not chat:
+            return None
+        self.chats[chatroom_id] = chat
+        return [chat["group_name"]]
+
+    async def _unsubscribe(self, stream):
+        groups = self.groups_by_stream.pop(stream, [])
+        for group in groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+        if stream == "requests" and self.provider_id:
+            await self._join_cell(None)
+            self.presence_task.cancel()
+            await _presence_disconnect(self.provider_id, self.channel_name)
+        elif stream.startswith("chat:"):
+            self.chats.pop(int(stream.split(":", 1)[1]), None)
@@ -0,0 +1,131 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .geo import MATCH_RADIUS_KM, cell_group_name, covering_cells
+from .matching import nearby_providers
+from .models import DispatchOffer, ServiceRequest
+
+# Each wave offers the request to at most `max_providers` of the nearest
+# providers within `radius_km` (None = everyone in range, via cell groups),
+# then waits `timeout` seconds for an accept before the next wave. Capped
+# waves record a DispatchOffer per provider, and only those providers see
+# the request in their incoming list until an open wave has run.
+DISPATCH_WAVES = getattr(settings, "DISPATCH_WAVES", [
+    {"radius_km": MATCH_RADIUS_KM, "max_providers": None, "timeout": 0},
+])
+
+# Largest radius any wave reaches.
+DISPATCH_MAX_RADIUS_KM = max(wave["radius_km"] for wave in DISPATCH_WAVES)
+
+
+def new_request_event(sr, radius_km=None, exclude=()):
+    """
+    Channel-layer event announcing `sr` to providers. When `radius_km` is
+    given, receiving sockets drop the event if they are farther away;
+    providers in `exclude` (already offered) drop it too.
+    """
+    event = {
+        "type": "new.request",
+        "request_id": sr.id,
+        "service_category": sr.service_category.name,
+        "message": f"New nearby request for {sr.service_category.name}",
+    }
+    if radius_km is not None:
+        event.update(lat=sr.location_lat, lon=sr.location_lon, radius_km=radius_km)
+    if exclude:
+        event["exclude"] = sorted(exclude)
+    return event
+
+
+async def _group_send_many(channel_layer, groups, event):
+    await asyncio.gather(*(channel_layer.group_send(group, event) for group in groups))
+
+
+def broadcast_to_cells(sr, radius_km=MATCH_RADIUS_KM, exclude=()):
+    """
+    Publish a new request once per grid cell covering `radius_km` around it,
+    skipping the providers in `exclude`.
+
+    Providers join the group of the cell they are in (see
+    ProviderRequestConsumer), and drop events farther than `radius_km` from
+    their own position, so the cost here does not depend on how many
+    providers are nearby. Returns the list of groups sent to.
+    """
+    channel_layer = get_channel_layer()
+    event = new_request_event(sr, radius_km, exclude)
+
+    cells = covering_cells(sr.location_lat, sr.location_lon, radius_km)
+    if cells is None:
+        # Circle wraps a pole or the antimeridian; fall back to per-provider sends.
+        groups = [
+            f"provider_{p.id}"
+            for p in nearby_providers(sr.service_category, sr.location_lat, sr.location_lon, radius_km)
+            if p.id not in exclude
+        ]
+    else:
+        groups = [cell_group_name(sr.service_category_id, cell) for cell in cells]
+
+    if groups:
+        async_to_sync(_group_send_many)(channel_layer, groups, event)
+    return groups
+
+
+def send_to_providers(sr, provider_ids):
+    """Offer `sr` directly to the given providers."""
+    groups = [f"provider_{pid}" for pid in provider_ids]
+    if groups:
+        async_to_sync(_group_send_many)(get_channel_layer(), groups, new_request_event(sr))
+    return groups
+
+
+def run_wave(request_id, wave=0, offered=()):
+    """
+    Offer a pending request to the providers of wave `wave`.
+
+    Returns the provider ids offered so far, or None when dispatch should
+    stop (request no longer pending, or no waves left).
+    """
+    if wave >= len(DISPATCH_WAVES):
+        return None
+
+    try:
+        sr = ServiceRequest.objects.select_related("service_category").get(pk=request_id)
+    except ServiceRequest.DoesNotExist:
+        return None
+
+    # Stop as soon as a provider has accepted (or the user cancelled).
+    if sr.status != "pending" or sr.provider_id is not None:
+        return None
+    if not (sr.location_lat and sr.location_lon and sr.service_category):
+        return None
+
+    config = DISPATCH_WAVES[wave]
+    radius_km = config["radius_km"]
+    offered = set(offered)
+    limit = config.get("max_providers")
+    if limit is None:
+        # open wave: everyone in range may now see and accept it
+        ServiceRequest.objects.filter(pk=sr.pk, status="pending").update(dispatch_radius_km=radius_km)
+        broadcast_to_cells(sr, radius_km, exclude=offered)
+        return sorted(offered)
+
+    nearest = nearby_providers(
+        sr.service_category, sr.location_lat, sr.location_lon, radius_km, limit=limit + len(offered)
+    )
+    candidates = [p.id for p in nearest if p.id not in offered][:limit]
+    DispatchOffer.objects.bulk_create(
+        [DispatchOffer(service_request_id=sr.id, provider_id=pid) for pid in candidates],
+        ignore_conflicts=True,
+    )
+    send_to_providers(sr, candidates)
+    return sorted(offered.union(candidates))
+
+
+def start_dispatch(sr):
+    """Kick off the wave chain for a newly created request."""
+    from .tasks import dispatch_request_wave
+
+    dispatch_request_wave.delay(sr.id, 0, [])
@@ -0,0 +1,295 @@
+"""
+Transactional email outbox.
+
+Email is never sent from the code path that triggers it. enqueue() writes
+an EmailOutbox row in the caller's transaction, so an email exists exactly
+when the change that caused it is committed, and kicks the dispatcher once
+that transaction commits. A beat entry drains the outbox too, for retries
+and for kicks that were lost.
+
+Rows fall into lanes by priority (critical / transactional / bulk), each
+drained by its own task on its own Celery queue. dispatch() claims a
+lane's due rows in batches (SELECT ... FOR UPDATE SKIP LOCKED, then
+pushes their next_attempt_at out by a lease, so concurrent dispatchers
+never share rows and a crashed one's rows come back) and sends each
+batch over one SMTP connection. A failed row backs off
+exponentially; after EMAIL_OUTBOX_MAX_ATTEMPTS it is dead-lettered
+(status "dead") and can be requeued from the admin.
+
+Each row has a unique idempotency key: enqueueing the same key twice
+sends one email. Rows enqueued with sensitive=True (OTPs) have their body
+replaced by REDACTED_BODY as soon as they are sent or dead-lettered, and
+their key never derives from the secret. Set EMAIL_OUTBOX_BACKEND to e.g.
+"django.core.mail.backends.filebased.EmailBackend" (or console / locmem)
+to keep SMTP out of tests and local runs.
+"""
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import task_metrics
+from .models import EmailOutbox
+
+EMAIL_OUTBOX_BACKEND = getattr(settings, "EMAIL_OUTBOX_BACKEND", None)  # None = EMAIL_BACKEND
+EMAIL_OUTBOX_BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+EMAIL_OUTBOX_BACKOFF = getattr(settings, "EMAIL_OUTBOX_BACKOFF", 30)  # seconds, doubled per attempt
+EMAIL_OUTBOX_LEASE = getattr(settings, "EMAIL_OUTBOX_LEASE", 120)  # seconds a claimed batch is ours
+EMAIL_OUTBOX_TIME_BUDGET = getattr(settings, "EMAIL_OUTBOX_TIME_BUDGET", 50)  # seconds per dispatch run
+
+REDACTED_BODY = "[redacted]"
+
+# lower is sent first
+PRIORITY_CRITICAL = 0       # OTPs
+PRIORITY_TRANSACTIONAL = 5  # approvals, rejections
+PRIORITY_BULK = 9           # webinar links, contact form
+
+# Each lane is drained by its own task on its own Celery queue, so OTPs
+# never wait behind a bulk send. lane -> (lowest, highest) priority
+LANES = {
+    "critical": (0, PRIORITY_CRITICAL),
+    "transactional": (PRIORITY_CRITICAL + 1, PRIORITY_TRANSACTIONAL),
+    "bulk": (PRIORITY_TRANSACTIONAL + 1, None),
+}
+# bulk runs send this many batches, then requeue themselves (paced by
+# the bulk queue's rate_limit) so they never hog a worker
+EMAIL_OUTBOX_BULK_BATCHES_PER_RUN = getattr(settings, "EMAIL_OUTBOX_BULK_BATCHES_PER_RUN", 1)
+
+
+def lane_for(priority):
+    for lane, (low, high) in LANES.items():
+        if priority >= low and (high is None or priority <= high):
+            return lane
+    return "bulk"
+
+
+def kick(lane):
+    """Start the dispatcher task of `lane` (routed to its Celery queue)."""
+    from . import tasks
+    try:
+        getattr(tasks, f"dispatch_{lane}_email").delay()
+    except Exception as e:
+        print(f"⚠️ Outbox kick failed (beat will pick it up): {e}")
+
+
+def _kick_later(lanes):
+    for lane in set(lanes):
+        transaction.on_commit(lambda lane=lane: kick(lane))
+
+
+def enqueue(to_email, subject, body, key=None, priority=PRIORITY_TRANSACTIONAL, from_email=None, sensitive=False):
+    """
+    Queue one email in the current transaction. Returns the row; an
+    existing row with the same idempotency key is returned unchanged.
+    """
+    key = key or uuid.uuid4().hex
+    try:
+        with transaction.atomic():
+            row = EmailOutbox.objects.create(
+                idempotency_key=key,
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                from_email=from_email or "",
+                priority=priority,
+                sensitive=sensitive,
+            )
+    except IntegrityError:
+        return EmailOutbox.objects.get(idempotency_key=key)
+    _kick_later([lane_for(priority)])
+    return row
+
+
+def enqueue_many(rows):
+    """Queue unsaved EmailOutbox rows at once; rows whose key exists are skipped."""
+    EmailOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+    _kick_later(lane_for(row.priority) for row in rows)
+
+
+# ----------------- Messages -----------------
+
+def contact_email(name, email, message):
+    return enqueue(
+        settings.DEFAULT_FROM_EMAIL,
+        "New Contact Message",
+        f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}",
+        priority=PRIORITY_BULK,
+    )
+
+
+def otp_email(email, otp):
+    # a random key: one derived from the code could be brute-forced back to it
+    return enqueue(
+        email,
+        "DoerHub OTP",
+        f"Your OTP: {otp}\nValid for 10 mins.",
+        priority=PRIORITY_CRITICAL,
+        sensitive=True,
+    )
+
+
+def provider_approval_email(username, email):
+    return enqueue(
+        email,
+        "Provider Approval Notification",
+        f"Dear {username},\n\n"
+        "Your provider profile has been approved! "
+        "You can now log in and start offering services.",
+    )
+
+
+def provider_rejection_email(username, email, reason):
+    return enqueue(
+        email,
+        "Provider Rejection Notification",
+        f"Dear {username},\n\n"
+        f"Your provider profile was not approved.\n"
+        f"Reason: {reason}",
+    )
+
+
+# ----------------- Dispatcher -----------------
+
+def _claim(lane, batch_size):
+    now = timezone.now()
+    due = EmailOutbox.objects.filter(status="pending", next_attempt_at__lte=now)
+    if lane is not None:
+        low, high = LANES[lane]
+        due = due.filter(priority__gte=low)
+        if high is not None:
+            due = due.filter(priority__lte=high)
+    with transaction.atomic():
+        rows = list(
+            due.select_for_update(skip_locked=True)
+            .order_by("priority", "next_attempt_at")[:batch_size]
+        )
+        if rows:
+            EmailOutbox.objects.filter(id__in=[r.id for r in rows]).update(
+                next_attempt_at=now + timedelta(seconds=EMAIL_OUTBOX_LEASE)
+            )
+    return rows
+
+
+def _send_batch(rows):
+    """Send rows over one connection. Returns (sent rows, [(row, error), ...])."""
+    connection = get_connection(backend=EMAIL_OUTBOX_BACKEND)
+    try:
+        connection.open()
+    except Exception as e:
+        return [], [(row, str(e)) for row in rows]
+
+    sent, failed = [], []
+    try:
+        for row in rows:
+            message = EmailMessage(
+                subject=row.subject,
+                body=row.body,
+                from_email=row.from_email or settings.DEFAULT_FROM_EMAIL,
+                to=[row.to_email],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+                sent.append(row)
+            except Exception as e:
+                failed.append((row, str(e)))
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _record(sent, failed):
+    now = timezone.now()
+    if sent:
+        EmailOutbox.objects.filter(id__in=[r.id for r in sent]).update(
+            status="sent", sent_at=now, attempts=F("attempts") + 1, last_error=""
+        )
+        EmailOutbox.objects.filter(id__in=[r.id for r in sent if r.sensitive]).update(body=REDACTED_BODY)
+        for row in sent:  # enqueue -> delivered, per lane
+            task_metrics.record("email", lane_for(row.priority), (now - row.created_at).total_seconds())
+    dead = []
+    for row, error in failed:
+        row.attempts += 1
+        row.last_error = error[:1000]
+        if row.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+            row.status = "dead"
+            if row.sensitive:
+                row.body = REDACTED_BODY
+            dead.append(row)
+        else:
+            row.next_attempt_at = now + timedelta(seconds=EMAIL_OUTBOX_BACKOFF * 2 ** (row.attempts - 1))
+    if failed:
+        EmailOutbox.objects.bulk_update(
+            [row for row, _ in failed], ["attempts", "last_error", "status", "next_attempt_at", "body"]
+        )
+    _update_bulk_jobs(sent, failed, dead)
+    return len(dead)
+
+
+def _update_bulk_jobs(sent, failed, dead):
+    from .bulk_email import record_delivery
+
+    counts, errors = {}, {}
+    for row in sent:
+        if row.bulk_job_id:
+            counts.setdefault(row.bulk_job_id, [0, 0])[0] += 1
+    for row in dead:
+        if row.bulk_job_id:
+            counts.setdefault(row.bulk_job_id, [0, 0])[1] += 1
+    for row, _ in failed:  # retried or dead, the job shows the latest error
+        if row.bulk_job_id:
+            errors[row.bulk_job_id] = row.last_error
+            counts.setdefault(row.bulk_job_id, [0, 0])
+    for job_id, (n_sent, n_dead) in counts.items():
+        record_delivery(job_id, sent=n_sent, failed=n_dead, error=errors.get(job_id))
+
+
+def dispatch(lane=None, batch_size=EMAIL_OUTBOX_BATCH_SIZE, time_budget=EMAIL_OUTBOX_TIME_BUDGET, max_batches=None):
+    """
+    Drain due rows of `lane` (every lane when None) batch by batch until
+    none are left, time_budget runs out or max_batches were sent. "more"
+    in the result is True when it stopped with rows possibly still due.
+    """
+    deadline = time.monotonic() + time_budget
+    sent_total = failed_total = dead_total = batches = 0
+    more = True
+    while time.monotonic() < deadline and (max_batches is None or batches < max_batches):
+        rows = _claim(lane, batch_size)
+        if not rows:
+            more = False
+            break
+        sent, failed = _send_batch(rows)
+        dead_total += _record(sent, failed)
+        sent_total += len(sent)
+        failed_total += len(failed)
+        batches += 1
+    return {"sent": sent_total, "failed": failed_total, "dead": dead_total, "more": more}
+
+
+def requeue(queryset):
+    """
+    Give dead (or pending) rows a fresh set of attempts, due now. Redacted
+    rows are skipped: their body is gone (and an OTP would have expired).
+    """
+    from .bulk_email import record_delivery
+
+    queryset = queryset.exclude(status="sent").exclude(status="dead", sensitive=True)
+    lanes = {lane_for(p) for p in queryset.values_list("priority", flat=True).distinct()}
+    dead_by_job = Counter(
+        queryset.filter(status="dead", bulk_job__isnull=False).values_list("bulk_job_id", flat=True)
+    )
+    updated = queryset.update(
+        status="pending", attempts=0, next_attempt_at=timezone.now(), last_error=""
+    )
+    for job_id, n in dead_by_job.items():
+        record_delivery(job_id, failed=-n)
+    if updated:
+        _kick_later(lanes)
+    return updated
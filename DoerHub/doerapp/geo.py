@@ -0,0 +1,144 @@
+import math
+
+from django.conf import settings
+from django.db.models import FloatField, Value
+from django.db.models.functions import Radians, Cos, Sin, Power, Sqrt, ATan2, Cast
+
+EARTH_RADIUS_KM = 6371
+
+# Size of one grid cell in degrees. 0.1° is ~11 km north/south, so a 10 km
+# radius is covered by a 3x3 or 4x4 block of cells. Changing this value
+# requires re-running `python manage.py rebuild_geo_cells`.
+GEO_CELL_SIZE_DEG = getattr(settings, "GEO_CELL_SIZE_DEG", 0.1)
+
+# Radius (km) used to match providers and requests.
+MATCH_RADIUS_KM = getattr(settings, "MATCH_RADIUS_KM", 10)
+
+# One degree of latitude in km (plus a small pad so float rounding can
+# never push a point that is exactly on the radius out of the box).
+_KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+_BBOX_PAD = 1.0001
+
+
+# ----------------------------------------------------------
+# HAVERSINE (DB VERSION)
+# ----------------------------------------------------------
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    R = EARTH_RADIUS_KM
+    dlat = Radians(lat2 - lat1)
+    dlon = Radians(lon2 - lon1)
+    a = Power(Sin(dlat / 2), 2) + Cos(Radians(lat1)) * Cos(Radians(lat2)) * Power(Sin(dlon / 2), 2)
+    c = 2 * ATan2(Sqrt(a), Sqrt(1 - a))
+    return R * c
+
+
+# ----------------------------------------------------------
+# HAVERSINE (PYTHON VERSION)
+# ----------------------------------------------------------
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Same formula as `haversine_distance`, evaluated in Python."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+# ----------------------------------------------------------
+# GRID CELLS
+# ----------------------------------------------------------
+
+def _cell_index(lat, lon):
+    row = int(math.floor((float(lat) + 90) / GEO_CELL_SIZE_DEG))
+    col = int(math.floor((float(lon) + 180) / GEO_CELL_SIZE_DEG))
+    return row, col
+
+
+def geo_cell(lat, lon):
+    """Return the grid-cell key for a coordinate, or None if it is missing."""
+    if lat is None or lon is None or lat == "" or lon == "":
+        return None
+    row, col = _cell_index(lat, lon)
+    return f"{row}:{col}"
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) of a box that fully contains
+    the circle of `radius_km` around (lat, lon), or None when the box would
+    wrap around a pole or the antimeridian.
+    """
+    lat = float(lat)
+    lon = float(lon)
+    dlat = radius_km / _KM_PER_DEG_LAT * _BBOX_PAD
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return None
+
+    # Longitude degrees shrink towards the poles; use the widest latitude
+    # of the box so the circle is always inside it.
+    widest = max(abs(min_lat), abs(max_lat))
+    dlon = radius_km / (_KM_PER_DEG_LAT * math.cos(math.radians(widest))) * _BBOX_PAD
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon <= -180 or max_lon >= 180:
+        return None
+
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def covering_cells(lat, lon, radius_km):
+    """Return every grid cell that intersects the circle's bounding box."""
+    box = bounding_box(lat, lon, radius_km)
+    if box is None:
+        return None
+    min_lat, max_lat, min_lon, max_lon = box
+    min_row, min_col = _cell_index(min_lat, min_lon)
+    max_row, max_col = _cell_index(max_lat, max_lon)
+    return [
+        f"{row}:{col}"
+        for row in range(min_row, max_row + 1)
+        for col in range(min_col, max_col + 1)
+    ]
+
+
+def within_radius(qs, lat, lon, radius_km=MATCH_RADIUS_KM):
+    """
+    Restrict a queryset of rows with location_lat/location_lon/geo_cell to
+    those within `radius_km` of (lat, lon), annotated with `distance_km`
+    and ordered nearest first.
+
+    Rows are first narrowed by grid cell and bounding box (both indexable),
+    so the haversine expression only runs on nearby candidates. The exact
+    distance filter is unchanged, so results match a full scan.
+    """
+    lat = float(lat)
+    lon = float(lon)
+
+    cells = covering_cells(lat, lon, radius_km)
+    if cells is not None:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        qs = qs.filter(
+            geo_cell__in=cells,
+            location_lat__range=(min_lat, max_lat),
+            location_lon__range=(min_lon, max_lon),
+        )
+
+    return (
+        qs.annotate(
+            distance_km=haversine_distance(
+                Cast("location_lat", FloatField()),
+                Cast("location_lon", FloatField()),
+                Value(lat),
+                Value(lon),
+            )
+        )
+        .filter(distance_km__lte=radius_km)
+        .order_by("distance_km")
+    )
+
+
+def cell_group_name(category_id, cell):
+    """Channel-layer group for providers of a category inside one grid cell."""
+    return f"requests_{category_id}_{cell.replace(':', '_')}"
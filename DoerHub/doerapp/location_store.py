@@ -0,0 +1,216 @@
+"""
+Live provider locations.
+
+GPS pings are written here instead of the Provider row. Positions are kept
+per provider id and flushed to Provider.location_lat/location_lon in the
+background every LIVE_LOCATION_FLUSH_INTERVAL seconds.
+
+Configure with:
+
+    LIVE_LOCATION_STORE = {
+        "BACKEND": "doerapp.location_store.RedisLocationStore",
+        "OPTIONS": {"url": "redis://127.0.0.1:6379/1"},
+    }
+
+`InMemoryLocationStore` keeps everything in the current process; use it for
+tests and single-node deployments.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .geo import bounding_box, geo_cell, haversine_km
+from .utils import get_redis_connection, load_backend
+
+LIVE_LOCATION_FLUSH_INTERVAL = getattr(settings, "LIVE_LOCATION_FLUSH_INTERVAL", 15)
+
+
+class BaseLocationStore:
+    def update(self, provider_id, lat, lon):
+        """Record a position. Returns the previous (lat, lon) or None."""
+        raise NotImplementedError
+
+    def get(self, provider_id):
+        return self.get_many([provider_id]).get(int(provider_id))
+
+    def get_many(self, provider_ids):
+        """Return {provider_id: (lat, lon)} for the ids that have a live position."""
+        raise NotImplementedError
+
+    def search(self, lat, lon, radius_km):
+        """Return {provider_id: distance_km} for positions within radius_km."""
+        raise NotImplementedError
+
+    def remove(self, provider_id):
+        """Forget a provider. Returns the last (lat, lon) or None."""
+        raise NotImplementedError
+
+    def pop_dirty(self):
+        """Return and clear {provider_id: (lat, lon)} changed since the last flush."""
+        raise NotImplementedError
+
+    def maybe_flush(self):
+        """Hook for backends that must flush from the request process."""
+
+
+class InMemoryLocationStore(BaseLocationStore):
+    """
+    Per-process store. Because a Celery worker cannot see this process's
+    memory, it flushes itself from maybe_flush() once the interval elapses.
+    """
+
+    def __init__(self, flush_interval=LIVE_LOCATION_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._positions = {}
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def update(self, provider_id, lat, lon):
+        provider_id = int(provider_id)
+        with self._lock:
+            previous = self._positions.get(provider_id)
+            self._positions[provider_id] = (lat, lon)
+            self._dirty[provider_id] = (lat, lon)
+        return previous
+
+    def get_many(self, provider_ids):
+        with self._lock:
+            return {
+                int(pid): self._positions[int(pid)]
+                for pid in provider_ids
+                if int(pid) in self._positions
+            }
+
+    def search(self, lat, lon, radius_km):
+        box = bounding_box(lat, lon, radius_km)
+        with self._lock:
+            positions = list(self._positions.items())
+
+        hits = {}
+        for pid, (plat, plon) in positions:
+            if box is not None:
+                min_lat, max_lat, min_lon, max_lon = box
+                if not (min_lat <= plat <= max_lat and min_lon <= plon <= max_lon):
+                    continue
+            distance = haversine_km(lat, lon, plat, plon)
+            if distance <= radius_km:
+                hits[pid] = distance
+        return hits
+
+    def remove(self, provider_id):
+        provider_id = int(provider_id)
+        with self._lock:
+            self._dirty.pop(provider_id, None)
+            return self._positions.pop(provider_id, None)
+
+    def pop_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._last_flush = time.monotonic()
+        return dirty
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            flush_locations(self)
+
+
+class RedisLocationStore(BaseLocationStore):
+    """
+    Positions live in a Redis GEO set; pending writes in a hash that the
+    `flush_provider_locations` Celery task drains.
+    """
+
+    def __init__(self, url="redis://127.0.0.1:6379/1", prefix="doerhub:loc"):
+        self.redis = get_redis_connection(url)
+        self.geo_key = f"{prefix}:geo"
+        self.dirty_key = f"{prefix}:dirty"
+
+    def update(self, provider_id, lat, lon):
+        provider_id = int(provider_id)
+        pipe = self.redis.pipeline()
+        pipe.geopos(self.geo_key, provider_id)
+        pipe.geoadd(self.geo_key, (lon, lat, provider_id))
+        pipe.hset(self.dirty_key, provider_id, f"{lat},{lon}")
+        previous = pipe.execute()[0][0]
+        return (previous[1], previous[0]) if previous else None
+
+    def get_many(self, provider_ids):
+        provider_ids = [int(pid) for pid in provider_ids]
+        if not provider_ids:
+            return {}
+        coords = self.redis.geopos(self.geo_key, *provider_ids)
+        return {
+            pid: (pos[1], pos[0])
+            for pid, pos in zip(provider_ids, coords)
+            if pos
+        }
+
+    def search(self, lat, lon, radius_km):
+        # Redis uses a slightly different earth radius; search a little
+        # wider and apply the exact haversine cut-off ourselves.
+        members = self.redis.geosearch(
+            self.geo_key,
+            longitude=lon,
+            latitude=lat,
+            radius=radius_km * 1.01,
+            unit="km",
+            withcoord=True,
+        )
+        hits = {}
+        for member, (plon, plat) in members:
+            distance = haversine_km(lat, lon, plat, plon)
+            if distance <= radius_km:
+                hits[int(member)] = distance
+        return hits
+
+    def remove(self, provider_id):
+        provider_id = int(provider_id)
+        pipe = self.redis.pipeline()
+        pipe.geopos(self.geo_key, provider_id)
+        pipe.zrem(self.geo_key, provider_id)
+        pipe.hdel(self.dirty_key, provider_id)
+        previous = pipe.execute()[0][0]
+        return (previous[1], previous[0]) if previous else None
+
+    def pop_dirty(self):
+        pipe = self.redis.pipeline()
+        pipe.hgetall(self.dirty_key)
+        pipe.delete(self.dirty_key)
+        raw = pipe.execute()[0]
+        dirty = {}
+        for pid, value in raw.items():
+            lat, lon = value.decode().split(",")
+            dirty[int(pid)] = (float(lat), float(lon))
+        return dirty
+
+
+def flush_locations(store=None):
+    """Write pending live positions to Provider.location_lat/location_lon."""
+    from .models import Provider
+
+    store = store or get_location_store()
+    dirty = store.pop_dirty()
+    if not dirty:
+        return 0
+
+    providers = list(Provider.objects.filter(id__in=dirty).only("id"))
+    for provider in providers:
+        provider.location_lat, provider.location_lon = dirty[provider.id]
+        provider.geo_cell = geo_cell(provider.location_lat, provider.location_lon)
+    Provider.objects.bulk_update(providers, ["location_lat", "location_lon", "geo_cell"], batch_size=500)
+    return len(providers)
+
+
+_store = None
+
+
+def get_location_store():
+    global _store
+    if _store is None:
+        _store = load_backend(
+            getattr(settings, "LIVE_LOCATION_STORE", None),
+            "doerapp.location_store.InMemoryLocationStore",
+        )
+    return _store
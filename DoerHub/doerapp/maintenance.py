@@ -0,0 +1,197 @@
+"""
+Periodic clean-up jobs (run by Celery beat, see tasks.py).
+
+Every job works in chunks of MAINTENANCE_CHUNK_SIZE rows: select the next
+ids with an index range scan, then update / delete exactly those ids in
+their own short transaction, so no statement holds locks on a hot table
+for long. A run stops after MAINTENANCE_TIME_BUDGET seconds. Processed
+rows leave the job's predicate (expired, deleted), so the next run simply
+carries on where this one stopped; a cache lock keeps overlapping beat
+runs of the same job apart.
+
+    expire_stale_requests   pending requests nobody accepted in
+                            SERVICE_REQUEST_PENDING_TTL -> "expired",
+                            pushed to request_<id>
+    purge_expired_otps      EmailOTP audit rows older than OTP_TTL
+    prune_notifications     read notifications and broadcasts older than
+                            NOTIFICATION_RETENTION_DAYS
+    purge_email_outbox      sent and dead EmailOutbox rows older than
+                            EMAIL_OUTBOX_RETENTION_DAYS
+    prune_dispatch_offers   DispatchOffer rows older than
+                            SERVICE_REQUEST_PENDING_TTL (the request has
+                            been accepted or expired by then)
+"""
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import notification_counters
+from .models import DispatchOffer, EmailOTP, EmailOutbox, Notification, ServiceRequest
+from .otp import OTP_TTL
+
+MAINTENANCE_CHUNK_SIZE = getattr(settings, "MAINTENANCE_CHUNK_SIZE", 500)
+MAINTENANCE_TIME_BUDGET = getattr(settings, "MAINTENANCE_TIME_BUDGET", 20)  # seconds per run
+SERVICE_REQUEST_PENDING_TTL = getattr(settings, "SERVICE_REQUEST_PENDING_TTL", 3600)
+NOTIFICATION_RETENTION_DAYS = getattr(settings, "NOTIFICATION_RETENTION_DAYS", 90)
+EMAIL_OUTBOX_RETENTION_DAYS = getattr(settings, "EMAIL_OUTBOX_RETENTION_DAYS", 30)
+
+
+def _run_chunked(name, next_ids, process, time_budget=MAINTENANCE_TIME_BUDGET):
+    """
+    Call process(ids) for successive next_ids(limit) chunks until none are
+    left or time_budget is spent. Returns rows processed, or None when
+    another run of `name` holds the lock.
+    """
+    lock = f"maintenance:lock:{name}"
+    if not cache.add(lock, 1, time_budget + 60):
+        return None
+    try:
+        deadline = time.monotonic() + time_budget
+        done = 0
+        while time.monotonic() < deadline:
+            ids = next_ids(MAINTENANCE_CHUNK_SIZE)
+            if not ids:
+                break
+            done += process(ids)
+        return done
+    finally:
+        cache.delete(lock)
+
+
+# ----------------- Service requests -----------------
+
+def _notify_expired(request_ids):
+    channel_layer = get_channel_layer()
+    for request_id in request_ids:
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f"request_{request_id}",
+                {"type": "request.expired", "request_id": request_id},
+            )
+        except Exception as e:
+            print(f"❌ Expiry push for request {request_id} failed: {e}")
+
+
+def expire_stale_requests(ttl=SERVICE_REQUEST_PENDING_TTL):
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+
+    def next_ids(limit):
+        # (status, created_at) index range
+        return list(
+            ServiceRequest.objects.filter(status="pending", provider__isnull=True, created_at__lt=cutoff)
+            .order_by("created_at")
+            .values_list("id", flat=True)[:limit]
+        )
+
+    def process(ids):
+        # re-check status: a provider may accept while we work
+        ServiceRequest.objects.filter(id__in=ids, status="pending", provider__isnull=True).update(status="expired")
+        expired = list(ServiceRequest.objects.filter(id__in=ids, status="expired").values_list("id", flat=True))
+        _notify_expired(expired)
+        return len(expired)
+
+    return _run_chunked("expire_requests", next_ids, process)
+
+
+# ----------------- OTPs -----------------
+
+def purge_expired_otps(ttl=OTP_TTL):
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+
+    def next_ids(limit):
+        return list(EmailOTP.objects.filter(created_at__lt=cutoff).order_by("id").values_list("id", flat=True)[:limit])
+
+    def process(ids):
+        deleted, _ = EmailOTP.objects.filter(id__in=ids, created_at__lt=cutoff).delete()
+        return deleted
+
+    return _run_chunked("purge_otps", next_ids, process)
+
+
+# ----------------- Notifications -----------------
+
+def prune_notifications(days=NOTIFICATION_RETENTION_DAYS):
+    cutoff = timezone.now() - timedelta(days=days)
+    pruned = False
+
+    def next_ids(limit):
+        # broadcasts: (recipient, created_at) index; read personal rows: (is_read, created_at)
+        ids = list(
+            Notification.objects.filter(recipient__isnull=True, created_at__lt=cutoff)
+            .order_by("created_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        if len(ids) < limit:
+            ids += list(
+                Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+                .order_by("created_at")
+                .values_list("id", flat=True)[:limit - len(ids)]
+            )
+        return ids
+
+    def process(ids):
+        nonlocal pruned
+        deleted, _ = Notification.objects.filter(
+            Q(recipient__isnull=True) | Q(is_read=True), id__in=ids, created_at__lt=cutoff
+        ).delete()
+        pruned = pruned or deleted > 0
+        return deleted
+
+    done = _run_chunked("prune_notifications", next_ids, process)
+    if pruned:
+        notification_counters.broadcast_added()  # drop the cached broadcast id window
+    return done
+
+
+# ----------------- Email outbox -----------------
+
+def purge_email_outbox(days=EMAIL_OUTBOX_RETENTION_DAYS):
+    cutoff = timezone.now() - timedelta(days=days)
+
+    def next_ids(limit):
+        # sent: (status, sent_at) index; dead: (status, next_attempt_at), the last attempt
+        ids = list(
+            EmailOutbox.objects.filter(status="sent", sent_at__lt=cutoff)
+            .order_by("sent_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        if len(ids) < limit:
+            ids += list(
+                EmailOutbox.objects.filter(status="dead", next_attempt_at__lt=cutoff)
+                .order_by("next_attempt_at")
+                .values_list("id", flat=True)[:limit - len(ids)]
+            )
+        return ids
+
+    def process(ids):
+        deleted, _ = EmailOutbox.objects.filter(
+            Q(status="sent", sent_at__lt=cutoff) | Q(status="dead", next_attempt_at__lt=cutoff), id__in=ids
+        ).delete()
+        return deleted
+
+    return _run_chunked("purge_email_outbox", next_ids, process)
+
+
+# ----------------- Dispatch offers -----------------
+
+def prune_dispatch_offers(ttl=SERVICE_REQUEST_PENDING_TTL):
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+
+    def next_ids(limit):
+        return list(
+            DispatchOffer.objects.filter(created_at__lt=cutoff)
+            .order_by("created_at")
+            .values_list("id", flat=True)[:limit]
+        )
+
+    def process(ids):
+        deleted, _ = DispatchOffer.objects.filter(id__in=ids, created_at__lt=cutoff).delete()
+        return deleted
+
+    return _run_chunked("prune_dispatch_offers", next_ids, process)
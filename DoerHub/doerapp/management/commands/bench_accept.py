@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from doerapp.models import ChatRoom, Provider, ServiceCategory, ServiceRequest
+from doerapp.views import AcceptServiceRequestAPI
+
+PREFIX = "bench_accept_"
+
+
+def legacy_accept(user, pk):
+    """The previous lock-based acceptance flow, kept for comparison."""
+    with transaction.atomic():
+        sr = ServiceRequest.objects.select_for_update().get(pk=pk)
+        provider = user.provider
+        if sr.provider is not None:
+            return 400
+        if ServiceRequest.objects.filter(provider=provider, status="accepted").exists():
+            return 403
+        sr.provider = provider
+        sr.status = "accepted"
+        sr.save()
+        chatroom, _ = ChatRoom.objects.get_or_create(
+            service_request=sr,
+            defaults={"user": sr.user, "provider": user},
+        )
+        async_to_sync(get_channel_layer().group_send)(
+            f"request_{sr.id}",
+            {"type": "request.accepted", "chatroom_id": chatroom.id, "provider_name": user.username},
+        )
+        return 200
+
+
+def cas_accept(user, pk):
+    request = APIRequestFactory().post(f"/api/provider/requests/{pk}/accept/")
+    force_authenticate(request, user=user)
+    return AcceptServiceRequestAPI.as_view()(request, pk=pk).status_code
+
+
+class Command(BaseCommand):
+    help = (
+        "Contention benchmark: N providers accept the same request at once. "
+        "Compares the legacy select_for_update flow with conditional-UPDATE acceptance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--providers", type=int, default=10, help="Concurrent acceptors per request.")
+        parser.add_argument("--rounds", type=int, default=50, help="Requests to fight over.")
+        parser.add_argument("--mode", choices=["legacy", "cas", "both"], default="both")
+        parser.add_argument("--output", default="bench_accept.json")
+
+    def _setup(self, n):
+        category = ServiceCategory.objects.create(name=f"{PREFIX}{int(time.time())}", category_type="immediate")
+        customer = User.objects.create(username=f"{PREFIX}customer")
+        users = []
+        for i in range(n):
+            user = User.objects.create(username=f"{PREFIX}p{i}")
+            Provider.objects.create(
+                user=user, username=user.username, bio="benchmark provider",
+                aadhaar_number="000000000000", aadhaar_document="", experience=1,
+                verified=True, is_online=True, service_category=category,
+            )
+            users.append(User.objects.select_related("provider").get(pk=user.pk))
+        return category, customer, users
+
+    def _round(self, accept, users, customer, category):
+        sr = ServiceRequest.objects.create(user=customer, service_category=category, status="pending")
+        barrier = threading.Barrier(len(users))
+        statuses = []
+
+        def worker(user):
+            try:
+                barrier.wait()
+                statuses.append(accept(user, sr.id))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(u,)) for u in users]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        # reset so every provider is free for the next round
+        ServiceRequest.objects.filter(pk=sr.pk).update(status="completed")
+        Provider.objects.filter(user__in=users).update(active_request=None)
+        return elapsed, statuses
+
+    def _run(self, mode, users, customer, category, rounds):
+        accept = legacy_accept if mode == "legacy" else cas_accept
+        total = 0.0
+        winners = 0
+        for _ in range(rounds):
+            elapsed, statuses = self._round(accept, users, customer, category)
+            total += elapsed
+            winners += statuses.count(200)
+            if statuses.count(200) != 1:
+                raise CommandError(f"{mode}: expected exactly one winner, got {statuses}")
+        attempts = rounds * len(users)
+        return {
+            "rounds": rounds,
+            "attempts": attempts,
+            "accepted": winners,
+            "total_s": round(total, 4),
+            "mean_round_ms": round(total / rounds * 1000, 3),
+            "attempts_per_s": round(attempts / total, 1),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stderr.write("SQLite serializes all writers; run against MySQL for meaningful contention numbers.")
+
+        memory_layer = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        modes = ["legacy", "cas"] if options["mode"] == "both" else [options["mode"]]
+        results = {}
+
+        with override_settings(CHANNEL_LAYERS=memory_layer):
+            category, customer, users = self._setup(options["providers"])
+            try:
+                for mode in modes:
+                    results[mode] = self._run(mode, users, customer, category, options["rounds"])
+                    self.stdout.write(f"{mode:7s} {results[mode]}")
+            finally:
+                User.objects.filter(username__startswith=PREFIX).delete()
+                category.delete()
+
+        with open(options["output"], "w") as fh:
+            json.dump({
+                "database": connection.vendor,
+                "options": {k: options[k] for k in ("providers", "rounds", "mode")},
+                "results": results,
+            }, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
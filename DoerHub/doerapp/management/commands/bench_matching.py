@@ -0,0 +1,329 @@
+import json
+import math
+import random
+import subprocess
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from DoerHub.celery import app as celery_app
+from doerapp import location_store, presence
+from doerapp.geo import MATCH_RADIUS_KM, geo_cell, haversine_distance
+from doerapp.models import Provider, ServiceCategory, ServiceRequest
+from doerapp.views import AcceptServiceRequestAPI, ProviderIncomingRequestsAPI, ServiceRequestAPI
+
+PREFIX = "bench_"
+KM_PER_DEG = 111.195
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """samples: list of (latency_ms, queries, sends)"""
+    latencies = [s[0] for s in samples]
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(latencies, 50), 3) if samples else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if samples else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if samples else None,
+        "mean_queries": round(sum(s[1] for s in samples) / len(samples), 2) if samples else None,
+        "max_queries": max(s[1] for s in samples) if samples else None,
+        "channel_sends": sum(s[2] for s in samples),
+    }
+
+
+class SendCounter:
+    """Wraps a channel layer's group_send to count calls."""
+
+    def __init__(self, layer):
+        self.count = 0
+        self._original = layer.group_send
+        layer.group_send = self._group_send
+
+    async def _group_send(self, group, message):
+        self.count += 1
+        return await self._original(group, message)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark request creation, incoming-request listing and acceptance "
+        "against synthetic cities. Writes JSON results for comparison across commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--providers", type=int, default=2000)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--distribution",
+            choices=["uniform", "clustered", "hotspot"],
+            default="clustered",
+        )
+        parser.add_argument("--center", type=float, nargs=2, default=[10.0159, 76.3419], metavar=("LAT", "LON"))
+        parser.add_argument("--spread-km", type=float, default=25.0, help="Half-width of the synthetic city.")
+        parser.add_argument("--online-ratio", type=float, default=0.7)
+        parser.add_argument("--listings", type=int, default=200, help="Incoming-request listings to time.")
+        parser.add_argument("--accepts", type=int, default=100, help="Acceptances to time.")
+        parser.add_argument(
+            "--snapshot-checks", type=int, default=50,
+            help="Points at which the snapshot engine is checked against haversine_distance (0 to skip).",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", default="bench_matching.json")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic data afterwards.")
+
+    # ----------------- Synthetic city -----------------
+
+    def _point(self, rng, options, clusters):
+        lat0, lon0 = options["center"]
+        spread = options["spread_km"]
+        distribution = options["distribution"]
+
+        if distribution == "uniform":
+            dx, dy = rng.uniform(-spread, spread), rng.uniform(-spread, spread)
+        elif distribution == "hotspot":
+            # 80% of points within a fifth of the city
+            scale = spread / 5 if rng.random() < 0.8 else spread
+            dx, dy = rng.uniform(-scale, scale), rng.uniform(-scale, scale)
+        else:
+            cx, cy = rng.choice(clusters)
+            dx, dy = rng.gauss(cx, spread / 10), rng.gauss(cy, spread / 10)
+
+        lat = lat0 + dy / KM_PER_DEG
+        lon = lon0 + dx / (KM_PER_DEG * math.cos(math.radians(lat0)))
+        return lat, lon
+
+    def _build_city(self, rng, options):
+        spread = options["spread_km"]
+        clusters = [(rng.uniform(-spread, spread), rng.uniform(-spread, spread)) for _ in range(8)]
+
+        category = ServiceCategory.objects.create(name=f"{PREFIX}{int(time.time())}", category_type="immediate")
+
+        n = options["providers"]
+        User.objects.bulk_create(
+            [User(username=f"{PREFIX}p{i}", email=f"{PREFIX}p{i}@example.com") for i in range(n)],
+            batch_size=1000,
+        )
+        User.objects.bulk_create(
+            [User(username=f"{PREFIX}u{i}", email=f"{PREFIX}u{i}@example.com") for i in range(options["requests"])],
+            batch_size=1000,
+        )
+        provider_users = list(User.objects.filter(username__startswith=f"{PREFIX}p").order_by("id"))
+        request_users = list(User.objects.filter(username__startswith=f"{PREFIX}u").order_by("id"))
+
+        providers = []
+        for user in provider_users:
+            lat, lon = self._point(rng, options, clusters)
+            providers.append(Provider(
+                user=user,
+                username=user.username,
+                email=user.email,
+                bio="benchmark provider",
+                aadhaar_number="000000000000",
+                aadhaar_document="",
+                experience=1,
+                verified=True,
+                email_verified=True,
+                is_online=rng.random() < options["online_ratio"],
+                service_category=category,
+                location_lat=lat,
+                location_lon=lon,
+                geo_cell=geo_cell(lat, lon),
+            ))
+        Provider.objects.bulk_create(providers, batch_size=1000)
+        providers = list(Provider.objects.filter(service_category=category).select_related("user"))
+        for provider in providers:
+            if provider.is_online:
+                presence.get_presence().connect(provider.id, "bench", ttl=24 * 3600)
+
+        return category, providers, request_users, clusters
+
+    def _cleanup(self, category):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        category.delete()
+
+    # ----------------- Snapshot engine check -----------------
+
+    def _check_snapshot(self, rng, options, category, clusters):
+        """
+        Rank the online providers around random points with the snapshot
+        engine and with the haversine_distance SQL expression; raise
+        CommandError unless every distance agrees within
+        SNAPSHOT_DISTANCE_TOLERANCE_KM and the order only differs on ties.
+        """
+        from doerapp.provider_snapshot import SNAPSHOT_DISTANCE_TOLERANCE_KM, SnapshotMatchingEngine
+
+        tolerance = SNAPSHOT_DISTANCE_TOLERANCE_KM
+        engine = SnapshotMatchingEngine()
+        online = Provider.objects.filter(
+            service_category=category,
+            verified=True,
+            id__in=presence.get_presence().online_ids(),
+            location_lat__isnull=False,
+            location_lon__isnull=False,
+        )
+        worst = 0.0
+        for _ in range(options["snapshot_checks"]):
+            lat, lon = self._point(rng, options, clusters)
+            expected = dict(
+                online.annotate(distance_km=haversine_distance(
+                    Cast("location_lat", FloatField()),
+                    Cast("location_lon", FloatField()),
+                    Value(lat),
+                    Value(lon),
+                )).values_list("id", "distance_km")
+            )
+            ranked = engine.search(category.id, lat, lon, MATCH_RADIUS_KM)
+
+            missing = {
+                pid for pid, distance in expected.items()
+                if distance <= MATCH_RADIUS_KM - tolerance
+            } - {pid for pid, _ in ranked}
+            if missing:
+                raise CommandError(f"snapshot: {len(missing)} provider(s) in range missing at ({lat}, {lon})")
+
+            previous = 0.0
+            for pid, distance in ranked:
+                if pid not in expected or expected[pid] > MATCH_RADIUS_KM + tolerance:
+                    raise CommandError(f"snapshot: provider {pid} out of range at ({lat}, {lon})")
+                error = abs(distance - expected[pid])
+                if error > tolerance:
+                    raise CommandError(f"snapshot: provider {pid} is {error:.6f} km off at ({lat}, {lon})")
+                if expected[pid] < previous - tolerance:
+                    raise CommandError(f"snapshot: ranking differs at provider {pid} at ({lat}, {lon})")
+                previous = expected[pid]
+                worst = max(worst, error)
+        return {"points": options["snapshot_checks"], "max_error_km": worst, "tolerance_km": tolerance}
+
+    # ----------------- Scenarios -----------------
+
+    def _timed(self, counter, fn):
+        sends_before = counter.count
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = fn()
+            elapsed = (time.perf_counter() - start) * 1000
+        return response, (elapsed, len(ctx.captured_queries), counter.count - sends_before)
+
+    def _bench_create(self, rng, options, category, users, clusters, counter):
+        factory = APIRequestFactory()
+        view = ServiceRequestAPI.as_view()
+        samples = []
+        for user in users:
+            lat, lon = self._point(rng, options, clusters)
+            request = factory.post(
+                "/api/service-requests/",
+                {"service_category": category.id, "location_lat": lat, "location_lon": lon},
+                format="json",
+            )
+            force_authenticate(request, user=user)
+            response, sample = self._timed(counter, lambda: view(request))
+            if response.status_code != 201:
+                raise RuntimeError(f"create failed: {response.status_code} {response.data}")
+            samples.append(sample)
+        return samples
+
+    def _bench_listing(self, rng, options, providers, counter):
+        factory = APIRequestFactory()
+        view = ProviderIncomingRequestsAPI.as_view()
+        samples = []
+        for provider in rng.sample(providers, min(options["listings"], len(providers))):
+            request = factory.get("/api/provider/requests/")
+            force_authenticate(request, user=provider.user)
+            response, sample = self._timed(counter, lambda: view(request).render())
+            samples.append(sample)
+        return samples
+
+    def _bench_accept(self, options, category, providers, counter):
+        factory = APIRequestFactory()
+        view = AcceptServiceRequestAPI.as_view()
+        samples = []
+        pending = list(ServiceRequest.objects.filter(service_category=category, status="pending").order_by("id"))
+        for sr, provider in zip(pending[: options["accepts"]], providers):
+            request = factory.post(f"/api/provider/requests/{sr.id}/accept/")
+            force_authenticate(request, user=provider.user)
+            response, sample = self._timed(counter, lambda: view(request, pk=sr.id))
+            samples.append(sample)
+        return samples
+
+    # ----------------- Entry point -----------------
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        memory_layer = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        previous_store = location_store._store
+        previous_presence = presence._presence
+        previous_eager = celery_app.conf.task_always_eager
+
+        with override_settings(CHANNEL_LAYERS=memory_layer):
+            from channels.layers import get_channel_layer
+
+            location_store._store = location_store.InMemoryLocationStore()
+            presence._presence = presence.InMemoryPresence()
+            celery_app.conf.task_always_eager = True
+            counter = SendCounter(get_channel_layer())
+
+            self.stdout.write(f"Building {options['distribution']} city with {options['providers']} providers...")
+            category, providers, users, clusters = self._build_city(rng, options)
+            try:
+                snapshot_check = (
+                    self._check_snapshot(rng, options, category, clusters)
+                    if options["snapshot_checks"] else None
+                )
+                results = {
+                    "create_request": summarize(self._bench_create(rng, options, category, users, clusters, counter)),
+                    "incoming_requests": summarize(self._bench_listing(rng, options, providers, counter)),
+                    "accept_request": summarize(self._bench_accept(options, category, providers, counter)),
+                }
+            finally:
+                if not options["keep"]:
+                    self._cleanup(category)
+                location_store._store = previous_store
+                presence._presence = previous_presence
+                celery_app.conf.task_always_eager = previous_eager
+
+        report = {
+            "commit": self._commit(),
+            "timestamp": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {k: options[k] for k in (
+                "providers", "requests", "distribution", "center", "spread_km",
+                "online_ratio", "listings", "accepts", "snapshot_checks", "seed",
+            )},
+            "results": results,
+            "snapshot_check": snapshot_check,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:20s} n={stats['count']:<5d} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms "
+                f"queries~{stats['mean_queries']} sends={stats['channel_sends']}"
+            )
+        if snapshot_check:
+            self.stdout.write(
+                f"snapshot engine      points={snapshot_check['points']} "
+                f"max error={snapshot_check['max_error_km']:.6f}km (tolerance {snapshot_check['tolerance_km']}km)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _commit(self):
+        try:
+            return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        except Exception:
+            return None
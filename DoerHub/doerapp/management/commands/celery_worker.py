@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from DoerHub.celery import app
+
+
+class Command(BaseCommand):
+    help = "Run a Celery worker for one queue with its CELERY_QUEUE_CONFIG concurrency and prefetch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("queue", help="critical, transactional, bulk or default")
+        parser.add_argument("--loglevel", default="info")
+
+    def handle(self, *args, **options):
+        queue = options["queue"]
+        config = settings.CELERY_QUEUE_CONFIG.get(queue)
+        if config is None:
+            raise CommandError(f"Unknown queue '{queue}'. Known: {', '.join(settings.CELERY_QUEUE_CONFIG)}")
+
+        argv = [
+            "worker",
+            "--queues", queue,
+            "--hostname", f"{queue}@%h",
+            "--concurrency", str(config.get("concurrency", 1)),
+            "--prefetch-multiplier", str(config.get("prefetch_multiplier", 1)),
+            "--loglevel", options["loglevel"],
+        ]
+        self.stdout.write(f"Starting worker: celery {' '.join(argv)}")
+        app.worker_main(argv)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from doerapp.email_outbox import LANES
+from doerapp.task_metrics import summary
+
+
+class Command(BaseCommand):
+    help = "Recent per-queue Celery wait / run times and per-lane email delivery latency."
+
+    def handle(self, *args, **options):
+        rows = []
+        for queue, config in settings.CELERY_QUEUE_CONFIG.items():
+            rows.append((f"queue_wait {queue}", summary("queue_wait", queue), config.get("latency_slo")))
+            rows.append((f"runtime    {queue}", summary("runtime", queue), None))
+        for lane in LANES:
+            rows.append((f"email      {lane}", summary("email", lane), None))
+
+        self.stdout.write(f"{'series':<26}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}  slo")
+        for name, stats, slo in rows:
+            if stats is None:
+                self.stdout.write(f"{name:<26}{'-':>7}")
+                continue
+            line = (
+                f"{name:<26}{stats['count']:>7}{stats['p50_ms']:>10}"
+                f"{stats['p95_ms']:>10}{stats['max_ms']:>10}"
+            )
+            if slo is not None:
+                ok = stats["p95_ms"] <= slo * 1000
+                line += f"  {slo}s " + ("ok" if ok else "MISSED")
+                line = self.style.SUCCESS(line) if ok else self.style.WARNING(line)
+            self.stdout.write(line)
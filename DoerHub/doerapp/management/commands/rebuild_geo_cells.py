@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from doerapp.geo import geo_cell
+from doerapp.models import Provider, ServiceRequest
+
+
+class Command(BaseCommand):
+    help = "Recompute geo_cell for every Provider and ServiceRequest (run after changing GEO_CELL_SIZE_DEG)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        for model in (Provider, ServiceRequest):
+            updated = 0
+            batch = []
+            rows = model.objects.only("id", "location_lat", "location_lon", "geo_cell")
+            for row in rows.iterator(chunk_size=batch_size):
+                cell = geo_cell(row.location_lat, row.location_lon)
+                if cell == row.geo_cell:
+                    continue
+                row.geo_cell = cell
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, ["geo_cell"])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ["geo_cell"])
+                updated += len(batch)
+
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {updated} row(s) updated"))
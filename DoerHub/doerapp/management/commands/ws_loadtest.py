@@ -0,0 +1,435 @@
+import asyncio
+import json
+import subprocess
+import time
+import tracemalloc
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from doerapp import chat_cache, location_store, presence
+from doerapp.geo import cell_group_name, geo_cell
+from doerapp.management.commands.bench_matching import percentile
+from doerapp.models import ChatRoom, Provider, ServiceCategory, ServiceRequest
+
+PREFIX = "wsload_"
+
+
+def latency_stats(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+
+def rss_kb(pid="self"):
+    """Resident set size of a process from /proc (Linux only), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# ----------------- Clients -----------------
+
+class CommunicatorClient:
+    """In-process client: the consumer runs in this event loop via channels.testing."""
+
+    def __init__(self, application, path):
+        from channels.testing import WebsocketCommunicator
+
+        self.communicator = WebsocketCommunicator(application, path)
+
+    async def connect(self, timeout):
+        connected, _ = await self.communicator.connect(timeout=timeout)
+        return connected
+
+    async def send_json(self, content):
+        await self.communicator.send_json_to(content)
+
+    async def receive_json(self):
+        return await self.communicator.receive_json_from(timeout=3600)
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class RawClient:
+    """Real WebSocket against a running Daphne/uvicorn server (aiohttp)."""
+
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+        self.ws = None
+
+    async def connect(self, timeout):
+        import aiohttp
+
+        try:
+            self.ws = await self.session.ws_connect(self.url, timeout=aiohttp.ClientWSTimeout(ws_close=timeout))
+        except aiohttp.ClientError:
+            return False
+        return True
+
+    async def send_json(self, content):
+        await self.ws.send_json(content)
+
+    async def receive_json(self):
+        return await self.ws.receive_json()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class QueryCounter:
+    """connection.execute_wrapper callable counting every query."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# Consumers run their ORM code in asgiref's single sync thread, so the
+# wrapper has to be installed on that thread's connection.
+@database_sync_to_async
+def _install_counter(counter):
+    connection.execute_wrappers.append(counter)
+
+
+@database_sync_to_async
+def _remove_counter(counter):
+    connection.execute_wrappers.remove(counter)
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many authenticated ChatConsumer / ProviderRequestConsumer sockets, drive chat "
+        "and request-broadcast traffic, and report connect latency, fan-out latency, memory "
+        "per connection and DB queries per message."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["inprocess", "server"], default="inprocess",
+                            help="inprocess: channels.testing communicators; server: real sockets via aiohttp.")
+        parser.add_argument("--url", default="ws://127.0.0.1:8000", help="Server base URL (server mode).")
+        parser.add_argument("--server-pid", type=int, help="Daphne pid to sample RSS from (server mode).")
+        parser.add_argument("--layer", choices=["memory", "redis"], default="memory",
+                            help="Channel layer for inprocess mode (server mode always needs the server's Redis).")
+        parser.add_argument("--redis-url", default="redis://127.0.0.1:6379/0")
+        parser.add_argument("--rooms", type=int, default=500, help="Chat rooms; two sockets each.")
+        parser.add_argument("--providers", type=int, default=1000, help="Provider request sockets.")
+        parser.add_argument("--messages", type=int, default=20, help="Chat rounds; one message per room per round.")
+        parser.add_argument("--broadcasts", type=int, default=20, help="New-request broadcasts to all providers.")
+        parser.add_argument("--interval-ms", type=int, default=100, help="Pause between traffic rounds.")
+        parser.add_argument("--concurrency", type=int, default=200, help="Connections opened at once.")
+        parser.add_argument("--timeout", type=float, default=10.0)
+        parser.add_argument("--center", type=float, nargs=2, default=[10.0159, 76.3419], metavar=("LAT", "LON"))
+        parser.add_argument("--output", default="ws_loadtest.json")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic data afterwards.")
+
+    # ----------------- Synthetic data -----------------
+
+    def _setup(self, options):
+        lat, lon = options["center"]
+        n_rooms, n_providers = options["rooms"], options["providers"]
+        n_provider_users = max(n_rooms, n_providers)
+
+        category = ServiceCategory.objects.create(name=f"{PREFIX}{int(time.time())}", category_type="immediate")
+        User.objects.bulk_create(
+            [User(username=f"{PREFIX}p{i}") for i in range(n_provider_users)]
+            + [User(username=f"{PREFIX}u{i}") for i in range(n_rooms)],
+            batch_size=1000,
+        )
+        provider_users = list(User.objects.filter(username__startswith=f"{PREFIX}p").order_by("id"))
+        customers = list(User.objects.filter(username__startswith=f"{PREFIX}u").order_by("id"))
+
+        # every provider in one cell, so a single group_send fans out to all
+        Provider.objects.bulk_create([
+            Provider(
+                user=user, username=user.username, bio="load test provider",
+                aadhaar_number="000000000000", aadhaar_document="", experience=1,
+                verified=True, service_category=category,
+                location_lat=lat, location_lon=lon, geo_cell=geo_cell(lat, lon),
+            )
+            for user in provider_users
+        ], batch_size=1000)
+        providers = list(Provider.objects.filter(service_category=category).order_by("id"))
+
+        ServiceRequest.objects.bulk_create([
+            ServiceRequest(user=customer, provider=provider, service_category=category,
+                           status="accepted", location_lat=lat, location_lon=lon)
+            for customer, provider in zip(customers, providers)
+        ], batch_size=1000)
+        requests = ServiceRequest.objects.filter(service_category=category).order_by("id")
+        ChatRoom.objects.bulk_create([
+            ChatRoom(service_request=sr, user_id=sr.user_id, provider_id=sr.provider.user_id)
+            for sr in requests.select_related("provider")
+        ], batch_size=1000)
+        rooms = list(ChatRoom.objects.filter(service_request__service_category=category).order_by("id"))
+
+        tokens = {user.id: str(AccessToken.for_user(user)) for user in provider_users + customers}
+        return category, providers[:n_providers], rooms, tokens
+
+    def _cleanup(self, category):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        category.delete()
+
+    # ----------------- Load run -----------------
+
+    async def _open(self, make_client, targets, options, connect_ms):
+        """targets: list of (path, tag). Returns [(client, tag)] for sockets that connected."""
+        opened = []
+
+        async def open_one(path, tag):
+            client = make_client(path)
+            start = time.perf_counter()
+            if await client.connect(options["timeout"]):
+                connect_ms.append((time.perf_counter() - start) * 1000)
+                opened.append((client, tag))
+
+        for i in range(0, len(targets), options["concurrency"]):
+            batch = targets[i:i + options["concurrency"]]
+            await asyncio.gather(*(open_one(path, tag) for path, tag in batch))
+        return opened
+
+    async def _reader(self, client, sent, chat_ms, broadcast_ms, received):
+        while True:
+            try:
+                content = await client.receive_json()
+            except (asyncio.CancelledError, Exception):
+                return
+            kind = content.get("type")
+            if kind == "chat_message" and str(content.get("message", "")).startswith("lt:"):
+                key = content["message"]
+                samples = chat_ms
+            elif kind == "new_request":
+                key = f"bc:{content.get('request_id')}"
+                samples = broadcast_ms
+            else:
+                continue
+            if key in sent:
+                samples.append((time.perf_counter() - sent[key]) * 1000)
+                received[0] += 1
+
+    async def _wait_for(self, received, expected, timeout):
+        deadline = time.monotonic() + timeout
+        while received[0] < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def _run(self, options, category, providers, rooms, tokens, make_client, channel_layer, count_queries):
+        connect_ms, chat_ms, broadcast_ms = [], [], []
+        sent, received = {}, [0]
+        lat, lon = options["center"]
+
+        provider_targets = [
+            (f"/ws/requests/provider/{p.id}/?token={tokens[p.user_id]}", None) for p in providers
+        ]
+        chat_targets = []
+        for room in rooms:
+            chat_targets.append((f"/ws/chat/{room.id}/?token={tokens[room.user_id]}", room.id))
+            chat_targets.append((f"/ws/chat/{room.id}/?token={tokens[room.provider_id]}", None))
+
+        tracemalloc.start()
+        heap_before = tracemalloc.get_traced_memory()[0]
+        rss_before = rss_kb(options["server_pid"] or "self")
+
+        started = time.perf_counter()
+        provider_clients = await self._open(make_client, provider_targets, options, connect_ms)
+        chat_clients = await self._open(make_client, chat_targets, options, connect_ms)
+        connect_wall = time.perf_counter() - started
+
+        heap_after = tracemalloc.get_traced_memory()[0]
+        rss_after = rss_kb(options["server_pid"] or "self")
+        tracemalloc.stop()
+        n_open = len(provider_clients) + len(chat_clients)
+        self.stdout.write(f"Opened {n_open}/{len(provider_targets) + len(chat_targets)} sockets in {connect_wall:.2f}s")
+
+        readers = [
+            asyncio.create_task(self._reader(client, sent, chat_ms, broadcast_ms, received))
+            for client, _ in provider_clients + chat_clients
+        ]
+        senders = [(client, room_id) for client, room_id in chat_clients if room_id is not None]
+        # give consumers time to send their connect-time messages
+        await asyncio.sleep(0.5)
+
+        counter = QueryCounter()
+        if count_queries:
+            await _install_counter(counter)
+
+        # Chat: every room sends one message per round; both participants receive it.
+        expected = 0
+        for rnd in range(options["messages"]):
+            for client, room_id in senders:
+                key = f"lt:{rnd}:{room_id}"
+                sent[key] = time.perf_counter()
+                await client.send_json({"message": key})
+            expected += 2 * len(senders)
+            await asyncio.sleep(options["interval_ms"] / 1000)
+        await self._wait_for(received, expected, options["timeout"])
+        chat_queries = counter.count
+        chat_messages = options["messages"] * len(senders)
+
+        # Broadcasts: one cell-group send reaches every provider socket.
+        group = cell_group_name(category.id, geo_cell(lat, lon))
+        for seq in range(options["broadcasts"]):
+            sent[f"bc:{seq}"] = time.perf_counter()
+            await channel_layer.group_send(group, {
+                "type": "new.request",
+                "request_id": seq,
+                "service_category": category.name,
+                "message": "load test",
+                "lat": lat, "lon": lon, "radius_km": 1.0,
+            })
+            expected += len(provider_clients)
+            await asyncio.sleep(options["interval_ms"] / 1000)
+        await self._wait_for(received, expected, options["timeout"])
+        broadcast_queries = counter.count - chat_queries
+
+        if count_queries:
+            await _remove_counter(counter)
+        for task in readers:
+            task.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        await asyncio.gather(*(client.close() for client, _ in provider_clients + chat_clients),
+                             return_exceptions=True)
+
+        return {
+            "connections": {
+                "attempted": len(provider_targets) + len(chat_targets),
+                "opened": n_open,
+                "wall_s": round(connect_wall, 3),
+                **latency_stats(connect_ms),
+            },
+            "chat_fanout": {
+                "messages": chat_messages,
+                "deliveries_expected": 2 * chat_messages,
+                **latency_stats(chat_ms),
+            },
+            "broadcast_fanout": {
+                "broadcasts": options["broadcasts"],
+                "deliveries_expected": options["broadcasts"] * len(provider_clients),
+                **latency_stats(broadcast_ms),
+            },
+            "memory": {
+                # inprocess: Python heap of consumers *and* test clients
+                "heap_bytes_per_connection": (
+                    round((heap_after - heap_before) / n_open) if options["mode"] == "inprocess" and n_open else None
+                ),
+                "rss_kb_per_connection": (
+                    round((rss_after - rss_before) / n_open, 2) if rss_before and rss_after and n_open else None
+                ),
+            },
+            "db": {
+                "queries_per_chat_message": round(chat_queries / chat_messages, 2) if count_queries and chat_messages else None,
+                "queries_per_broadcast": (
+                    round(broadcast_queries / options["broadcasts"], 2) if count_queries and options["broadcasts"] else None
+                ),
+            },
+        }
+
+    async def _inprocess(self, options, category, providers, rooms, tokens):
+        from channels.layers import get_channel_layer
+        from channels.routing import URLRouter
+
+        from doerapp.middleware import TokenAuthMiddlewareStack
+        from doerapp.routing import websocket_urlpatterns
+
+        application = TokenAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        return await self._run(
+            options, category, providers, rooms, tokens,
+            lambda path: CommunicatorClient(application, path),
+            get_channel_layer(), count_queries=True,
+        )
+
+    async def _server(self, options, category, providers, rooms, tokens):
+        import aiohttp
+        from channels_redis.core import RedisChannelLayer
+
+        # broadcasts must go through the server's own Redis layer
+        channel_layer = RedisChannelLayer(hosts=[options["redis_url"]])
+        base = options["url"].rstrip("/")
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await self._run(
+                options, category, providers, rooms, tokens,
+                lambda path: RawClient(session, base + path),
+                channel_layer, count_queries=False,
+            )
+
+    # ----------------- Entry point -----------------
+
+    def handle(self, *args, **options):
+        if options["mode"] == "server" and options["layer"] == "memory":
+            self.stderr.write("Server mode publishes through --redis-url; --layer is ignored.")
+
+        if options["layer"] == "redis":
+            layer = {"default": {"BACKEND": "channels_redis.core.RedisChannelLayer",
+                                 "CONFIG": {"hosts": [options["redis_url"]]}}}
+        else:
+            layer = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer",
+                                 "CONFIG": {"capacity": 1000}}}
+        local_cache = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+        previous = (location_store._store, presence._presence, chat_cache._cache)
+        if options["mode"] == "inprocess":
+            # everything in this process: no Redis needed unless --layer redis
+            location_store._store = location_store.InMemoryLocationStore()
+            presence._presence = presence.InMemoryPresence()
+            chat_cache._cache = chat_cache.LocalRecentMessages()
+
+        self.stdout.write(f"Creating {options['rooms']} chat rooms and {options['providers']} providers...")
+        category, providers, rooms, tokens = self._setup(options)
+        try:
+            with override_settings(CHANNEL_LAYERS=layer, CACHES=local_cache):
+                runner = self._inprocess if options["mode"] == "inprocess" else self._server
+                results = asyncio.run(runner(options, category, providers, rooms, tokens))
+        except ImportError as exc:
+            raise CommandError(f"Missing dependency for {options['mode']} mode: {exc}")
+        finally:
+            location_store._store, presence._presence, chat_cache._cache = previous
+            if not options["keep"]:
+                self._cleanup(category)
+
+        report = {
+            "commit": self._commit(),
+            "timestamp": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {k: options[k] for k in (
+                "mode", "layer", "rooms", "providers", "messages", "broadcasts", "interval_ms", "concurrency",
+            )},
+            "results": results,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+
+        conn, chat, bc = results["connections"], results["chat_fanout"], results["broadcast_fanout"]
+        self.stdout.write(f"connect    n={conn['opened']:<6d} p50={conn.get('p50_ms')}ms p99={conn.get('p99_ms')}ms")
+        self.stdout.write(f"chat       n={chat['count']:<6d} p50={chat.get('p50_ms')}ms p99={chat.get('p99_ms')}ms "
+                          f"queries/msg={results['db']['queries_per_chat_message']}")
+        self.stdout.write(f"broadcast  n={bc['count']:<6d} p50={bc.get('p50_ms')}ms p99={bc.get('p99_ms')}ms")
+        self.stdout.write(f"memory     {results['memory']}")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _commit(self):
+        try:
+            return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        except Exception:
+            return None
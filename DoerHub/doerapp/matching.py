@@ -0,0 +1,75 @@
+from django.conf import settings
+
+from .geo import MATCH_RADIUS_KM, within_radius
+from .location_store import get_location_store
+from .models import Provider
+from .presence import get_presence
+
+# "orm" scores candidates with the haversine SQL annotation; "snapshot"
+# uses the in-memory NumPy engine in provider_snapshot.py.
+MATCHING_ENGINE = getattr(settings, "MATCHING_ENGINE", "orm")
+
+
+def provider_location(provider):
+    """Return the provider's live (lat, lon), falling back to the saved location."""
+    live = get_location_store().get(provider.id)
+    if live:
+        return live
+    if provider.location_lat is None or provider.location_lon is None:
+        return None
+    return provider.location_lat, provider.location_lon
+
+
+def nearby_providers(service_category, lat, lon, radius_km=MATCH_RADIUS_KM, limit=None):
+    """
+    Online, verified providers of `service_category` within `radius_km` of
+    (lat, lon), nearest first, each with a `distance_km` attribute. At most
+    `limit` providers are returned when it is given. "Online" comes from
+    the presence service, not the (lagging) is_online column.
+
+    Live positions win over the saved columns: a provider whose saved
+    location is in range but whose live position has moved away is
+    dropped, and one that has moved into range is included.
+    """
+    base = Provider.objects.filter(
+        service_category=service_category,
+        verified=True,
+    )
+
+    if MATCHING_ENGINE == "snapshot":
+        from .provider_snapshot import get_snapshot_engine
+
+        category_id = getattr(service_category, "pk", service_category)
+        distances = dict(get_snapshot_engine().search(category_id, lat, lon, radius_km, limit))
+    else:
+        distances = _orm_distances(base, lat, lon, radius_km)
+
+    online = get_presence().online_among(distances)
+    if not online:
+        return []
+
+    providers = list(base.filter(id__in=online).select_related("user"))
+    for provider in providers:
+        provider.distance_km = distances[provider.id]
+    providers.sort(key=lambda p: p.distance_km)
+    return providers[:limit] if limit is not None else providers
+
+
+def _orm_distances(base, lat, lon, radius_km):
+    store = get_location_store()
+
+    distances = store.search(lat, lon, radius_km)
+
+    saved = dict(
+        within_radius(
+            base.filter(location_lat__isnull=False, location_lon__isnull=False),
+            lat,
+            lon,
+            radius_km,
+        ).values_list("id", "distance_km")
+    )
+    moved = store.get_many([pid for pid in saved if pid not in distances])
+    for pid, distance in saved.items():
+        if pid not in distances and pid not in moved:
+            distances[pid] = distance
+    return distances
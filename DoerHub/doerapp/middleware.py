@@ -1,21 +1,15 @@
 
 from urllib.parse import parse_qs
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from django.contrib.auth import get_user_model
 from channels.db import database_sync_to_async
 
-User = get_user_model()
+from .auth_cache import authenticate_token
+
 
 @database_sync_to_async
 def get_user_from_token(token):
-    try:
-        validated_token = UntypedToken(token)
-        user_id = validated_token['user_id']
-        return User.objects.get(pk=user_id)
-    except (InvalidToken, TokenError, KeyError, User.DoesNotExist):
-        return AnonymousUser()
+    # signature check + cached user lookup (see auth_cache)
+    return authenticate_token(token) or AnonymousUser()
 
 class QueryStringTokenAuthMiddleware:
     def __init__(self, inner):
@@ -35,4 +29,4 @@ class QueryStringTokenAuthMiddleware:
 
 def TokenAuthMiddlewareStack(inner):
     from channels.auth import AuthMiddlewareStack
-    return QueryStringTokenAuthMiddleware(AuthMiddlewareStack(inner))
\ No newline at end of file
+    return QueryStringTokenAuthMiddleware(AuthMiddlewareStack(inner))
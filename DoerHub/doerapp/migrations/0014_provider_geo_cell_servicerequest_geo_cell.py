@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2025-11-24 10:12
+
+from django.db import migrations, models
+
+from doerapp.geo import geo_cell
+
+
+def backfill_geo_cells(apps, schema_editor):
+    for model_name in ("Provider", "ServiceRequest"):
+        model = apps.get_model("doerapp", model_name)
+        rows = model.objects.filter(location_lat__isnull=False, location_lon__isnull=False)
+        batch = []
+        for row in rows.only("id", "location_lat", "location_lon").iterator(chunk_size=1000):
+            row.geo_cell = geo_cell(row.location_lat, row.location_lon)
+            batch.append(row)
+            if len(batch) >= 1000:
+                model.objects.bulk_update(batch, ["geo_cell"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["geo_cell"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0013_contactmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['service_category', 'geo_cell'], name='provider_category_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['service_category', 'status', 'geo_cell'], name='request_category_cell_idx'),
+        ),
+        migrations.RunPython(backfill_geo_cells, migrations.RunPython.noop),
+    ]
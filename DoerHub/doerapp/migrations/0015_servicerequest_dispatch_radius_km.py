@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2025-11-25 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0014_provider_geo_cell_servicerequest_geo_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='dispatch_radius_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2025-11-26 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_active_requests(apps, schema_editor):
+    Provider = apps.get_model("doerapp", "Provider")
+    ServiceRequest = apps.get_model("doerapp", "ServiceRequest")
+    accepted = (
+        ServiceRequest.objects.filter(status="accepted", provider__isnull=False)
+        .order_by("provider_id", "-id")
+        .values_list("provider_id", "id")
+    )
+    seen = set()
+    for provider_id, request_id in accepted:
+        if provider_id in seen:
+            continue
+        seen.add(provider_id)
+        Provider.objects.filter(pk=provider_id).update(active_request_id=request_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0015_servicerequest_dispatch_radius_km'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='active_request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='doerapp.servicerequest'),
+        ),
+        migrations.RunPython(backfill_active_requests, migrations.RunPython.noop),
+    ]
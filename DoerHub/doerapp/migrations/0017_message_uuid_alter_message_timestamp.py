@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2025-11-27 14:20
+
+import uuid
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def populate_uuids(apps, schema_editor):
+    Message = apps.get_model("doerapp", "Message")
+    batch = []
+    for msg in Message.objects.only("id").iterator(chunk_size=1000):
+        msg.uuid = uuid.uuid4()
+        batch.append(msg)
+        if len(batch) >= 1000:
+            Message.objects.bulk_update(batch, ["uuid"])
+            batch = []
+    if batch:
+        Message.objects.bulk_update(batch, ["uuid"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0016_provider_active_request'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2025-11-28 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0017_message_uuid_alter_message_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chatroom', 'timestamp', 'id'], name='message_room_time_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2025-12-02 09:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_markers(apps, schema_editor):
+    """Existing users have already seen every broadcast sent so far."""
+    Notification = apps.get_model('doerapp', 'Notification')
+    NotificationReadMarker = apps.get_model('doerapp', 'NotificationReadMarker')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    latest = (
+        Notification.objects.filter(recipient__isnull=True)
+        .order_by('-id')
+        .values_list('id', flat=True)
+        .first()
+    )
+    if not latest:
+        return
+    NotificationReadMarker.objects.bulk_create(
+        [
+            NotificationReadMarker(user_id=user_id, last_seen_broadcast_id=latest)
+            for user_id in User.objects.values_list('id', flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0018_message_message_room_time_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notif_recipient_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'is_read'], name='notif_recipient_read_idx'),
+        ),
+        migrations.CreateModel(
+            name='NotificationReadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seen_broadcast_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_marker', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(seed_markers, migrations.RunPython.noop),
+    ]
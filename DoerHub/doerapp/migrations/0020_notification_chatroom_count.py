@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2025-12-03 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_chat_notifications(apps, schema_editor):
+    """Point existing chat notifications at their room (from extra_data) so they coalesce too."""
+    Notification = apps.get_model('doerapp', 'Notification')
+    ChatRoom = apps.get_model('doerapp', 'ChatRoom')
+
+    rooms = set(ChatRoom.objects.values_list('id', flat=True))
+    batch = []
+    for notif in Notification.objects.filter(type='chat', chatroom__isnull=True).only('id', 'extra_data').iterator():
+        room_id = (notif.extra_data or {}).get('chatroom_id')
+        if room_id in rooms:
+            notif.chatroom_id = room_id
+            batch.append(notif)
+        if len(batch) >= 1000:
+            Notification.objects.bulk_update(batch, ['chatroom'])
+            batch = []
+    if batch:
+        Notification.objects.bulk_update(batch, ['chatroom'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0019_notification_indexes_notificationreadmarker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='chatroom',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='doerapp.chatroom'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'chatroom', 'is_read'], name='notif_recipient_chat_idx'),
+        ),
+        migrations.RunPython(link_chat_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2025-12-05 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0023_servicerequest_expired_maintenance_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webinarposter',
+            name='webinar_date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2025-12-08 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0024_alter_webinarposter_webinar_date'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_room_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chatroom', 'timestamp', 'uuid'], name='message_room_time_uuid_idx'),
+        ),
+    ]
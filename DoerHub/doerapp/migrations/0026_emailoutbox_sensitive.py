@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2025-12-09 09:40
+
+from django.db import migrations, models
+
+
+def redact_otp_emails(apps, schema_editor):
+    # OTP mails queued before the flag existed: their body is the code
+    EmailOutbox = apps.get_model("doerapp", "EmailOutbox")
+    otps = EmailOutbox.objects.filter(subject="DoerHub OTP")
+    otps.update(sensitive=True)
+    otps.exclude(status="pending").update(body="[redacted]")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0025_message_room_time_uuid_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='sensitive',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(redact_otp_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2025-12-09 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0026_emailoutbox_sensitive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailoutbox',
+            index=models.Index(fields=['status', 'sent_at'], name='outbox_sent_time_idx'),
+        ),
+    ]
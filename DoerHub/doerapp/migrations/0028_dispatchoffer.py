@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2025-12-09 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doerapp', '0027_emailoutbox_sent_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispatchOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='doerapp.provider')),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='doerapp.servicerequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='offer_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'service_request'), name='offer_provider_request_uniq')],
+            },
+        ),
+    ]
@@ -1,10 +1,21 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
-from .utils import send_broadcast_notification
+from django.db.models.signals import post_delete, post_save
+from .geo import geo_cell as compute_geo_cell
+
+
+def _sync_geo_cell(instance, save_kwargs):
+    """Keep geo_cell in step with location_lat/location_lon on save()."""
+    instance.geo_cell = compute_geo_cell(instance.location_lat, instance.location_lon)
+    update_fields = save_kwargs.get("update_fields")
+    if update_fields is not None and {"location_lat", "location_lon"} & set(update_fields):
+        save_kwargs["update_fields"] = {*update_fields, "geo_cell"}
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -56,10 +67,24 @@ class Provider(models.Model):
     email_verified = models.BooleanField(default=False)
     otp = models.CharField(max_length=6, null=True, blank=True)  # Optional fallback storage
     otp_created_at = models.DateTimeField(null=True, blank=True)
+    geo_cell = models.CharField(max_length=16, null=True, blank=True, editable=False)
+    # The accepted request this provider is working on (one at a time);
+    # claimed/released with conditional UPDATEs, see AcceptServiceRequestAPI.
+    active_request = models.ForeignKey(
+        'ServiceRequest', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["service_category", "geo_cell"], name="provider_category_cell_idx"),
+        ]
 
     def __str__(self):
         return f"Provider: {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        _sync_geo_cell(self, kwargs)
+        super().save(*args, **kwargs)
+
     def delete(self, *args, **kwargs):
         # Delete associated files from storage
         if self.aadhaar_document:
@@ -87,6 +112,7 @@ class ServiceRequest(models.Model):
         ('rejected', 'Rejected'),
         ('cancelled', 'Cancelled'),
         ('completed', 'Completed'),
+        ('expired', 'Expired'),  # nobody accepted in time (maintenance.expire_stale_requests)
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='requests')
@@ -98,10 +124,43 @@ class ServiceRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+    geo_cell = models.CharField(max_length=16, null=True, blank=True, editable=False)
+    # radius of the open (final) dispatch wave once it has run; before that
+    # only providers with a DispatchOffer see the request
+    dispatch_radius_km = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["service_category", "status", "geo_cell"], name="request_category_cell_idx"),
+            models.Index(fields=["status", "created_at"], name="request_status_time_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} -> {self.service_category} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        _sync_geo_cell(self, kwargs)
+        super().save(*args, **kwargs)
+
+
+class DispatchOffer(models.Model):
+    """A provider a capped dispatch wave offered the request to (see dispatch.run_wave)."""
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name="offers")
+    provider = models.ForeignKey('Provider', on_delete=models.CASCADE, related_name="offers")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "service_request"], name="offer_provider_request_uniq"),
+        ]
+        indexes = [
+            # retention pruning
+            models.Index(fields=["created_at"], name="offer_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"request {self.service_request_id} -> provider {self.provider_id}"
+
 
 # chatroom and message 
 
@@ -124,7 +183,16 @@ class Message(models.Model):
     chatroom = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Assigned up front (not auto_now_add) so write-behind batches keep the
+    # time the message was sent; uuid identifies a message before it has a pk.
+    timestamp = models.DateTimeField(default=timezone.now)
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of a room's history (see chat_history.py)
+            models.Index(fields=["chatroom", "timestamp", "uuid"], name="message_room_time_uuid_idx"),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} at {self.timestamp}"
@@ -140,7 +208,7 @@ class WebinarPoster(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to="webinar_posters/")
-    webinar_date = models.DateField()
+    webinar_date = models.DateField(db_index=True)
     webinar_type = models.CharField(max_length=10, choices=WEBINAR_TYPE_CHOICES, default="free")
     price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     meeting_url = models.URLField(max_length=500,blank=True,help_text="Zoom/Meet/any platform URL for the live session")
@@ -168,6 +236,69 @@ class WebinarRegistration(models.Model):
         return f"{self.user.username} - {self.webinar.title}"
 
 
+class BulkEmailJob(models.Model):
+    """One bulk send (e.g. a webinar's join link), delivered in chunks by Celery (see bulk_email)."""
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bulk_email_jobs")
+    webinar = models.ForeignKey("WebinarPoster", on_delete=models.CASCADE, null=True, blank=True, related_name="email_jobs")
+    subject = models.CharField(max_length=255)
+    body_template = models.TextField()  # "{{name}}" is replaced per recipient
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} [{self.status}] {self.sent}/{self.total}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing email. Written in the same transaction as the change that
+    triggers it and delivered by email_outbox.dispatch().
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("dead", "Dead"),  # gave up after EMAIL_OUTBOX_MAX_ATTEMPTS
+    ]
+
+    idempotency_key = models.CharField(max_length=191, unique=True)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    priority = models.PositiveSmallIntegerField(default=5)  # lower is sent first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    bulk_job = models.ForeignKey(BulkEmailJob, on_delete=models.CASCADE, null=True, blank=True, related_name="emails")
+    # body holds a secret (OTP): blanked once the row is sent or dead
+    sensitive = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # dispatcher: due pending rows
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+            # retention purge of sent rows
+            models.Index(fields=["status", "sent_at"], name="outbox_sent_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject} [{self.status}]"
+
+
 
 
 User = get_user_model()
@@ -179,11 +310,34 @@ class Notification(models.Model):
     )  # NULL = broadcast
     message = models.TextField()
     extra_data = models.JSONField(default=dict, blank=True)
-    is_read = models.BooleanField(default=False)
+    is_read = models.BooleanField(default=False)  # personal only; broadcasts use NotificationReadMarker
     created_at = models.DateTimeField(auto_now_add=True)
+    # chat notifications are coalesced per (recipient, chatroom) while unread
+    chatroom = models.ForeignKey("ChatRoom", on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # feed: one range scan per source (recipient = user / recipient IS NULL)
+            models.Index(fields=["recipient", "created_at"], name="notif_recipient_time_idx"),
+            models.Index(fields=["recipient", "is_read"], name="notif_recipient_read_idx"),
+            models.Index(fields=["recipient", "chatroom", "is_read"], name="notif_recipient_chat_idx"),
+            # retention pruning of read rows
+            models.Index(fields=["is_read", "created_at"], name="notif_read_time_idx"),
+        ]
 
     def __str__(self):
         return f"{'[ALL]' if not self.recipient else self.recipient.username}: {self.message[:30]}"
+
+
+class NotificationReadMarker(models.Model):
+    """Per-user read state for broadcasts: every broadcast with id <= last_seen_broadcast_id is read."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="notification_marker")
+    last_seen_broadcast_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: broadcasts <= {self.last_seen_broadcast_id}"
     
 
 @receiver(post_save, sender=ServiceCategory)
@@ -196,7 +350,7 @@ def notify_new_service_category(sender, instance, created, **kwargs):
             "category_name": instance.name,
         }
 
-        # 1. Save to DB
+        # saved rows are pushed to sockets by publish_new_notification
         Notification.objects.create(
             type="broadcast",
             message=message,
@@ -205,8 +359,42 @@ def notify_new_service_category(sender, instance, created, **kwargs):
             is_read=False
         )
 
-        # 2. Send via WebSocket (no model import in utils)
-        send_broadcast_notification(message, extra_data)
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    # bulk_create skips this: callers must update the counters themselves.
+    # Counted and pushed once committed, so a rolled-back row is never counted
+    # and the insert doesn't wait on the channel layer.
+    if not created:
+        return
+    from . import notification_counters
+    if instance.recipient_id is None:
+        transaction.on_commit(notification_counters.broadcast_added)
+    elif not instance.is_read:
+        recipient_id = instance.recipient_id
+        transaction.on_commit(lambda: notification_counters.personal_added({recipient_id: 1}))
+
+
+@receiver(post_save, sender=Notification)
+def publish_new_notification(sender, instance, created, **kwargs):
+    if created:
+        from .notification_store import publish
+        publish(instance)
+
+@receiver(post_save, sender=WebinarPoster)
+@receiver(post_delete, sender=WebinarPoster)
+def invalidate_webinar_listing(sender, instance, **kwargs):
+    # new version key: every cached listing page is stale at once
+    from .webinar_cache import bump_version
+    bump_version()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_auth_user(sender, instance, **kwargs):
+    # deactivation / deletion must not be masked by the JWT user cache
+    from .auth_cache import invalidate_user
+    invalidate_user(instance.pk)
 
 
 
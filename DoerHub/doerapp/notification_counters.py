@@ -0,0 +1,202 @@
+"""
+Materialized unread-notification counts.
+
+unread = personal unread + broadcasts newer than the user's read marker.
+
+The personal part is a per-user counter in the cache. Creating a
+notification INCRs it, and marking rows read DECRs it or resets it. A
+counter that is missing (cold, expired or evicted) is recounted from the
+(recipient, is_read) index and cached again. Increments to a missing
+counter are dropped, since the recount will include them. Counters expire
+after UNREAD_COUNT_TTL, so any drift is reconciled against the DB at
+least that often. reconcile_unread_counts() recounts recently active users
+sooner.
+
+Broadcasts are counted against a shared cached list of the latest
+NOTIFICATION_BROADCAST_WINDOW broadcast ids, so one broadcast does not
+touch a counter per user.
+"""
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+NOTIFICATION_CACHE_ALIAS = getattr(settings, "NOTIFICATION_CACHE_ALIAS", "default")
+UNREAD_COUNT_TTL = getattr(settings, "UNREAD_COUNT_TTL", 3600)
+NOTIFICATION_BROADCAST_WINDOW = getattr(settings, "NOTIFICATION_BROADCAST_WINDOW", 200)
+
+BROADCAST_IDS_KEY = "notif:broadcast_ids"
+
+
+def _cache():
+    return caches[NOTIFICATION_CACHE_ALIAS]
+
+
+def _unread_key(user_id):
+    return f"notif:unread:{user_id}"
+
+
+def _seen_key(user_id):
+    return f"notif:seen:{user_id}"
+
+
+def _provider_key(user_id):
+    return f"notif:provider:{user_id}"
+
+
+# ----------------- Reads -----------------
+
+def personal_unread(user_id):
+    from .models import Notification
+
+    cache = _cache()
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.add(_unread_key(user_id), count, UNREAD_COUNT_TTL)
+    return max(0, count)
+
+
+def _broadcast_ids():
+    from .models import Notification
+
+    cache = _cache()
+    ids = cache.get(BROADCAST_IDS_KEY)
+    if ids is None:
+        ids = list(
+            Notification.objects.filter(recipient__isnull=True)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)[:NOTIFICATION_BROADCAST_WINDOW]
+        )
+        cache.set(BROADCAST_IDS_KEY, ids, UNREAD_COUNT_TTL)
+    return ids
+
+
+def _last_seen_broadcast_id(user_id):
+    from .models import NotificationReadMarker
+
+    cache = _cache()
+    seen = cache.get(_seen_key(user_id))
+    if seen is None:
+        seen = (
+            NotificationReadMarker.objects.filter(user_id=user_id)
+            .values_list("last_seen_broadcast_id", flat=True)
+            .first()
+            or 0
+        )
+        cache.set(_seen_key(user_id), seen, UNREAD_COUNT_TTL)
+    return seen
+
+
+def broadcast_unread(user_id):
+    ids = _broadcast_ids()
+    if not ids:
+        return 0
+    seen = _last_seen_broadcast_id(user_id)
+    return sum(1 for pk in ids if pk > seen)
+
+
+def unread_count(user_id):
+    return personal_unread(user_id) + broadcast_unread(user_id)
+
+
+# ----------------- Writes -----------------
+
+def personal_added(counts):
+    """counts: {user_id: number of new unread notifications}. Pushes the new totals."""
+    cache = _cache()
+    for user_id, n in counts.items():
+        try:
+            cache.incr(_unread_key(user_id), n)
+        except ValueError:
+            pass  # not cached: the next read recounts from the DB
+        push_unread_count(user_id)
+
+
+def personal_read(user_id, n=1):
+    cache = _cache()
+    try:
+        if cache.decr(_unread_key(user_id), n) < 0:
+            cache.delete(_unread_key(user_id))
+    except ValueError:
+        pass
+    push_unread_count(user_id)
+
+
+def personal_reset(user_id):
+    _cache().set(_unread_key(user_id), 0, UNREAD_COUNT_TTL)
+
+
+def broadcast_added():
+    _cache().delete(BROADCAST_IDS_KEY)
+
+
+def broadcasts_seen(user_id):
+    _cache().delete(_seen_key(user_id))
+
+
+# ----------------- Push -----------------
+
+def _provider_id(user_id):
+    """Provider pk of user_id or None; cached since it never changes for a user."""
+    from .models import Provider
+
+    cache = _cache()
+    provider_id = cache.get(_provider_key(user_id))
+    if provider_id is None:
+        provider_id = Provider.objects.filter(user_id=user_id).values_list("id", flat=True).first() or 0
+        cache.set(_provider_key(user_id), provider_id, 24 * 3600)
+    return provider_id or None
+
+
+def push_unread_count(user_id):
+    """Send the current count to the user's socket(s): user_<id> and, for providers, provider_notify_<id>."""
+    try:
+        count = unread_count(user_id)
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            f"user_{user_id}",
+            {"type": "send_update", "data": {"type": "unread_count", "count": count}},
+        )
+        provider_id = _provider_id(user_id)
+        if provider_id:
+            async_to_sync(channel_layer.group_send)(
+                f"provider_notify_{provider_id}",
+                {"type": "unread.count", "count": count},
+            )
+    except Exception as e:
+        print(f"❌ Unread count push failed: {e}")
+
+
+# ----------------- Reconciliation -----------------
+
+def reconcile_unread_counts(since_seconds=UNREAD_COUNT_TTL):
+    """Recount personal unread for users who received notifications recently."""
+    from django.db.models import Count, Q
+
+    from .models import Notification
+
+    since = timezone.now() - timedelta(seconds=since_seconds)
+    rows = (
+        Notification.objects.filter(created_at__gte=since, recipient__isnull=False)
+        .values("recipient_id")
+        .distinct()
+    )
+    user_ids = [row["recipient_id"] for row in rows]
+    if not user_ids:
+        return 0
+
+    counts = dict(
+        Notification.objects.filter(recipient_id__in=user_ids)
+        .values("recipient_id")
+        .annotate(unread=Count("id", filter=Q(is_read=False)))
+        .values_list("recipient_id", "unread")
+    )
+    _cache().set_many(
+        {_unread_key(user_id): counts.get(user_id, 0) for user_id in user_ids},
+        UNREAD_COUNT_TTL,
+    )
+    return len(user_ids)
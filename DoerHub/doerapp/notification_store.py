@@ -0,0 +1,278 @@
+"""
+Notification feed and read state.
+
+A user's feed merges two sources: personal notifications (recipient =
+user) and broadcasts (recipient IS NULL). Each source is read with its own
+keyset range scan on the (recipient, created_at) index, newest first, and
+the two pages are merged in Python. The feed therefore costs two bounded
+index scans however large the table grows, instead of an OR over the
+whole table.
+
+Chat notifications are coalesced per (recipient, chatroom): while the
+recipient's notification for a room is unread, new messages update it in
+place (count, latest snippet, created_at) instead of adding rows.
+
+Personal rows carry their own is_read. Broadcasts are shared rows, so
+their read state lives per user in NotificationReadMarker as a high-water
+mark: every broadcast with id <= last_seen_broadcast_id is read.
+
+Saved and coalesced notifications are pushed, with their real ids, to
+NotificationConsumer (ws/notifications/) after commit; a reconnecting
+client passes the last id it saw and replay_since() fills the gap.
+"""
+import base64
+import heapq
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import notification_counters
+from .models import ChatRoom, Notification, NotificationReadMarker
+from .utils import send_broadcast_notification
+
+NOTIFICATION_PAGE_SIZE = getattr(settings, "NOTIFICATION_PAGE_SIZE", 50)
+NOTIFICATION_MAX_PAGE_SIZE = getattr(settings, "NOTIFICATION_MAX_PAGE_SIZE", 200)
+NOTIFICATION_REPLAY_LIMIT = getattr(settings, "NOTIFICATION_REPLAY_LIMIT", 200)
+
+
+def clamp_limit(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return NOTIFICATION_PAGE_SIZE
+    return max(1, min(limit, NOTIFICATION_MAX_PAGE_SIZE))
+
+
+def encode_cursor(notification):
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) or None for a missing / malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _page(qs, before, limit):
+    if before is not None:
+        created_at, pk = before
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return list(qs.order_by("-created_at", "-id")[:limit])
+
+
+def last_seen_broadcast_id(user):
+    return (
+        NotificationReadMarker.objects.filter(user=user)
+        .values_list("last_seen_broadcast_id", flat=True)
+        .first()
+        or 0
+    )
+
+
+def _merged(user, limit, before=None, since=None):
+    """
+    Up to `limit` of `user`'s notifications older than `before` and, when
+    given, created at or after `since`, newest first: one keyset scan per
+    source, merged. Broadcasts come back with is_read resolved for this user.
+    """
+    sources = [Notification.objects.filter(recipient=user), Notification.objects.filter(recipient__isnull=True)]
+    if since is not None:
+        sources = [qs.filter(created_at__gte=since) for qs in sources]
+    personal, broadcasts = (_page(qs, before, limit) for qs in sources)
+
+    key = lambda n: (n.created_at, n.id)
+    merged = list(heapq.merge(personal, broadcasts, key=key, reverse=True))[:limit]
+
+    if broadcasts:
+        seen = last_seen_broadcast_id(user)
+        for n in merged:
+            if n.recipient_id is None:
+                n.is_read = n.id <= seen
+    return merged
+
+
+def feed(user, cursor=None, limit=NOTIFICATION_PAGE_SIZE):
+    """
+    Newest-first page of `user`'s notifications older than `cursor`.
+    Returns (notifications, next_cursor); next_cursor is None on the last page.
+    Broadcasts come back with is_read resolved for this user.
+    """
+    merged = _merged(user, limit + 1, before=decode_cursor(cursor))
+    page = merged[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(merged) > limit else None
+    return page, next_cursor
+
+
+def mark_broadcasts_seen(user, up_to_id):
+    """Raise the user's broadcast high-water mark to up_to_id (never lowers it)."""
+    marker, created = NotificationReadMarker.objects.get_or_create(
+        user=user, defaults={"last_seen_broadcast_id": up_to_id}
+    )
+    if not created:
+        NotificationReadMarker.objects.filter(
+            pk=marker.pk, last_seen_broadcast_id__lt=up_to_id
+        ).update(last_seen_broadcast_id=up_to_id)
+    notification_counters.broadcasts_seen(user.id)
+
+
+def mark_read(user, pk):
+    """Mark one notification read for `user`. Returns False if it isn't theirs to read."""
+    row = Notification.objects.filter(pk=pk).values("recipient_id").first()
+    if row is None:
+        return False
+    if row["recipient_id"] is None:
+        mark_broadcasts_seen(user, pk)
+        notification_counters.push_unread_count(user.id)
+        return True
+    if row["recipient_id"] != user.id:
+        return False
+    if Notification.objects.filter(pk=pk, is_read=False).update(is_read=True):
+        notification_counters.personal_read(user.id)
+    return True
+
+
+def mark_all_read(user):
+    Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+    notification_counters.personal_reset(user.id)
+    latest = (
+        Notification.objects.filter(recipient__isnull=True)
+        .order_by("-created_at", "-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    if latest:
+        mark_broadcasts_seen(user, latest)
+    notification_counters.push_unread_count(user.id)
+
+
+def chat_notification(recipient_id, chatroom_id, sender_name, content):
+    """Unsaved chat Notification for save_chat_notifications()."""
+    return Notification(
+        type="chat",
+        message=content[:100],
+        recipient_id=recipient_id,
+        chatroom_id=chatroom_id,
+        extra_data={"sender": sender_name, "chatroom_id": chatroom_id},
+        is_read=False,
+    )
+
+
+def save_chat_notifications(notifications):
+    """
+    Persist chat notifications coalesced per (recipient, chatroom). For each
+    pair the unread notification, if any, absorbs the messages (indexed
+    lookup + UPDATE by pk); otherwise a single row is inserted carrying the
+    message count. Returns the number of rows inserted.
+
+    Each pair is handled under a lock on its ChatRoom row, so two flushes
+    for the same room (web and buffer, or two consumers) take turns instead
+    of both missing the unread row and inserting one each. Rooms are locked
+    in id order to keep concurrent flushes from deadlocking.
+    """
+    groups = {}
+    for notif in notifications:
+        groups.setdefault((notif.recipient_id, notif.chatroom_id), []).append(notif)
+
+    now = timezone.now()
+    created = 0
+    for (recipient_id, chatroom_id), batch in sorted(groups.items(), key=lambda item: (item[0][1], item[0][0])):
+        latest = batch[-1]
+        with transaction.atomic():
+            list(ChatRoom.objects.select_for_update().filter(pk=chatroom_id).values_list("id", flat=True))
+            current = (
+                Notification.objects.filter(
+                    recipient_id=recipient_id, chatroom_id=chatroom_id, type="chat", is_read=False
+                )
+                .order_by("-created_at", "-id")
+                .values_list("id", "count")
+                .first()
+            )
+            if current and Notification.objects.filter(pk=current[0], is_read=False).update(
+                count=F("count") + len(batch),
+                message=latest.message,
+                extra_data=latest.extra_data,
+                created_at=now,
+            ):
+                latest.id, latest.count, latest.created_at = current[0], current[1] + len(batch), now
+                publish(latest)
+                continue
+            # save() so post_save counts and publishes it
+            latest.count = len(batch)
+            latest.save()
+            created += 1
+    return created
+
+
+# ----------------------------------------------------------
+# Live stream (NotificationConsumer)
+# ----------------------------------------------------------
+
+def user_group(user_id):
+    return f"notifications_{user_id}"
+
+
+def notification_payload(notif):
+    return {
+        "id": notif.id,
+        "type": notif.type,
+        "recipient": notif.recipient_id,
+        "chatroom": notif.chatroom_id,
+        "count": notif.count,
+        "message": notif.message,
+        "extra_data": notif.extra_data,
+        "is_read": notif.is_read,
+        "created_at": notif.created_at.isoformat() if notif.created_at else None,
+    }
+
+
+def publish(notif):
+    """Push a created / coalesced notification to live streams once it is committed."""
+    if notif.recipient_id is None:
+        transaction.on_commit(lambda: send_broadcast_notification(
+            notif.message, notif.extra_data,
+            notification_id=notif.id,
+            created_at=notif.created_at.isoformat() if notif.created_at else None,
+        ))
+        return
+
+    payload = notification_payload(notif)
+
+    def _send():
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                user_group(notif.recipient_id),
+                {"type": "notification.message", "notification": payload},
+            )
+        except Exception as e:
+            print(f"❌ Notification push failed: {e}")
+
+    transaction.on_commit(_send)
+
+
+def replay_since(user, since_id, limit=NOTIFICATION_REPLAY_LIMIT):
+    """
+    Notifications `user` may have missed since notification `since_id`:
+    personal and broadcast rows at or after its created_at (so coalesced
+    rows bumped since then come back too), read like feed() with one
+    keyset scan per source, oldest first. At most the latest `limit` rows;
+    the second value is True when older ones were cut and the client
+    should refetch the REST feed. An unknown `since_id` replays the latest
+    rows.
+    """
+    anchor = Notification.objects.filter(pk=since_id).values_list("created_at", flat=True).first()
+    rows = _merged(user, limit + 1, since=anchor)
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return [notification_payload(n) for n in rows], truncated
@@ -0,0 +1,163 @@
+"""
+Email OTPs, kept in the cache.
+
+A code lives under one cache key for OTP_TTL seconds (only its HMAC is
+stored) next to an attempt counter; after OTP_MAX_ATTEMPTS wrong guesses
+the code is burnt and a new one must be requested. Issuing is limited per
+email and per client IP by sliding-window counters (OTP_RATE_LIMITS) and
+a per-email resend cooldown, so a bot cannot fill the mail queue. All
+counters are atomic cache add / incr, so any Django cache backend works.
+
+A successful verify leaves a "verified" marker for OTP_VERIFIED_TTL
+seconds, which provider registration consumes.
+
+With OTP_AUDIT_TRAIL the EmailOTP table still records when a code was
+last issued per email, never the code itself (the cache stays the source
+of truth); expired rows are purged by the maintenance job.
+"""
+import hashlib
+import hmac
+import time
+from random import randint
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from . import email_outbox
+from .models import EmailOTP
+
+OTP_CACHE_ALIAS = getattr(settings, "OTP_CACHE_ALIAS", "default")
+OTP_TTL = getattr(settings, "OTP_TTL", 600)
+OTP_MAX_ATTEMPTS = getattr(settings, "OTP_MAX_ATTEMPTS", 5)
+OTP_RESEND_COOLDOWN = getattr(settings, "OTP_RESEND_COOLDOWN", 60)
+OTP_VERIFIED_TTL = getattr(settings, "OTP_VERIFIED_TTL", 1800)
+OTP_AUDIT_TRAIL = getattr(settings, "OTP_AUDIT_TRAIL", True)
+# scope -> (max requests, window seconds)
+OTP_RATE_LIMITS = getattr(settings, "OTP_RATE_LIMITS", {
+    "email": (5, 3600),
+    "ip": (20, 3600),
+    "verify_ip": (30, 600),
+})
+
+
+class OTPError(Exception):
+    """Raised with a client-facing message; retry_after is set for rate limits."""
+
+    def __init__(self, message, status=400, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _cache():
+    return caches[OTP_CACHE_ALIAS]
+
+
+def _normalize(email):
+    return (email or "").strip().lower()
+
+
+def _id(value):
+    # keys stay short and don't leak addresses into the cache
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+def _digest(email, code):
+    return hmac.new(settings.SECRET_KEY.encode(), f"{email}|{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def _code_key(email):
+    return f"otp:code:{_id(email)}"
+
+
+def _attempts_key(email):
+    return f"otp:attempts:{_id(email)}"
+
+
+def _verified_key(email):
+    return f"otp:verified:{_id(email)}"
+
+
+def _incr(key, ttl):
+    cache = _cache()
+    cache.add(key, 0, ttl)
+    try:
+        return cache.incr(key)
+    except ValueError:  # expired between add and incr
+        cache.set(key, 1, ttl)
+        return 1
+
+
+def _hit(scope, ident):
+    """
+    Count one request against `scope` for `ident`. Sliding-window counter:
+    the previous fixed window is weighted by how much of it still overlaps
+    the sliding one. Raises OTPError(429) when over the limit.
+    """
+    limit, window = OTP_RATE_LIMITS[scope]
+    now = time.time()
+    bucket = int(now // window)
+    key = f"otp:rl:{scope}:{_id(ident)}"
+
+    current = _incr(f"{key}:{bucket}", window * 2)
+    previous = _cache().get(f"{key}:{bucket - 1}", 0)
+    elapsed = (now % window) / window
+    if previous * (1 - elapsed) + current > limit:
+        raise OTPError("Too many requests. Try again later.", status=429, retry_after=int(window * (1 - elapsed)) + 1)
+
+
+def client_ip(request):
+    return request.META.get("REMOTE_ADDR") or "unknown"
+
+
+def issue(email, ip):
+    """Generate and queue a new OTP for `email` (invalidates the previous one)."""
+    email = _normalize(email)
+    cache = _cache()
+    if not cache.add(f"otp:cooldown:{_id(email)}", 1, OTP_RESEND_COOLDOWN):
+        raise OTPError("Please wait before requesting another OTP.", status=429, retry_after=OTP_RESEND_COOLDOWN)
+    _hit("ip", ip)
+    _hit("email", email)
+
+    code = str(randint(100000, 999999))
+    cache.set(_code_key(email), _digest(email, code), OTP_TTL)
+    cache.set(_attempts_key(email), 0, OTP_TTL)
+
+    with transaction.atomic():
+        if OTP_AUDIT_TRAIL:
+            EmailOTP.objects.update_or_create(email=email, defaults={"otp": "", "created_at": timezone.now()})
+        # sent by the outbox dispatcher (critical lane) once this commits;
+        # the outbox blanks the body once it is sent
+        email_outbox.otp_email(email, code)
+
+
+def verify(email, code, ip):
+    """Check `code` for `email`; on success the code is consumed and the email marked verified."""
+    email = _normalize(email)
+    _hit("verify_ip", ip)
+    cache = _cache()
+
+    digest = cache.get(_code_key(email))
+    if digest is None:
+        raise OTPError("OTP expired or not requested.")
+    if _incr(_attempts_key(email), OTP_TTL) > OTP_MAX_ATTEMPTS:
+        cache.delete_many([_code_key(email), _attempts_key(email)])
+        raise OTPError("Too many attempts. Request a new OTP.", status=429)
+    if not hmac.compare_digest(digest, _digest(email, str(code).strip())):
+        raise OTPError("Invalid OTP.")
+
+    cache.delete_many([_code_key(email), _attempts_key(email)])
+    cache.set(_verified_key(email), 1, OTP_VERIFIED_TTL)
+    if OTP_AUDIT_TRAIL:
+        EmailOTP.objects.filter(email=email).delete()
+
+
+def is_verified(email):
+    return bool(_cache().get(_verified_key(_normalize(email))))
+
+
+def consume_verification(email):
+    _cache().delete(_verified_key(_normalize(email)))
@@ -0,0 +1,312 @@
+"""
+Provider presence.
+
+A provider is online while it has at least one live connection: an open
+provider socket (keyed by its channel name) or a recent location ping
+("tracking"). Every connection carries an expiry that its owner keeps
+pushing forward: sockets heartbeat every PRESENCE_HEARTBEAT_SECONDS and
+expire after PRESENCE_TTL, the tracking connection expires
+PRESENCE_TRACKING_TTL after the last ping (the provider dashboard re-sends
+its position at least every 30 s, even when standing still). So a crashed
+worker or a vanished phone drops out after at most the larger of the two
+without anyone calling disconnect. Closing one of several tabs only drops
+that tab's connection.
+
+Provider.is_online is a denormalised copy for the admin and reporting. It
+is written only by sync_presence(), in batches, and only for providers
+whose state really changed. Matching reads presence directly.
+
+    PRESENCE_BACKEND = {
+        "BACKEND": "doerapp.presence.RedisPresence",
+        "OPTIONS": {"url": "redis://127.0.0.1:6379/1"},
+    }
+
+`InMemoryPresence` keeps everything in the current process; use it for
+tests and single-node deployments.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .utils import get_redis_connection, load_backend
+
+PRESENCE_TTL = getattr(settings, "PRESENCE_TTL", 60)
+PRESENCE_HEARTBEAT_SECONDS = getattr(settings, "PRESENCE_HEARTBEAT_SECONDS", 20)
+PRESENCE_TRACKING_TTL = getattr(settings, "PRESENCE_TRACKING_TTL", 120)
+PRESENCE_SYNC_INTERVAL = getattr(settings, "PRESENCE_SYNC_INTERVAL", 10)
+
+TRACKING_CONNECTION = "tracking"
+
+
+class BasePresence:
+    def connect(self, provider_id, connection_id, ttl=PRESENCE_TTL):
+        """Register (or refresh) a connection. Returns True if the provider just came online."""
+        raise NotImplementedError
+
+    def heartbeat(self, provider_id, connection_id, ttl=PRESENCE_TTL):
+        """Extend a live connection. Returns False if it has expired or was cleared."""
+        raise NotImplementedError
+
+    def disconnect(self, provider_id, connection_id):
+        """Drop one connection. Returns True if the provider just went offline."""
+        raise NotImplementedError
+
+    def clear(self, provider_id):
+        """Drop every connection of a provider. Returns True if it was online."""
+        raise NotImplementedError
+
+    def online_among(self, provider_ids):
+        """Return the subset of provider_ids that are online."""
+        raise NotImplementedError
+
+    def online_ids(self):
+        raise NotImplementedError
+
+    def pop_changes(self):
+        """
+        Return and clear the provider ids whose state may have changed
+        since the last call (connects, disconnects and expiries).
+        """
+        raise NotImplementedError
+
+    def maybe_sync(self):
+        """Hook for backends that must sync from the request process."""
+
+    def is_online(self, provider_id):
+        return int(provider_id) in self.online_among([provider_id])
+
+
+class InMemoryPresence(BasePresence):
+    """
+    Per-process presence. Like InMemoryLocationStore it syncs itself from
+    maybe_sync(), as a Celery worker cannot see this process's memory.
+    """
+
+    def __init__(self, sync_interval=PRESENCE_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self._connections = {}  # provider_id -> {connection_id: expires_at}
+        self._changed = set()
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+    def _live(self, provider_id, now):
+        connections = self._connections.get(provider_id)
+        if not connections:
+            return {}
+        for connection_id, expires_at in list(connections.items()):
+            if expires_at <= now:
+                del connections[connection_id]
+        if not connections:
+            del self._connections[provider_id]
+            self._changed.add(provider_id)
+            return {}
+        return connections
+
+    def connect(self, provider_id, connection_id, ttl=PRESENCE_TTL):
+        provider_id, now = int(provider_id), time.monotonic()
+        with self._lock:
+            was_online = bool(self._live(provider_id, now))
+            self._connections.setdefault(provider_id, {})[connection_id] = now + ttl
+            if not was_online:
+                self._changed.add(provider_id)
+        return not was_online
+
+    def heartbeat(self, provider_id, connection_id, ttl=PRESENCE_TTL):
+        provider_id, now = int(provider_id), time.monotonic()
+        with self._lock:
+            connections = self._live(provider_id, now)
+            if connection_id not in connections:
+                return False
+            connections[connection_id] = now + ttl
+        return True
+
+    def disconnect(self, provider_id, connection_id):
+        provider_id, now = int(provider_id), time.monotonic()
+        with self._lock:
+            connections = self._live(provider_id, now)
+            if not connections:
+                return False
+            connections.pop(connection_id, None)
+            if connections:
+                return False
+            del self._connections[provider_id]
+            self._changed.add(provider_id)
+        return True
+
+    def clear(self, provider_id):
+        provider_id, now = int(provider_id), time.monotonic()
+        with self._lock:
+            was_online = bool(self._live(provider_id, now))
+            self._connections.pop(provider_id, None)
+            self._changed.add(provider_id)
+        return was_online
+
+    def online_among(self, provider_ids):
+        now = time.monotonic()
+        with self._lock:
+            return {int(pid) for pid in provider_ids if self._live(int(pid), now)}
+
+    def online_ids(self):
+        now = time.monotonic()
+        with self._lock:
+            return {pid for pid in list(self._connections) if self._live(pid, now)}
+
+    def pop_changes(self):
+        now = time.monotonic()
+        with self._lock:
+            for pid in list(self._connections):
+                self._live(pid, now)
+            changed, self._changed = self._changed, set()
+            self._last_sync = now
+        return changed
+
+    def maybe_sync(self):
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            sync_presence(self)
+
+
+# KEYS: connections zset, online zset, changed set
+# ARGV: provider_id, connection_id, expires_at, now, mode ("connect" | "heartbeat")
+_TOUCH = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[4])
+local score = redis.call('ZSCORE', KEYS[2], ARGV[1])
+local was_online = score and tonumber(score) > tonumber(ARGV[4])
+if ARGV[5] == 'heartbeat' and not redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+    return -1
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+local top = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('ZADD', KEYS[2], top[2], ARGV[1])
+redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(top[2])))
+if was_online then
+    return 0
+end
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: connections zset, online zset, changed set
+# ARGV: provider_id, connection_id ("" drops all), now
+_DROP = """
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+end
+local top = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+if #top > 0 then
+    redis.call('ZADD', KEYS[2], top[2], ARGV[1])
+    redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(top[2])))
+    return 0
+end
+local score = redis.call('ZSCORE', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+if score and tonumber(score) > tonumber(ARGV[3]) then
+    return 1
+end
+return 0
+"""
+
+
+class RedisPresence(BasePresence):
+    """
+    One sorted set of connection -> expiry per provider, plus a global
+    sorted set of provider -> latest expiry that answers "who is online"
+    with a single range query. Updates are atomic Lua scripts.
+    """
+
+    def __init__(self, url="redis://127.0.0.1:6379/1", prefix="doerhub:presence"):
+        self.redis = get_redis_connection(url)
+        self.prefix = prefix
+        self.online_key = f"{prefix}:online"
+        self.changed_key = f"{prefix}:changed"
+        self._touch = self.redis.register_script(_TOUCH)
+        self._drop = self.redis.register_script(_DROP)
+
+    def _keys(self, provider_id):
+        return [f"{self.prefix}:conn:{int(provider_id)}", self.online_key, self.changed_key]
+
+    def connect(self, provider_id, connection_id, ttl=PRESENCE_TTL):
+        now = time.time()
+        result = self._touch(
+            keys=self._keys(provider_id),
+            args=[int(provider_id), connection_id, now + ttl, now, "connect"],
+        )
+        return result == 1
+
+    def heartbeat(self, provider_id, connection_id, ttl=PRESENCE_TTL):
+        now = time.time()
+        result = self._touch(
+            keys=self._keys(provider_id),
+            args=[int(provider_id), connection_id, now + ttl, now, "heartbeat"],
+        )
+        return result != -1
+
+    def disconnect(self, provider_id, connection_id):
+        result = self._drop(keys=self._keys(provider_id), args=[int(provider_id), connection_id, time.time()])
+        return result == 1
+
+    def clear(self, provider_id):
+        result = self._drop(keys=self._keys(provider_id), args=[int(provider_id), "", time.time()])
+        return result == 1
+
+    def online_among(self, provider_ids):
+        provider_ids = [int(pid) for pid in provider_ids]
+        if not provider_ids:
+            return set()
+        now = time.time()
+        scores = self.redis.zmscore(self.online_key, provider_ids)
+        return {pid for pid, score in zip(provider_ids, scores) if score is not None and score > now}
+
+    def online_ids(self):
+        members = self.redis.zrangebyscore(self.online_key, f"({time.time()}", "+inf")
+        return {int(member) for member in members}
+
+    def pop_changes(self):
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.smembers(self.changed_key)
+        pipe.delete(self.changed_key)
+        # providers whose last connection expired without a disconnect
+        pipe.zrangebyscore(self.online_key, "-inf", now)
+        pipe.zremrangebyscore(self.online_key, "-inf", now)
+        changed, _, expired, _ = pipe.execute()
+        return {int(pid) for pid in changed} | {int(pid) for pid in expired}
+
+
+def sync_presence(presence=None):
+    """
+    Copy presence into Provider.is_online for providers whose state changed.
+    Two UPDATEs at most; rows already in the right state are not touched.
+    """
+    from .models import Provider
+
+    presence = presence or get_presence()
+    changed = presence.pop_changes()
+    if not changed:
+        return 0
+
+    online = presence.online_among(changed)
+    offline = changed - online
+    updated = 0
+    if online:
+        updated += Provider.objects.filter(id__in=online, is_online=False).update(is_online=True)
+    if offline:
+        updated += Provider.objects.filter(id__in=offline, is_online=True).update(is_online=False)
+    return updated
+
+
+_presence = None
+
+
+def get_presence():
+    global _presence
+    if _presence is None:
+        _presence = load_backend(
+            getattr(settings, "PRESENCE_BACKEND", None),
+            "doerapp.presence.InMemoryPresence",
+        )
+    return _presence
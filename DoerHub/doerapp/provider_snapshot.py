@@ -0,0 +1,129 @@
+"""
+In-memory matching engine for high-traffic cities.
+
+Keeps a NumPy snapshot of the verified providers of each ServiceCategory
+(id, lat, lon) and answers "nearest online providers within R km" with a
+vectorized haversine plus a top-K selection, instead of an ORM annotation.
+
+Enable with MATCHING_ENGINE = "snapshot". Matching runs in the Celery
+dispatch worker, which never sees location pings or provider sockets, so
+nothing volatile is trusted from the snapshot itself: every search asks the
+shared presence service which members are online and overwrites their
+positions from the shared location store, then ranks only those rows. The
+snapshot only caches category membership and saved positions, reloaded
+every SNAPSHOT_REFRESH_SECONDS (a newly verified provider shows up after
+at most that long).
+
+`manage.py bench_matching --snapshot-checks` checks the ranking against
+geo.haversine_distance.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_KM
+from .location_store import get_location_store
+from .presence import get_presence
+
+SNAPSHOT_REFRESH_SECONDS = getattr(settings, "SNAPSHOT_REFRESH_SECONDS", 300)
+# largest distance difference (km) from geo.haversine_distance accepted by
+# bench_matching --snapshot-checks
+SNAPSHOT_DISTANCE_TOLERANCE_KM = getattr(settings, "SNAPSHOT_DISTANCE_TOLERANCE_KM", 0.001)
+
+
+def haversine_km_vec(lat, lon, lats, lons):
+    """Vectorized form of geo.haversine_km: distances from one point to many."""
+    lat1 = np.radians(lat)
+    lats2 = np.radians(lats)
+    dlat = lats2 - lat1
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lats2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+class CategorySnapshot:
+    """Column arrays for the providers of one category; NaN marks an unknown position."""
+
+    def __init__(self, provider_ids, lats, lons):
+        self.ids = np.asarray(provider_ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.rows = {int(pid): row for row, pid in enumerate(self.ids)}
+        self.loaded_at = time.monotonic()
+
+    def move(self, positions):
+        """Overwrite positions from {provider_id: (lat, lon)} for known providers."""
+        for pid, (lat, lon) in positions.items():
+            row = self.rows.get(pid)
+            if row is not None:
+                self.lats[row] = lat
+                self.lons[row] = lon
+
+    def search(self, lat, lon, radius_km, limit=None, rows=None):
+        """Return [(provider_id, distance_km)] within radius among `rows` (all when None), nearest first."""
+        rows = np.arange(len(self.ids)) if rows is None else rows
+        if not len(rows):
+            return []
+        distances = haversine_km_vec(lat, lon, self.lats[rows], self.lons[rows])
+        in_range = np.flatnonzero(distances <= radius_km)  # NaN positions never match
+        if limit is not None and len(in_range) > limit:
+            nearest = np.argpartition(distances[in_range], limit - 1)[:limit]
+            in_range = in_range[nearest]
+        order = in_range[np.argsort(distances[in_range], kind="stable")]
+        return [(int(self.ids[rows[i]]), float(distances[i])) for i in order]
+
+
+class SnapshotMatchingEngine:
+    def __init__(self):
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def _load(self, category_id):
+        from .models import Provider
+
+        rows = list(
+            Provider.objects.filter(service_category_id=category_id, verified=True)
+            .values_list("id", "location_lat", "location_lon")
+        )
+        return CategorySnapshot(
+            [pid for pid, _, _ in rows],
+            [np.nan if lat is None else lat for _, lat, _ in rows],
+            [np.nan if lon is None else lon for _, _, lon in rows],
+        )
+
+    def _snapshot(self, category_id):
+        snapshot = self._categories.get(category_id)
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < SNAPSHOT_REFRESH_SECONDS:
+            return snapshot
+        snapshot = self._load(category_id)
+        with self._lock:
+            self._categories[category_id] = snapshot
+        return snapshot
+
+    def search(self, category_id, lat, lon, radius_km, limit=None):
+        """
+        [(provider_id, distance_km)] of online members within radius_km,
+        nearest first, ranked on their current positions.
+        """
+        snapshot = self._snapshot(category_id)
+        online = get_presence().online_among(snapshot.rows)
+        if not online:
+            return []
+        live = get_location_store().get_many(list(online))
+        rows = np.fromiter((snapshot.rows[pid] for pid in online), dtype=np.int64, count=len(online))
+        with self._lock:
+            snapshot.move(live)
+            return snapshot.search(float(lat), float(lon), radius_km, limit, rows)
+
+
+_engine = None
+
+
+def get_snapshot_engine():
+    global _engine
+    if _engine is None:
+        _engine = SnapshotMatchingEngine()
+    return _engine
@@ -3,6 +3,7 @@ from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import ContactMessage, Notification, Profile, Provider, Review, ServiceCategory, ServiceRequest, WebinarPoster, ChatRoom, Message
+from .chat_history import recent_history, rest_item
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.db import transaction
@@ -137,7 +138,7 @@ class ProviderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Provider
         fields = "__all__"
-        read_only_fields = ['otp', 'otp_created_at', 'user', 'verified', 'email_verified']
+        read_only_fields = ['otp', 'otp_created_at', 'user', 'verified', 'email_verified', 'active_request']
         
     @transaction.atomic
     def create(self, validated_data):
@@ -169,7 +170,7 @@ class ServiceRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServiceRequest
         fields = "__all__"
-        read_only_fields = ['id', 'user', 'status', 'created_at','distance_km']
+        read_only_fields = ['id', 'user', 'status', 'created_at','distance_km', 'dispatch_radius_km']
 
     def get_distance_km(self, obj):
         # Only available when annotated in view
@@ -188,17 +189,33 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'sender_name', 'content', 'timestamp']
+        fields = ['id', 'uuid', 'sender', 'sender_name', 'content', 'timestamp']
 
 
 class ChatRoomSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     provider_name = serializers.CharField(source='provider.username', read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
+    has_more_messages = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatRoom
-        fields = ['id', 'service_request', 'user', 'user_name', 'provider', 'provider_name', 'messages', 'created_at']
+        fields = ['id', 'service_request', 'user', 'user_name', 'provider', 'provider_name', 'messages', 'has_more_messages', 'created_at']
+
+    # Only the latest page of messages (served from the recent-message
+    # cache); older ones via /api/chat/<id>/messages/?before=
+    def _latest_page(self, obj):
+        if not hasattr(obj, '_latest_messages'):
+            obj._latest_messages = recent_history(obj.id)
+        return obj._latest_messages
+
+    def get_messages(self, obj):
+        items, _ = self._latest_page(obj)
+        return [rest_item(item) for item in items]
+
+    def get_has_more_messages(self, obj):
+        _, has_more = self._latest_page(obj)
+        return has_more
 
 
 
@@ -233,7 +250,7 @@ class WebinarPosterSerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'message', 'extra_data', 'is_read', 'created_at']
+        fields = ['id', 'type', 'recipient', 'chatroom', 'count', 'message', 'extra_data', 'is_read', 'created_at']
 
 
 class ServiceReviewSerializer(serializers.ModelSerializer):
@@ -0,0 +1,93 @@
+"""
+Per-queue Celery latency metrics.
+
+Every published task is stamped with its enqueue time (before_task_publish);
+when a worker starts it (task_prerun) the wait is recorded under the queue
+it came from, and its run time under the same queue when it finishes.
+Email delivery latency (outbox row created -> sent) is recorded per lane by
+email_outbox. Samples are kept in capped Redis lists, so summary() gives
+percentiles over the most recent TASK_METRICS_SAMPLES of each series:
+
+    manage.py queue_stats
+
+A wait above the queue's latency_slo (CELERY_QUEUE_CONFIG) is logged.
+"""
+import time
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.conf import settings
+
+from .utils import get_redis_connection
+
+TASK_METRICS_REDIS_URL = getattr(settings, "TASK_METRICS_REDIS_URL", "redis://127.0.0.1:6379/4")
+TASK_METRICS_SAMPLES = getattr(settings, "TASK_METRICS_SAMPLES", 1000)
+TASK_METRICS_TTL = 24 * 3600
+
+PREFIX = "doerhub:metrics"
+ENQUEUED_AT_HEADER = "doerhub_enqueued_at"
+
+
+def _key(kind, name):
+    return f"{PREFIX}:{kind}:{name}"
+
+
+def record(kind, name, seconds):
+    """Add one sample (seconds) to the `kind`/`name` series; never raises."""
+    key = _key(kind, name)
+    try:
+        pipe = get_redis_connection(TASK_METRICS_REDIS_URL).pipeline()
+        pipe.lpush(key, round(seconds * 1000))
+        pipe.ltrim(key, 0, TASK_METRICS_SAMPLES - 1)
+        pipe.expire(key, TASK_METRICS_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Metric {key} not recorded: {e}")
+
+
+def summary(kind, name):
+    """{"count", "p50_ms", "p95_ms", "max_ms"} over the recent samples, or None."""
+    samples = sorted(
+        int(v) for v in get_redis_connection(TASK_METRICS_REDIS_URL).lrange(_key(kind, name), 0, -1)
+    )
+    if not samples:
+        return None
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"count": len(samples), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": samples[-1]}
+
+
+def _queue_of(task):
+    delivery_info = getattr(task.request, "delivery_info", None) or {}
+    return delivery_info.get("routing_key") or getattr(settings, "CELERY_TASK_DEFAULT_QUEUE", "celery")
+
+
+# ----------------- Celery signals -----------------
+
+@before_task_publish.connect
+def stamp_enqueued_at(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault(ENQUEUED_AT_HEADER, time.time())
+
+
+@task_prerun.connect
+def record_queue_wait(sender=None, task=None, **kwargs):
+    if task is None:
+        return
+    task.request._doerhub_started = time.monotonic()
+    enqueued_at = getattr(task.request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at is None:
+        return
+
+    queue = _queue_of(task)
+    wait = max(0.0, time.time() - float(enqueued_at))
+    record("queue_wait", queue, wait)
+
+    slo = getattr(settings, "CELERY_QUEUE_CONFIG", {}).get(queue, {}).get("latency_slo")
+    if slo is not None and wait > slo:
+        print(f"⚠️ {task.name} waited {wait:.1f}s on queue '{queue}' (SLO {slo}s)")
+
+
+@task_postrun.connect
+def record_runtime(sender=None, task=None, **kwargs):
+    started = getattr(getattr(task, "request", None), "_doerhub_started", None)
+    if started is not None:
+        record("runtime", _queue_of(task), time.monotonic() - started)
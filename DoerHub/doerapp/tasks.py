@@ -1,95 +1,177 @@
 from celery import shared_task
-from django.conf import settings
-from django.core.mail import send_mail
+
+from doerapp import task_metrics  # noqa: F401  (connects the per-queue latency signals)
+
+# The email tasks below only queue into the email outbox (see
+# email_outbox); the dispatch_<lane>_email tasks do the sending. Callers enqueue
+# directly inside their transaction; the tasks stay for messages already
+# in the broker.
 
 @shared_task
 def send_contact_email(name, email, message):
-    subject = "New Contact Message"
-    body = f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
-
-    send_mail(
-        subject,
-        body,
-        "doer.hub7@gmail.com",   # From
-        ["doer.hub7@gmail.com"], # To
-        fail_silently=False,
-    )
-
-    return "Email sent successfully"
+    from doerapp.email_outbox import contact_email
 
+    contact_email(name, email, message)
+    return "Email queued"
 
 
 @shared_task
-def send_webinar_links_task(subject, message_template, meeting_url, provider_name, registration_data):
-    sent_to = []
+def send_webinar_links_task(job_id):
+    """Split a BulkEmailJob into chunks and fan them out (see bulk_email)."""
+    from doerapp.bulk_email import plan_chunks
+    from doerapp.models import BulkEmailJob
 
-    for reg in registration_data:
-        name = reg["name"]
-        email = reg["email"]
+    job = BulkEmailJob.objects.get(pk=job_id)
+    chunks = plan_chunks(job)
+    for registration_ids in chunks:
+        send_bulk_email_chunk.delay(job_id, registration_ids)
+    return f"Job {job_id}: {len(chunks)} chunk(s) queued"
 
-        personalized_msg = message_template.replace("{{name}}", name)
 
-        send_mail(
-            subject=subject,
-            message=personalized_msg,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-        )
+@shared_task
+def send_bulk_email_chunk(job_id, registration_ids):
+    """Queue one chunk of a bulk job into the email outbox."""
+    from doerapp.bulk_email import enqueue_chunk
+    from doerapp.models import BulkEmailJob
 
-        sent_to.append(email)
+    job = BulkEmailJob.objects.get(pk=job_id)
+    queued = enqueue_chunk(job, registration_ids)
+    return f"Job {job_id}: {queued} email(s) queued"
 
-    return sent_to
 
 @shared_task
 def send_otp_email_task(email, otp):
-    subject = "DoerHub OTP"
-    message = f"Your OTP: {otp}\nValid for 10 mins."
-
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False,
-    )
+    from doerapp.email_outbox import otp_email
 
-    return "OTP sent"
+    otp_email(email, otp)
+    return "OTP queued"
 
 
 @shared_task
 def send_provider_approval_email(username, email):
-    subject = "Provider Approval Notification"
-    message = (
-        f"Dear {username},\n\n"
-        "Your provider profile has been approved! "
-        "You can now log in and start offering services."
-    )
+    from doerapp.email_outbox import provider_approval_email
 
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False,
-    )
-    return "Approval email sent"
+    provider_approval_email(username, email)
+    return "Approval email queued"
 
 
 @shared_task
 def send_provider_rejection_email(username, email, reason):
-    subject = "Provider Rejection Notification"
-    message = (
-        f"Dear {username},\n\n"
-        f"Your provider profile was not approved.\n"
-        f"Reason: {reason}"
-    )
+    from doerapp.email_outbox import provider_rejection_email
+
+    provider_rejection_email(username, email, reason)
+    return "Rejection email queued"
+
 
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False,
+def _dispatch_lane(lane, **kwargs):
+    from doerapp.email_outbox import dispatch
+
+    result = dispatch(lane, **kwargs)
+    return result, (
+        f"Outbox {lane}: sent {result['sent']}, failed {result['failed']}, "
+        f"dead-lettered {result['dead']}"
     )
-    return "Rejection email sent"
+
+
+@shared_task
+def dispatch_critical_email():
+    return _dispatch_lane("critical")[1]
+
+
+@shared_task
+def dispatch_transactional_email():
+    return _dispatch_lane("transactional")[1]
+
+
+@shared_task
+def dispatch_bulk_email():
+    from doerapp.email_outbox import EMAIL_OUTBOX_BULK_BATCHES_PER_RUN
+
+    result, summary = _dispatch_lane("bulk", max_batches=EMAIL_OUTBOX_BULK_BATCHES_PER_RUN)
+    if result["more"]:
+        dispatch_bulk_email.delay()  # paced by the bulk queue's rate_limit
+    return summary
+
+
+@shared_task
+def flush_provider_locations():
+    from doerapp.location_store import flush_locations
+
+    flushed = flush_locations()
+    return f"Flushed {flushed} provider location(s)"
+
+
+@shared_task
+def sync_provider_presence():
+    from doerapp.presence import sync_presence
+
+    updated = sync_presence()
+    return f"Synced is_online for {updated} provider(s)"
+
+
+@shared_task
+def reconcile_unread_counts():
+    from doerapp.notification_counters import reconcile_unread_counts as reconcile
+
+    users = reconcile()
+    return f"Reconciled unread counts for {users} user(s)"
+
+
+@shared_task
+def expire_stale_requests():
+    from doerapp.maintenance import expire_stale_requests as expire
+
+    done = expire()
+    return "Skipped: already running" if done is None else f"Expired {done} stale request(s)"
+
+
+@shared_task
+def purge_expired_otps():
+    from doerapp.maintenance import purge_expired_otps as purge
+
+    done = purge()
+    return "Skipped: already running" if done is None else f"Purged {done} expired OTP row(s)"
+
+
+@shared_task
+def prune_notifications():
+    from doerapp.maintenance import prune_notifications as prune
+
+    done = prune()
+    return "Skipped: already running" if done is None else f"Pruned {done} old notification(s)"
+
+
+@shared_task
+def purge_email_outbox():
+    from doerapp.maintenance import purge_email_outbox as purge
+
+    done = purge()
+    return "Skipped: already running" if done is None else f"Purged {done} old outbox email(s)"
+
+
+@shared_task
+def prune_dispatch_offers():
+    from doerapp.maintenance import prune_dispatch_offers as prune
+
+    done = prune()
+    return "Skipped: already running" if done is None else f"Pruned {done} old dispatch offer(s)"
+
+
+@shared_task
+def dispatch_request_wave(request_id, wave=0, offered=None):
+    """
+    One wave of request dispatch. Schedules the next wave after the
+    configured timeout; the chain ends once the request leaves 'pending'.
+    """
+    from doerapp.dispatch import DISPATCH_WAVES, run_wave
+
+    offered = run_wave(request_id, wave, offered or [])
+    if offered is None:
+        return f"Dispatch for request {request_id} stopped at wave {wave}"
+
+    if wave + 1 < len(DISPATCH_WAVES):
+        dispatch_request_wave.apply_async(
+            (request_id, wave + 1, offered),
+            countdown=DISPATCH_WAVES[wave]["timeout"],
+        )
+    return f"Request {request_id}: wave {wave} offered to {len(offered)} provider(s)"
@@ -7,6 +7,7 @@ from .views import (
     AddServiceView,
     CancelServiceRequestAPI,
     ChatRoomDetailAPI,
+    ChatRoomMessagesAPI,
     CheckUsernameView,
     ContactMessageAPI,
     CreateDirectProviderReviewView,
@@ -18,6 +19,7 @@ from .views import (
     NotificationListAPIView,
     NotificationMarkAllReadAPIView,
     NotificationMarkReadAPIView,
+    NotificationUnreadCountAPIView,
     ProviderDetailAPI,
     ProviderLocationUpdateAPI,
     ProviderProfileView,
@@ -92,6 +94,7 @@ urlpatterns = [
     path("api/chat/start/", StartChatAPI.as_view(), name="chatroom-start-direct"),
     #chatroom message
     path("api/chat/<int:pk>/", ChatRoomDetailAPI.as_view(), name="chatroom-detail"),
+    path("api/chat/<int:pk>/messages/", ChatRoomMessagesAPI.as_view(), name="chatroom-messages"),
     path("api/chat/<int:chatroom_id>/send/", SendMessageAPI.as_view(), name="chatroom-send"),
 
 
@@ -115,12 +118,14 @@ urlpatterns = [
     path("api/webinars/<int:pk>/register/", views.WebinarRegisterAPI.as_view(), name="webinar-register"),
     path("api/webinars/<int:pk>/registrations/", views.WebinarRegistrationsAPI.as_view(), name="webinar-registrations"),
     path("api/webinars/<int:pk>/send-link/", views.WebinarSendLinkAPI.as_view(), name="webinar-send-link"),
+    path("api/bulk-email-jobs/<int:pk>/", views.BulkEmailJobStatusAPI.as_view(), name="bulk-email-job-status"),
 
     # User
     path("api/webinars/registered/", views.UserRegisteredWebinarsAPI.as_view(), name="user-registered-webinars"),
 
     #notification
     path('api/notifications/', NotificationListAPIView.as_view(),name='notification-list'),
+    path('api/notifications/unread-count/', NotificationUnreadCountAPIView.as_view(), name='notification-unread-count'),
     path('api/notifications/<int:pk>/read/',NotificationMarkReadAPIView.as_view(),name='notification-mark-read'),
     path('api/notifications/mark-all-read/',NotificationMarkAllReadAPIView.as_view(),name='notification-mark-all-read'),
 
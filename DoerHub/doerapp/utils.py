@@ -1,20 +1,24 @@
-import json
+from functools import lru_cache
+from importlib import import_module
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
-def send_broadcast_notification(message, extra_data=None):
+def send_broadcast_notification(message, extra_data=None, notification_id=None, created_at=None):
     """
     Send broadcast notification WITHOUT importing models.
-    We build the payload manually.
+    We build the payload manually; pass the saved row's id / created_at
+    so clients can deduplicate against replayed notifications.
     """
     payload = {
-        "id": None, 
+        "id": notification_id,
         "type": "broadcast",
         "message": message,
         "recipient": None,
+        "chatroom": None,
+        "count": 1,
         "is_read": False,
         "extra_data": extra_data or {},
-        "created_at": None,
+        "created_at": created_at,
     }
 
     channel_layer = get_channel_layer()
@@ -23,10 +27,30 @@ def send_broadcast_notification(message, extra_data=None):
             "notifications",
             {
                 "type": "notification.message",
-                "text": json.dumps(payload),
+                "notification": payload,
             }
         )
     else:
         print("Channel layer not available. Broadcast skipped.")
 
-    return payload
\ No newline at end of file
+    return payload
+
+
+@lru_cache(maxsize=None)
+def get_redis_connection(url):
+    """Return a shared redis-py client for `url` (one connection pool per URL)."""
+    import redis
+    return redis.Redis.from_url(url)
+
+
+def load_backend(config, default_backend):
+    """
+    Build a backend from a settings dict of the form
+    {"BACKEND": "dotted.path.Class", "OPTIONS": {...}}, the same shape as
+    CHANNEL_LAYERS / CACHES entries.
+    """
+    config = config or {}
+    path = config.get("BACKEND", default_backend)
+    module_path, class_name = path.rsplit(".", 1)
+    backend_cls = getattr(import_module(module_path), class_name)
+    return backend_cls(**config.get("OPTIONS", {}))
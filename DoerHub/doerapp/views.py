@@ -3,7 +3,7 @@ import logging
 from django.forms import ValidationError
 from django.shortcuts import get_object_or_404
 import razorpay
-from django.db import transaction
+from django.db import OperationalError, transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
@@ -11,28 +11,35 @@ from django.contrib.auth import authenticate,login
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.utils import timezone
-from datetime import date, timedelta
+from datetime import date
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
-from random import randint
-from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth.models import User
 
-from doerapp.tasks import send_contact_email
+from doerapp.tasks import send_webinar_links_task
 from .serializers import (
     ChatRoomSerializer, ContactMessageSerializer, MessageSerializer, NotificationSerializer, ServiceRequestSerializer, ServiceReviewSerializer,
     SignupSerializer, ProfileSerializer, ProviderSerializer, WebinarPosterSerializer
 )
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from doerapp.models import ChatRoom, Notification, Profile, Provider, EmailOTP, Review, ServiceCategory, ServiceRequest, Message, WebinarPoster, WebinarRegistration
-import math
-from django.db.models import FloatField, Value,Q
-from django.db.models.functions import Radians, Cos, Sin, Power, Sqrt, ATan2, Cast
+from doerapp.models import BulkEmailJob, ChatRoom, DispatchOffer, Profile, Provider, Review, ServiceCategory, ServiceRequest, Message, WebinarPoster, WebinarRegistration
+from django.db.models import Value,Q
+
+from doerapp.geo import geo_cell, within_radius
+from doerapp.location_store import get_location_store
+from doerapp.presence import PRESENCE_TRACKING_TTL, TRACKING_CONNECTION, get_presence
+from doerapp.matching import provider_location
+from doerapp.chat_history import clamp_limit, messages_before, parse_before, remember_message
+from doerapp.dispatch import DISPATCH_MAX_RADIUS_KM, DISPATCH_WAVES, start_dispatch
+from doerapp.bulk_email import create_webinar_link_job, job_status
+from django.db.models import F
 
 from doerapp import models
+from doerapp import email_outbox, notification_counters, notification_store, otp, webinar_cache
+from django.utils.http import parse_etags, quote_etag
 
 
 # ----------------------------------------------------------
@@ -161,11 +168,8 @@ class ProviderRegistrationAPI(APIView):
         if User.objects.filter(username=username).exists():
             return Response({"error": "Username already exists."}, status=400)
 
-        try:
-            EmailOTP.objects.get(email=email)
+        if not otp.is_verified(email):
             return Response({"error": "Email must be verified first."}, status=400)
-        except EmailOTP.DoesNotExist:
-            pass
 
         if not (location_lat and location_lon):
             try:
@@ -192,10 +196,18 @@ class ProviderRegistrationAPI(APIView):
         serializer = ProviderSerializer(data=provider_data, context={'user': user})
         if serializer.is_valid():
             serializer.save()
+            otp.consume_verification(email)
             return Response({"message": "Provider registered. Awaiting approval."}, status=201)
         return Response(serializer.errors, status=400)
 
 
+def _otp_error_response(e):
+    response = Response({"error": e.message}, status=e.status)
+    if e.retry_after:
+        response["Retry-After"] = str(e.retry_after)
+    return response
+
+
 class GenerateProviderEmailOTP(APIView):
     permission_classes = [AllowAny]
 
@@ -204,16 +216,11 @@ class GenerateProviderEmailOTP(APIView):
         if not email:
             return Response({"error": "Email required."}, status=400)
 
-        otp = str(randint(100000, 999999))
-
-        EmailOTP.objects.update_or_create(
-            email=email,
-            defaults={'otp': otp, 'created_at': timezone.now()}
-        )
-
-        # Send OTP using Celery
-        from doerapp.tasks import send_otp_email_task
-        send_otp_email_task.delay(email, otp)
+        # Cached, rate limited per email / IP; mailed via the outbox
+        try:
+            otp.issue(email, otp.client_ip(request))
+        except otp.OTPError as e:
+            return _otp_error_response(e)
 
         return Response({"message": "OTP sent."}, status=200)
 
@@ -235,21 +242,15 @@ class VerifyProviderEmailOTP(APIView):
 
     def post(self, request):
         email = request.data.get("email")
-        otp = request.data.get("otp")
-        if not (email and otp):
+        code = request.data.get("otp")
+        if not (email and code):
             return Response({"error": "Email and OTP required."}, status=400)
 
         try:
-            entry = EmailOTP.objects.get(email=email)
-        except EmailOTP.DoesNotExist:
-            return Response({"error": "No OTP found."}, status=400)
-
-        if entry.otp != otp:
-            return Response({"error": "Invalid OTP."}, status=400)
-        if timezone.now() - entry.created_at > timedelta(minutes=10):
-            return Response({"error": "OTP expired."}, status=400)
+            otp.verify(email, code, otp.client_ip(request))
+        except otp.OTPError as e:
+            return _otp_error_response(e)
 
-        entry.delete()
         return Response({"message": "Email verified."})
 
 
@@ -340,16 +341,32 @@ class ProviderLocationUpdateAPI(APIView):
         except Provider.DoesNotExist:
             return Response({"detail": "Provider not found"}, status=404)
 
-        latitude = request.data.get("latitude")
-        longitude = request.data.get("longitude")
-
-        if latitude is not None and longitude is not None:
-            provider.location_lat = latitude
-            provider.location_lon    = longitude
-            provider.is_online = True
-            provider.save()
-            return Response({"detail": "Location updated"}, status=200)
-        return Response({"detail": "Invalid data"}, status=400)
+        try:
+            latitude = float(request.data.get("latitude"))
+            longitude = float(request.data.get("longitude"))
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid data"}, status=400)
+
+        # Pings go to the live location store and keep the provider's
+        # "tracking" presence alive; the Provider row is not written here.
+        store = get_location_store()
+        previous = store.update(provider.id, latitude, longitude) or (provider.location_lat, provider.location_lon)
+        presence = get_presence()
+        presence.connect(provider.id, TRACKING_CONNECTION, ttl=PRESENCE_TRACKING_TTL)
+        store.maybe_flush()
+        presence.maybe_sync()
+
+        # Move the provider's socket to its new request cell group.
+        cell = geo_cell(latitude, longitude)
+        if cell != geo_cell(*previous):
+            try:
+                async_to_sync(get_channel_layer().group_send)(
+                    f"provider_{provider.id}",
+                    {"type": "provider.cell", "cell": cell},
+                )
+            except Exception as e:
+                print(f"❌ Cell update failed: {e}")
+        return Response({"detail": "Location updated"}, status=200)
 
 
 class ProviderStopTrackingAPI(APIView):
@@ -362,23 +379,19 @@ class ProviderStopTrackingAPI(APIView):
         except Provider.DoesNotExist:
             return Response({"detail": "Provider not found"}, status=404)
 
-        provider.is_online = False
-        provider.save()
+        # Explicitly going offline drops every connection, sockets included.
+        fields = {"is_online": False}
+        get_presence().clear(provider.id)
+        last = get_location_store().remove(provider.id)
+        if last:
+            fields.update(
+                location_lat=last[0],
+                location_lon=last[1],
+                geo_cell=geo_cell(last[0], last[1]),
+            )
+        Provider.objects.filter(pk=provider.pk).update(**fields)
         return Response({"detail": "Provider marked offline"}, status=200)
 
-# ----------------------------------------------------------
-# HAVERSINE (DB VERSION)
-# ----------------------------------------------------------
-
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = Radians(lat2 - lat1)
-    dlon = Radians(lon2 - lon1)
-    a = Power(Sin(dlat / 2), 2) + Cos(Radians(lat1)) * Cos(Radians(lat2)) * Power(Sin(dlon / 2), 2)
-    c = 2 * ATan2(Sqrt(a), Sqrt(1 - a))
-    return R * c
-
-
 # ----------------------------------------------------------
 # USER: CREATE REQUEST + AUTO SEND TO NEARBY PROVIDERS ✅ (with debug prints)
 # ----------------------------------------------------------
@@ -386,7 +399,8 @@ def haversine_distance(lat1, lon1, lat2, lon2):
 class ServiceRequestAPI(generics.ListCreateAPIView):
     """
     ✅ Authenticated user can create new service request.
-    ✅ Automatically broadcasts new request to nearby providers (within 10km).
+    ✅ Automatically offers new request to nearby providers in waves of
+       widening radius (DISPATCH_WAVES), stopping once a provider accepts.
     ✅ Prints debug info at every step for development.
     """
 
@@ -406,62 +420,25 @@ class ServiceRequestAPI(generics.ListCreateAPIView):
             raise ValidationError("You must be logged in to create a request.")
 
         # ✅ Save the new service request
-        sr = serializer.save(user=user, status="pending")
+        sr = serializer.save(user=user, status="pending", dispatch_radius_km=DISPATCH_WAVES[0]["radius_km"])
         print(f"✅ Created ServiceRequest ID={sr.id}, category={sr.service_category}")
 
-        # ✅ Find nearby providers (within 10km, same category)
+        # ✅ Nearby providers are matched by location + category
         if not (sr.location_lat and sr.location_lon and sr.service_category):
             print("⚠️ Missing location or category — cannot find nearby providers.")
             return
 
-        print("📍 Searching for nearby providers...")
+        # ✅ Offer the request in waves of widening radius (Celery chain);
+        # the chain stops once a provider accepts.
+        print("📡 Starting wave dispatch...")
 
-        nearby_providers = (
-            Provider.objects.filter(
-                service_category=sr.service_category,
-                is_online=True,
-                verified=True,
-                location_lat__isnull=False,
-                location_lon__isnull=False,
-            )
-            .annotate(
-                distance_km=haversine_distance(
-                    Cast("location_lat", FloatField()),
-                    Cast("location_lon", FloatField()),
-                    Value(sr.location_lat),
-                    Value(sr.location_lon),
-                )
-            )
-            .filter(distance_km__lte=10)
-            .order_by("distance_km")
-        )
-
-        print(f"🔎 Found {nearby_providers.count()} nearby providers.")
-        for p in nearby_providers:
-            print(f"   🧍 Provider: {p.user.username} | ID={p.id} | Dist={getattr(p, 'distance_km', '?')}km")
-
-        if not nearby_providers.exists():
-            print("⚠️ No providers found nearby.")
-            return
+        def _start():
+            try:
+                start_dispatch(sr)
+            except Exception as e:
+                print(f"❌ Dispatch failed to start: {e}")
 
-        # ✅ WebSocket broadcast to providers
-        print("📡 Broadcasting via Django Channels...")
-        try:
-            channel_layer = get_channel_layer()
-            for provider in nearby_providers:
-                async_to_sync(channel_layer.group_send)(
-                    f"provider_{provider.id}",
-                    {
-                        "type": "new.request",
-                        "request_id": sr.id,
-                        "service_category": sr.service_category.name,
-                        "message": f"New nearby request for {sr.service_category.name}",
-                    },
-                )
-                print(f"   🚀 Sent WS message to provider_{provider.id}")
-            print("✅ Broadcast complete.")
-        except Exception as e:
-            print(f"❌ WebSocket broadcast failed: {e}")
+        transaction.on_commit(_start)
 
     def list(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
@@ -485,9 +462,10 @@ class ProviderIncomingRequestsAPI(generics.ListAPIView):
             return ServiceRequest.objects.none()
 
         provider = user.provider
-        print(f"➡️ Provider ID={provider.id}, Lat={provider.location_lat}, Lon={provider.location_lon}")
+        location = provider_location(provider)
+        print(f"➡️ Provider ID={provider.id}, Location={location}")
 
-        if not provider.location_lat or not provider.location_lon:
+        if not location:
             print("⚠️ Provider has no saved location.")
             return ServiceRequest.objects.none()
 
@@ -495,26 +473,23 @@ class ProviderIncomingRequestsAPI(generics.ListAPIView):
             print("⚠️ Provider has no assigned service category.")
             return ServiceRequest.objects.none()
 
-        print(f"📍 Searching pending requests in category={provider.service_category} within 10km")
+        print(f"📍 Searching pending requests in category={provider.service_category} within {DISPATCH_MAX_RADIUS_KM}km")
 
-        qs = (
+        qs = within_radius(
             ServiceRequest.objects.filter(
                 service_category=provider.service_category,
                 status="pending",
                 provider__isnull=True,
                 location_lat__isnull=False,
                 location_lon__isnull=False,
-            )
-            .annotate(
-                distance_km=haversine_distance(
-                    Cast("location_lat", FloatField()),
-                    Cast("location_lon", FloatField()),
-                    Value(provider.location_lat),
-                    Value(provider.location_lon),
-                )
-            )
-            .filter(distance_km__lte=10)
-            .order_by("distance_km")
+            ),
+            location[0],
+            location[1],
+            DISPATCH_MAX_RADIUS_KM,
+        ).filter(
+            # offered to this provider by a capped wave, or in reach of the open wave
+            Q(id__in=DispatchOffer.objects.filter(provider=provider).values("service_request_id"))
+            | Q(distance_km__lte=F("dispatch_radius_km"))
         )
 
         print(f"✅ Found {qs.count()} pending requests nearby.")
@@ -528,63 +503,107 @@ class ProviderIncomingRequestsAPI(generics.ListAPIView):
 # 🚀 SAFE PROVIDER ACCEPT API (CBV)
 # # ======================================================
 
-class AcceptServiceRequestAPI(APIView):
-    permission_classes = [IsAuthenticated]
+def release_provider(request_id):
+    """Free the provider working on `request_id` so they can accept another job."""
+    Provider.objects.filter(active_request_id=request_id).update(active_request=None)
 
-    @transaction.atomic
-    def post(self, request, pk):
-        try:
-            sr = ServiceRequest.objects.select_for_update().get(pk=pk)
-        except ServiceRequest.DoesNotExist:
-            return Response({"detail": "Request not found"}, status=404)
 
-        if not hasattr(request.user, "provider"):
-            return Response({"detail": "Not a provider"}, status=403)
+# why a request that is no longer pending can't be accepted
+NOT_PENDING_DETAIL = {
+    "accepted": "Request already accepted by another provider",
+    "expired": "Request expired before anyone accepted it",
+    "cancelled": "Request was cancelled by the user",
+    "rejected": "Request was rejected",
+    "completed": "Request is already completed",
+}
 
-        provider = request.user.provider
+MYSQL_DEADLOCK = 1213
 
-        # BLOCK 1: Request already accepted by someone
-        if sr.provider is not None:
-            return Response({"detail": "Request already accepted by another provider"}, status=400)
 
-        # BLOCK 2: Provider already has an active (accepted) request
-        has_active_request = ServiceRequest.objects.filter(
-            provider=provider,
-            status="accepted"  # This is the key!
-        ).exists()
+class AcceptServiceRequestAPI(APIView):
+    """
+    Acceptance is two conditional UPDATEs instead of a row lock:
+      1. claim the provider: active_request IS NULL (one job at a time)
+      2. claim the request:  status='pending' AND provider IS NULL
+    A busy provider fails (1) without touching the request row, so it never
+    holds up providers who can take the job. The first provider to run (2)
+    wins; everyone else gets 0 rows back, rolls back (1) and learns why.
+    The user is notified only after commit, so no Redis I/O happens while
+    the row is locked.
+    """
+    permission_classes = [IsAuthenticated]
 
-        if has_active_request:
-            return Response({
-                "detail": "You already have an active service request. "
-                          "Complete or cancel it before accepting a new one."
-            }, status=403)
+    def post(self, request, pk):
+        if not hasattr(request.user, "provider"):
+            return Response({"detail": "Not a provider"}, status=403)
 
-        # Assign provider
-        sr.provider = provider
-        sr.status = "accepted"
-        sr.save()
+        if not ServiceRequest.objects.filter(pk=pk).exists():
+            return Response({"detail": "Request not found"}, status=404)
 
-        # Create chatroom
-        chatroom, _ = ChatRoom.objects.get_or_create(
-            service_request=sr,
-            defaults={"user": sr.user, "provider": request.user}
-        )
+        for attempt in range(2):
+            try:
+                return self._accept(request, request.user.provider, pk)
+            except OperationalError as e:
+                # (1) share-locks the request row for its foreign key check,
+                # so two providers racing for it can deadlock on MySQL. The
+                # victim retries once and then sees the winner's acceptance.
+                if attempt or e.args[:1] != (MYSQL_DEADLOCK,):
+                    raise
+
+    def _accept(self, request, provider, pk):
+        with transaction.atomic():
+            # BLOCK 1: Provider already has an active (accepted) request
+            claimed = Provider.objects.filter(
+                pk=provider.pk, active_request__isnull=True
+            ).update(active_request_id=pk)
+
+            if not claimed:
+                return Response({
+                    "detail": "You already have an active service request. "
+                              "Complete or cancel it before accepting a new one."
+                }, status=403)
+
+            # BLOCK 2: Request already accepted by someone (or no longer pending)
+            won = ServiceRequest.objects.filter(
+                pk=pk, status="pending", provider__isnull=True
+            ).update(provider=provider, status="accepted")
+
+            if not won:
+                transaction.set_rollback(True)
+                status = ServiceRequest.objects.filter(pk=pk).values_list("status", flat=True).first()
+                if status is None:
+                    return Response({"detail": "Request not found"}, status=404)
+                detail = NOT_PENDING_DETAIL.get(status, "Request already accepted by another provider")
+                return Response({"detail": detail, "status": status}, status=400)
+
+            # Create chatroom
+            user_id = ServiceRequest.objects.values_list("user_id", flat=True).get(pk=pk)
+            chatroom, _ = ChatRoom.objects.get_or_create(
+                service_request_id=pk,
+                defaults={"user_id": user_id, "provider": request.user}
+            )
 
-        # Notify user via WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"request_{sr.id}",
-            {
-                "type": "request.accepted",
-                "chatroom_id": chatroom.id,
-                "provider_name": request.user.username
-            }
-        )
+            # Notify user via WebSocket once the acceptance is committed
+            def _notify():
+                try:
+                    async_to_sync(get_channel_layer().group_send)(
+                        f"request_{pk}",
+                        {
+                            "type": "request.accepted",
+                            "request_id": pk,
+                            "chatroom_id": chatroom.id,
+                            "provider_name": request.user.username
+                        }
+                    )
+                except Exception as e:
+                    print(f"❌ Accept notification failed: {e}")
+
+            transaction.on_commit(_notify)
 
         return Response({
             "status": "accepted",
             "chatroom_id": chatroom.id,
-            "request_id": sr.id,
+            "request_id": pk,
             "message": "Request accepted successfully"
         }, status=200)
 
@@ -600,13 +619,15 @@ class RejectServiceRequestAPI(APIView):
 
         sr.status = "rejected"
         sr.save()
+        release_provider(sr.id)
 
         # SEND REALTIME REJECTION
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
             f"request_{sr.id}",
             {
-                "type": "request.rejected"   # matches consumer method name
+                "type": "request.rejected",   # matches consumer method name
+                "request_id": sr.id,
             }
         )
 
@@ -684,6 +705,7 @@ class MarkServiceCompletedView(APIView):
         # ✅ Update status
         service.status = 'completed'
         service.save()
+        release_provider(service.id)
 
         return Response({'message': 'Service marked as completed successfully.', 'status': service.status})
 
@@ -765,7 +787,7 @@ class GetOrCreateChatRoomAPI(APIView):
 # ----------------------------------------------------------
 
 class ChatRoomDetailAPI(generics.RetrieveAPIView):
-    queryset = ChatRoom.objects.all()
+    queryset = ChatRoom.objects.select_related("user", "provider")
     serializer_class = ChatRoomSerializer
     permission_classes = [IsAuthenticated]
 
@@ -778,6 +800,42 @@ class ChatRoomDetailAPI(generics.RetrieveAPIView):
         return Response(serializer.data)
 
 
+# ----------------------------------------------------------
+# CHAT HISTORY (KEYSET PAGINATION)
+# ----------------------------------------------------------
+
+class ChatRoomMessagesAPI(APIView):
+    """
+    GET /api/chat/<pk>/messages/?before=<message id or uuid>&limit=<n>
+    Messages sent before `before` (latest page if omitted), oldest first.
+    next_before is a message uuid, valid even before the message is saved.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        chatroom = ChatRoom.objects.filter(
+            Q(user=request.user) | Q(provider=request.user), pk=pk
+        ).values_list("id", flat=True).first()
+        if chatroom is None:
+            return Response({"detail": "Not found"}, status=404)
+
+        try:
+            before = parse_before(request.query_params.get("before"))
+        except ValueError:
+            return Response({"detail": "before must be a message id or uuid"}, status=400)
+
+        page, has_more = messages_before(
+            chatroom,
+            before=before,
+            limit=clamp_limit(request.query_params.get("limit")),
+        )
+        return Response({
+            "messages": MessageSerializer(page, many=True).data,
+            "has_more": has_more,
+            "next_before": str(page[0].uuid) if has_more and page else None,
+        })
+
+
 # ----------------------------------------------------------
 # START CHAT
 # ----------------------------------------------------------
@@ -861,8 +919,16 @@ class SendMessageAPI(APIView):
             return Response({"detail": "Empty message"}, status=400)
 
         message = Message.objects.create(chatroom=chatroom, sender=request.user, content=content)
+        remember_message(message)
         print("   → Message saved, id:", message.id)
 
+        # Notify the other participant (coalesced per room while unread)
+        recipient_id = chatroom.provider_id if request.user.id == chatroom.user_id else chatroom.user_id
+        if recipient_id != request.user.id:
+            notification_store.save_chat_notifications([
+                notification_store.chat_notification(recipient_id, chatroom.id, request.user.username, content)
+            ])
+
         # ────── NOTIFY PROVIDER ──────
         try:
             channel_layer = get_channel_layer()
@@ -995,14 +1061,28 @@ class ProviderWebinarDashboardAPI(APIView):
 # 3. Public Webinar List
 # ============================================================
 class WebinarListAPI(APIView):
+    """
+    GET /api/webinars/?cursor=<next>&limit=50  →  upcoming, soonest first
+    Served from the cache (see webinar_cache). Body stays a plain list;
+    the next page's cursor is in X-Next-Cursor. Supports If-None-Match.
+    """
     permission_classes = [AllowAny]
 
     def get(self, request):
-        webinars = WebinarPoster.objects.filter(
-            webinar_date__gte=timezone.now().date()
-        ).order_by('webinar_date')
-        serializer = WebinarPosterSerializer(webinars, many=True)
-        return Response(serializer.data)
+        page = webinar_cache.upcoming_page(
+            cursor=request.query_params.get("cursor"),
+            limit=webinar_cache.clamp_limit(request.query_params.get("limit")),
+        )
+        etag = quote_etag(page["etag"])
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(page["data"])
+            if page["next"]:
+                response["X-Next-Cursor"] = page["next"]
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, max-age=0, must-revalidate"
+        return response
 
 #------------------------------------------------------------
 #oWNED WEBINARS
@@ -1188,8 +1268,7 @@ class WebinarSendLinkAPI(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            registrations = WebinarRegistration.objects.filter(webinar=webinar).select_related("user")
-            if not registrations.exists():
+            if not WebinarRegistration.objects.filter(webinar=webinar).exists():
                 return Response(
                     {"detail": "No registrations yet – nothing to send."},
                     status=status.HTTP_200_OK,
@@ -1211,36 +1290,18 @@ class WebinarSendLinkAPI(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            subject = f"Your link for “{webinar.title}”"
-            message_template = (
-                f"Hi {{name}},\n\n"
-                f"You're registered for the webinar **{webinar.title}**.\n"
-                f"Join using the link below:\n\n"
-                f"{meeting_url}\n\n"
-                f"See you there!\n"
-                f"{webinar.provider.get_full_name() or webinar.provider.username}"
-            )
+            # Delivered in chunks by Celery; poll status_url for progress
+            job = create_webinar_link_job(webinar, meeting_url, request.user)
+            transaction.on_commit(lambda: send_webinar_links_task.delay(job.id))
 
-            sent_to = []
-            for reg in registrations:
-                user = reg.user
-                personalized_msg = message_template.replace("{{name}}", user.get_full_name() or user.username)
-                send_mail(
-                    subject=subject,
-                    message=personalized_msg,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-                sent_to.append(user.email)
-
-            logger.info("Sent webinar link for %s to %d users", pk, len(sent_to))
+            logger.info("Queued webinar link for %s to %d users (job %s)", pk, job.total, job.id)
             return Response({
-                "detail": "Link sent successfully.",
+                "detail": "Link is being sent.",
                 "webinar": webinar.title,
-                "sent_to_count": len(sent_to),
-                "sent_to": sent_to,
-            })
+                "job_id": job.id,
+                "total": job.total,
+                "status_url": f"/api/bulk-email-jobs/{job.id}/",
+            }, status=status.HTTP_202_ACCEPTED)
 
         except WebinarPoster.DoesNotExist:
             return Response({"error": "Webinar not found"}, status=404)
@@ -1249,6 +1310,15 @@ class WebinarSendLinkAPI(APIView):
             return Response({"error": str(e)}, status=500)
 
 
+class BulkEmailJobStatusAPI(APIView):
+    """GET /api/bulk-email-jobs/<id>/ → progress of a bulk send (owner only)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(BulkEmailJob, pk=pk, created_by=request.user)
+        return Response(job_status(job))
+
+
 # ============================================================
 # 9. User’s Registered Webinars
 # ============================================================
@@ -1276,44 +1346,51 @@ class UserRegisteredWebinarsAPI(APIView):
 
 class NotificationListAPIView(generics.ListAPIView):
     """
-    GET  /api/notifications/   →  latest 50 notifications
+    GET  /api/notifications/?cursor=<next>&limit=50  →  newest first
     Includes:
       • Personal (recipient = current user)
-      • Broadcast (recipient = None)  ← admin messages
+      • Broadcast (recipient = None)  ← admin messages, read state per user
+    Body stays a plain list; the next page's cursor is in X-Next-Cursor.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
 
-    def get_queryset(self):
-        return Notification.objects.filter(
-            Q(recipient=self.request.user) | Q(recipient=None)
-        ).order_by('-created_at')[:50]
+    def list(self, request, *args, **kwargs):
+        page, next_cursor = notification_store.feed(
+            request.user,
+            cursor=request.query_params.get("cursor"),
+            limit=notification_store.clamp_limit(request.query_params.get("limit")),
+        )
+        response = Response(self.get_serializer(page, many=True).data)
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
+
+
+class NotificationUnreadCountAPIView(APIView):
+    """GET /api/notifications/unread-count/ → {"count": n} (cached counter, no row scan)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"count": notification_counters.unread_count(request.user.id)})
 
 
 class NotificationMarkReadAPIView(generics.GenericAPIView):
-    """POST /api/notifications/<pk>/read/"""
+    """POST /api/notifications/<pk>/read/ – personal or broadcast"""
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            notif = Notification.objects.get(
-                pk=pk, recipient=request.user
-            )
-            notif.is_read = True
-            notif.save(update_fields=['is_read'])
-            return Response({"status": "read"})
-        except Notification.DoesNotExist:
+        if not notification_store.mark_read(request.user, pk):
             return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"status": "read"})
 
 
 class NotificationMarkAllReadAPIView(generics.GenericAPIView):
-    """POST /api/notifications/mark-all-read/ – only personal"""
+    """POST /api/notifications/mark-all-read/ – personal + broadcasts seen so far"""
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        Notification.objects.filter(
-            recipient=request.user, is_read=False
-        ).update(is_read=True)
+        notification_store.mark_all_read(request.user)
         return Response({"status": "all read"})
     
 
@@ -1421,14 +1498,13 @@ class ContactMessageAPI(APIView):
         serializer = ContactMessageSerializer(data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
-            
-            # Call Celery task
-            send_contact_email.delay(
-                serializer.data["name"],
-                serializer.data["email"],
-                serializer.data["message"]
-            )
+            with transaction.atomic():
+                serializer.save()
+                email_outbox.contact_email(
+                    serializer.data["name"],
+                    serializer.data["email"],
+                    serializer.data["message"]
+                )
 
             return Response(
                 {"message": "Your message has been sent!"},
@@ -0,0 +1,110 @@
+"""
+Public upcoming-webinar listing, served from the cache.
+
+Pages are keyset-paginated on (webinar_date, id), oldest first, and each
+rendered page (serialized rows, next cursor, ETag) is cached under a key
+that carries the listing version and today's date. Saving or deleting a
+WebinarPoster bumps the version (see models.py), so every cached page is
+invalidated at once without knowing its key; the date rolls stale
+"upcoming" pages over at midnight. The ETag lets clients revalidate with
+If-None-Match and get a 304 without a body.
+"""
+import base64
+import hashlib
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import WebinarPoster
+from .serializers import WebinarPosterSerializer
+
+WEBINAR_CACHE_ALIAS = getattr(settings, "WEBINAR_CACHE_ALIAS", "default")
+WEBINAR_LIST_CACHE_TTL = getattr(settings, "WEBINAR_LIST_CACHE_TTL", 600)
+WEBINAR_PAGE_SIZE = getattr(settings, "WEBINAR_PAGE_SIZE", 50)
+WEBINAR_MAX_PAGE_SIZE = getattr(settings, "WEBINAR_MAX_PAGE_SIZE", 100)
+
+VERSION_KEY = "webinars:list:version"
+
+
+def _cache():
+    return caches[WEBINAR_CACHE_ALIAS]
+
+
+def clamp_limit(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return WEBINAR_PAGE_SIZE
+    return max(1, min(limit, WEBINAR_MAX_PAGE_SIZE))
+
+
+def encode_cursor(webinar):
+    raw = f"{webinar.webinar_date.isoformat()}|{webinar.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (webinar_date, id) or None for a missing / malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        webinar_date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(webinar_date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached listing page."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _render(after, limit, today):
+    qs = WebinarPoster.objects.filter(webinar_date__gte=today).select_related("provider")
+    if after is not None:
+        webinar_date, pk = after
+        qs = qs.filter(Q(webinar_date__gt=webinar_date) | Q(webinar_date=webinar_date, id__gt=pk))
+    rows = list(qs.order_by("webinar_date", "id")[: limit + 1])
+
+    page = rows[:limit]
+    data = list(WebinarPosterSerializer(page, many=True).data)
+    next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+    body = json.dumps([data, next_cursor], cls=JSONEncoder, sort_keys=True)
+    return {
+        "data": data,
+        "next": next_cursor,
+        "etag": hashlib.md5(body.encode()).hexdigest(),
+    }
+
+
+def upcoming_page(cursor=None, limit=WEBINAR_PAGE_SIZE):
+    """{"data": [...], "next": cursor or None, "etag": str} for one listing page."""
+    today = timezone.now().date()
+    after = decode_cursor(cursor)
+    position = f"{after[0].isoformat()}.{after[1]}" if after else "-"
+    key = f"webinars:list:v{_version()}:{today.isoformat()}:{position}:{limit}"
+
+    cache = _cache()
+    page = cache.get(key)
+    if page is None:
+        page = _render(after, limit, today)
+        cache.set(key, page, WEBINAR_LIST_CACHE_TTL)
+    return page
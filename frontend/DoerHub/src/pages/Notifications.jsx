@@ -1,4 +1,4 @@
-import { useEffect, useState, useContext } from "react";
+import { useEffect, useRef, useState, useContext } from "react";
 import toast from "react-hot-toast";
 import { useNavigate } from "react-router-dom";
 import { UserContext } from "../context/UserContext";
@@ -6,7 +6,8 @@ import ChatToast from "./ChatToast";
 
 /**
  * Notifications Component
- * Polls notifications API, shows toasts,
+ * Refetches the notifications API when the notification socket pushes
+ * (polling slowly only while it is down), shows toasts,
  * and exposes window.__notifications for Navbar.
  */
 function Notifications() {
@@ -15,6 +16,7 @@ function Notifications() {
 
   const [lastUnread, setLastUnread] = useState(0);
   const [notifications, setNotifications] = useState([]);
+  const fetchRef = useRef(null);
 
   // --------------------------------------------------------------
   // Helper: mark one or all notifications as read
@@ -70,7 +72,7 @@ function Notifications() {
   };
 
   // --------------------------------------------------------------
-  // Poll loop
+  // Fetch (triggered by the socket below)
   // --------------------------------------------------------------
   useEffect(() => {
     if (!user) {
@@ -188,11 +190,70 @@ function Notifications() {
       }
     };
 
+    fetchRef.current = fetchNotifs;
     fetchNotifs();
-    const id = setInterval(fetchNotifs, 2000);
-    return () => clearInterval(id);
   }, [user, lastUnread, navigate]);
 
+  // --------------------------------------------------------------
+  // Live stream: ws/notifications/ replays what was missed since the
+  // last id seen, then pushes new ones. Poll only while it is down.
+  // --------------------------------------------------------------
+  useEffect(() => {
+    if (!user) return;
+
+    let ws = null;
+    let lastId = null;
+    let lastAt = null;
+    let pollId = null;
+    let retryId = null;
+    let closed = false;
+
+    const refetch = () => fetchRef.current && fetchRef.current();
+
+    const open = () => {
+      const token = localStorage.getItem("access");
+      if (!token || closed) return;
+
+      const since = lastId ? `&since=${lastId}` : "";
+      ws = new WebSocket(`ws://127.0.0.1:8000/ws/notifications/?token=${token}${since}`);
+
+      ws.onopen = () => {
+        clearInterval(pollId);
+        pollId = null;
+      };
+
+      ws.onmessage = (e) => {
+        const data = JSON.parse(e.data);
+        const items =
+          data.type === "notification" ? [data.notification]
+          : data.type === "replay" ? data.notifications
+          : [];
+        // resume from the most recently updated one (coalesced chat rows move forward)
+        items.forEach((n) => {
+          if (n.id && (!lastAt || n.created_at >= lastAt)) {
+            lastId = n.id;
+            lastAt = n.created_at;
+          }
+        });
+        if (items.length) refetch();
+      };
+
+      ws.onclose = () => {
+        if (closed) return;
+        if (!pollId) pollId = setInterval(refetch, 30000);
+        retryId = setTimeout(open, 5000);
+      };
+    };
+
+    open();
+    return () => {
+      closed = true;
+      clearInterval(pollId);
+      clearTimeout(retryId);
+      if (ws) ws.close();
+    };
+  }, [user]);
+
   // --------------------------------------------------------------
   // Expose globals for Navbar
   // --------------------------------------------------------------
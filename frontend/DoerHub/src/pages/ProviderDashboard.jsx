@@ -138,30 +138,40 @@ const ProviderDashboard = () => {
   useEffect(() => {
     if (!navigator.geolocation || !token) return;
     let lastSent = 0;
+    let lastCoords = null;
+    const sendLocation = async ({ latitude, longitude }) => {
+      lastSent = Date.now();
+      try {
+        await fetch(`${API_BASE}/provider/update-location/`, {
+          method: "POST",
+          headers: {
+            Authorization: `Bearer ${token}`,
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({ latitude, longitude }),
+        });
+      } catch (err) {
+        console.error("Location update failed:", err);
+      }
+    };
     watchId.current = navigator.geolocation.watchPosition(
-      async (position) => {
+      (position) => {
         const { latitude, longitude } = position.coords;
         setProviderLocation([latitude, longitude]);
-        const now = Date.now();
-        if (now - lastSent < 5000) return;
-        lastSent = now;
-        try {
-          await fetch(`${API_BASE}/provider/update-location/`, {
-            method: "POST",
-            headers: {
-              Authorization: `Bearer ${token}`,
-              "Content-Type": "application/json",
-            },
-            body: JSON.stringify({ latitude, longitude }),
-          });
-        } catch (err) {
-          console.error("Location update failed:", err);
-        }
+        lastCoords = { latitude, longitude };
+        if (Date.now() - lastSent < 5000) return;
+        sendLocation(lastCoords);
       },
       (error) => console.error("Geolocation error:", error),
       { enableHighAccuracy: true, maximumAge: 10000, timeout: 20000 }
     );
+    // watchPosition is quiet while standing still; re-send so the server's
+    // short tracking presence (PRESENCE_TRACKING_TTL) doesn't lapse
+    const keepAlive = setInterval(() => {
+      if (lastCoords && Date.now() - lastSent >= 30000) sendLocation(lastCoords);
+    }, 10000);
     return () => {
+      clearInterval(keepAlive);
       if (watchId.current) navigator.geolocation.clearWatch(watchId.current);
     };
   }, [token]);
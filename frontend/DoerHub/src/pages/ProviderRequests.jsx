@@ -95,7 +95,8 @@ function ProviderRequests() {
       if (data.chatroom_id) navigate(`/chat/${data.chatroom_id}`);
     } catch (err) {
       console.error("Accept error:", err);
-      alert("❌ Failed to accept request.");
+      alert(`❌ ${err.message || "Failed to accept request."}`);
+      fetchRequests();
     }
   };
 
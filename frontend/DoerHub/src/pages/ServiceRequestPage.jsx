@@ -558,6 +558,16 @@ function ServiceRequestPage() {
           setMessage("Provider rejected your request.");
           setActiveRequestId(null);
         }
+
+        if (msg.type === "request.expired") {
+          if (ws.current) ws.current.close();
+          if (countdownRef.current) clearInterval(countdownRef.current);
+
+          setLoading(false);
+          setTimeLeft(0);
+          setMessage("No provider accepted your request in time. Please try again.");
+          setActiveRequestId(null);
+        }
       };
 
       ws.current.onerror = (err) => {
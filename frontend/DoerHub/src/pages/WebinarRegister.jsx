@@ -179,7 +179,7 @@ function WebinarRegister() {
 
       const data = await res.json();
       if (res.ok) {
-        toast.success(`Link sent to ${data.sent_to_count} attendees`);
+        toast.success(`Sending link to ${data.total} attendees`);
         setLinkModalOpen(false);
         setMeetingLink("");
       } else {